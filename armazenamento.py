@@ -0,0 +1,71 @@
+import os
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# ==================== CONSTANTES ====================
+# Diretório dos arquivos locais (caches, índice de eventos e fila de confirmações),
+# independente do diretório de onde o Streamlit é iniciado
+DIRETORIO_DADOS = os.environ.get(
+    "PRONTUARIOS_DIRETORIO_DADOS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+)
+TIMEOUT_SQLITE = 30  # segundos de espera por uma trava de escrita
+
+# ==================== ARQUIVOS LOCAIS ====================
+
+def caminho_dados(nome_arquivo):
+    """
+    Resolve o nome de um arquivo local dentro de DIRETORIO_DADOS, criando o
+    diretório se necessário. Caminhos absolutos são mantidos
+    """
+    if os.path.isabs(nome_arquivo):
+        return nome_arquivo
+    os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+    return os.path.join(DIRETORIO_DADOS, nome_arquivo)
+
+@contextmanager
+def conectar(arquivo, linhas_nomeadas=False):
+    """
+    Abre uma conexão SQLite dentro de uma transação (commit ao sair, rollback
+    em caso de erro) e a fecha ao final. Com `linhas_nomeadas`, as linhas
+    são sqlite3.Row (acesso pelo nome da coluna)
+    """
+    conexao = sqlite3.connect(arquivo, timeout=TIMEOUT_SQLITE)
+    if linhas_nomeadas:
+        conexao.row_factory = sqlite3.Row
+    try:
+        with conexao:
+            yield conexao
+    finally:
+        conexao.close()
+
+# ==================== CACHE EM MEMÓRIA ====================
+
+class CacheLRU:
+    """
+    Mapeamento limitado a `capacidade` entradas que descarta a usada há mais
+    tempo. Não é thread-safe: quem o usa o protege com a própria trava
+    """
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obter(self, chave):
+        """
+        Retorna a entrada (ou None), marcando-a como usada
+        """
+        valor = self._entradas.get(chave)
+        if valor is not None:
+            self._entradas.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._entradas[chave] = valor
+        self._entradas.move_to_end(chave)
+        if len(self._entradas) > self.capacidade:
+            self._entradas.popitem(last=False)
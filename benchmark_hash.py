@@ -0,0 +1,112 @@
+"""
+Benchmark do cálculo de hash de documentos.
+
+Mede documentos/s e MB/s (tamanho do BSON) do hash sequencial
+(gerar_hash_documento no processo atual) e do motor com pool de processos,
+para prontuários sintéticos de tamanhos e profundidades variados.
+
+Uso:
+    python benchmark_hash.py [--documentos 2000] [--repeticoes 3] [--processos N]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import bson
+from bson.objectid import ObjectId
+from integridade import gerar_hash_documento
+from motor_hash import MAX_PROCESSOS_HASH, calcular_hashes, obter_pool_hash
+
+# ==================== CENÁRIOS ====================
+# (nome, evoluções por prontuário, profundidade do aninhamento)
+CENARIOS = [
+    ("pequeno, raso", 2, 1),
+    ("médio, raso", 20, 1),
+    ("médio, profundo", 20, 6),
+    ("grande, raso", 200, 1),
+    ("grande, profundo", 200, 6),
+]
+
+# ==================== DOCUMENTOS SINTÉTICOS ====================
+
+def _texto(gerador, palavras):
+    return " ".join(gerador.choice(("paciente", "refere", "dor", "febre", "exame", "normal", "conduta",
+                                    "prescrição", "retorno", "alta", "evolução", "estável"))
+                    for _ in range(palavras))
+
+def _aninhar(gerador, profundidade):
+    if profundidade <= 1:
+        return {"descricao": _texto(gerador, 12), "valor": gerador.random(), "codigo": gerador.randint(1, 99999)}
+    return {
+        "nivel": profundidade,
+        "itens": [_aninhar(gerador, profundidade - 1) for _ in range(2)],
+        "observacao": _texto(gerador, 4)
+    }
+
+def gerar_prontuario(gerador, evolucoes, profundidade):
+    """
+    Gera um prontuário sintético com `evolucoes` registros de evolução,
+    cada um com um subdocumento de `profundidade` níveis
+    """
+    inicio = datetime(2024, 1, 1) + timedelta(minutes=gerador.randint(0, 500_000))
+    return {
+        "_id": ObjectId(),
+        "idAtendimento": gerador.randint(1, 10**9),
+        "cnsPaciente": "".join(str(gerador.randint(0, 9)) for _ in range(15)),
+        "tipoAtendimento": gerador.choice(("consulta", "internacao", "urgencia")),
+        "dataAtendimento": inicio,
+        "evolucoes": [
+            {
+                "data": inicio + timedelta(hours=i),
+                "profissional": _texto(gerador, 2),
+                "texto": _texto(gerador, 40),
+                "detalhes": _aninhar(gerador, profundidade)
+            }
+            for i in range(evolucoes)
+        ]
+    }
+
+# ==================== MEDIÇÃO ====================
+
+def _medir(funcao, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documentos", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--processos", type=int, default=MAX_PROCESSOS_HASH)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    gerador = random.Random(args.semente)
+    pool = obter_pool_hash(args.processos)
+
+    print(f"{args.documentos} documentos por cenário, melhor de {args.repeticoes}, {args.processos} processos\n")
+    print(f"{'cenário':<18} {'KB/doc':>8} {'seq doc/s':>10} {'seq MB/s':>9} {'pool doc/s':>11} {'pool MB/s':>10} {'ganho':>6}")
+
+    for nome, evolucoes, profundidade in CENARIOS:
+        documentos = [gerar_prontuario(gerador, evolucoes, profundidade) for _ in range(args.documentos)]
+        megabytes = sum(len(bson.encode(d)) for d in documentos) / 1024 ** 2
+
+        # Os dois caminhos precisam produzir exatamente os mesmos hashes
+        sequencial = [gerar_hash_documento(d, limite_previa=0)[0] for d in documentos]
+        if calcular_hashes(documentos, pool=pool) != sequencial:
+            raise SystemExit(f"Hashes divergentes no cenário '{nome}'")
+
+        t_seq = _medir(lambda: [gerar_hash_documento(d, limite_previa=0) for d in documentos], args.repeticoes)
+        t_pool = _medir(lambda: calcular_hashes(documentos, pool=pool), args.repeticoes)
+
+        print(f"{nome:<18} {megabytes * 1024 / len(documentos):>8.1f} "
+              f"{len(documentos) / t_seq:>10,.0f} {megabytes / t_seq:>9.1f} "
+              f"{len(documentos) / t_pool:>11,.0f} {megabytes / t_pool:>10.1f} {t_seq / t_pool:>5.1f}x")
+
+    pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+import streamlit as st
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from provedor_web3 import obter_web3
+from armazenamento import CacheLRU, caminho_dados, conectar
+
+# ==================== CONSTANTES ====================
+# Nomes relativos são resolvidos em armazenamento.DIRETORIO_DADOS
+ARQUIVO_CACHE = os.environ.get("PRONTUARIOS_CACHE_BLOCKCHAIN", "cache_blockchain.sqlite3")
+CAPACIDADE_LRU = 2048  # entradas mantidas em memória
+# Apenas dados com pelo menos esta quantidade de confirmações entram no cache
+PROFUNDIDADE_CONFIRMACAO_CACHE = 12
+# Tempo (segundos) em que o número do bloco mais recente é reaproveitado
+VALIDADE_BLOCO_ATUAL = 12
+
+TIPO_TRANSACAO = "transacao"
+TIPO_RECIBO = "recibo"
+TIPO_BLOCO = "bloco"
+
+# Entradas separadas por rede (chain id): o mesmo hash de transação ou número
+# de bloco aponta para dados diferentes em cada cadeia
+_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS cache_por_rede (
+        chain_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        chave TEXT NOT NULL,
+        valor TEXT NOT NULL,
+        PRIMARY KEY (chain_id, tipo, chave)
+    )
+"""
+# Tabela das versões anteriores, sem a rede na chave: as entradas não são confiáveis
+_REMOVER_TABELA_ANTIGA = "DROP TABLE IF EXISTS cache"
+
+# ==================== CACHE ====================
+
+class CacheBlockchain:
+    """
+    Cache de leitura para dados imutáveis da blockchain (transações, recibos
+    e cabeçalhos de bloco), em dois níveis: LRU em memória e SQLite em disco.
+    Só é armazenado o que já tem PROFUNDIDADE_CONFIRMACAO_CACHE confirmações,
+    então uma entrada em cache nunca precisa ser invalidada.
+    Os valores são devolvidos como AttributeDict com campos binários em hex,
+    tanto na primeira consulta quanto nas seguintes.
+    As entradas em disco são indexadas também pelo chain id do provedor.
+    """
+
+    def __init__(self, w3, arquivo=ARQUIVO_CACHE, capacidade=CAPACIDADE_LRU,
+                 profundidade=PROFUNDIDADE_CONFIRMACAO_CACHE):
+        self.w3 = w3
+        self.chain_id = w3.eth.chain_id
+        self.arquivo = caminho_dados(arquivo)
+        self.profundidade = profundidade
+        self._memoria = CacheLRU(capacidade)
+        self._trava = threading.Lock()
+        self._bloco_atual = (0, 0.0)  # (número, momento da consulta)
+        self.contadores = {"acertos_memoria": 0, "acertos_disco": 0, "faltas": 0, "nao_armazenados": 0}
+
+        with conectar(self.arquivo) as conexao:
+            conexao.execute(_REMOVER_TABELA_ANTIGA)
+            conexao.execute(_ESQUEMA)
+
+    # ---------- Níveis do cache ----------
+
+    def _lembrar(self, chave, valor):
+        with self._trava:
+            self._memoria.guardar(chave, valor)
+
+    def _contar(self, contador):
+        with self._trava:
+            self.contadores[contador] += 1
+
+    def _numero_bloco_atual(self):
+        numero, consultado_em = self._bloco_atual
+        if time.monotonic() - consultado_em > VALIDADE_BLOCO_ATUAL:
+            numero = self.w3.eth.block_number
+            self._bloco_atual = (numero, time.monotonic())
+        return numero
+
+    def _ler(self, tipo, chave, buscar, bloco_do_valor):
+        """
+        Leitura em cascata: memória → disco → RPC. O valor obtido via RPC só
+        é gravado se o seu bloco já tiver a profundidade de confirmação exigida
+        """
+        chave_completa = (tipo, chave)
+
+        with self._trava:
+            valor = self._memoria.obter(chave_completa)
+        if valor is not None:
+            self._contar("acertos_memoria")
+            return valor
+
+        with conectar(self.arquivo) as conexao:
+            linha = conexao.execute(
+                "SELECT valor FROM cache_por_rede WHERE chain_id = ? AND tipo = ? AND chave = ?",
+                (self.chain_id, tipo, chave)
+            ).fetchone()
+        if linha:
+            valor = AttributeDict.recursive(json.loads(linha[0]))
+            self._lembrar(chave_completa, valor)
+            self._contar("acertos_disco")
+            return valor
+
+        self._contar("faltas")
+        serializado = Web3.to_json(buscar())
+        valor = AttributeDict.recursive(json.loads(serializado))
+
+        bloco = bloco_do_valor(valor)
+        if bloco is not None and bloco <= self._numero_bloco_atual() - self.profundidade:
+            with conectar(self.arquivo) as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO cache_por_rede (chain_id, tipo, chave, valor) VALUES (?, ?, ?, ?)",
+                    (self.chain_id, tipo, chave, serializado)
+                )
+            self._lembrar(chave_completa, valor)
+        else:
+            self._contar("nao_armazenados")
+
+        return valor
+
+    # ---------- Consultas ----------
+
+    def obter_transacao(self, tx_hash):
+        """
+        Retorna a transação (eth_getTransactionByHash)
+        """
+        tx_hash = tx_hash.lower()
+        return self._ler(
+            TIPO_TRANSACAO, tx_hash,
+            lambda: self.w3.eth.get_transaction(tx_hash),
+            lambda tx: tx.get('blockNumber')
+        )
+
+    def obter_recibo(self, tx_hash):
+        """
+        Retorna o recibo da transação (eth_getTransactionReceipt)
+        """
+        tx_hash = tx_hash.lower()
+        return self._ler(
+            TIPO_RECIBO, tx_hash,
+            lambda: self.w3.eth.get_transaction_receipt(tx_hash),
+            lambda recibo: recibo.get('blockNumber')
+        )
+
+    def obter_bloco(self, identificador):
+        """
+        Retorna o cabeçalho do bloco (sem as transações completas),
+        pelo número ou pelo hash
+        """
+        chave = identificador.lower() if isinstance(identificador, str) else str(identificador)
+        return self._ler(
+            TIPO_BLOCO, chave,
+            lambda: self.w3.eth.get_block(identificador, full_transactions=False),
+            lambda bloco: bloco.get('number')
+        )
+
+    def estatisticas(self):
+        """
+        Retorna os contadores de acerto/falta e o tamanho de cada nível
+        """
+        with conectar(self.arquivo) as conexao:
+            em_disco = conexao.execute(
+                "SELECT COUNT(*) FROM cache_por_rede WHERE chain_id = ?", (self.chain_id,)
+            ).fetchone()[0]
+        with self._trava:
+            return {**self.contadores, "em_memoria": len(self._memoria), "em_disco": em_disco}
+
+@st.cache_resource
+def obter_cache_blockchain(rpc_url):
+    """
+    Retorna o cache de dados da blockchain, compartilhado entre sessões e páginas
+    """
+    return CacheBlockchain(obter_web3(rpc_url))
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+import streamlit as st
+from armazenamento import CacheLRU, caminho_dados, conectar
+from integridade import marcador_conteudo
+from motor_hash import hash_e_caracteres, iterar_resultados
+
+# ==================== CONSTANTES ====================
+# Nomes relativos são resolvidos em armazenamento.DIRETORIO_DADOS
+ARQUIVO_CACHE_HASHES = os.environ.get("PRONTUARIOS_CACHE_HASHES", "cache_hashes.sqlite3")
+CAPACIDADE_LRU_HASHES = 10_000  # entradas mantidas em memória
+# Limite de parâmetros por consulta no SQLite (versões antigas aceitam 999)
+TAMANHO_LOTE_CONSULTA = 500
+
+_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS hashes (
+        colecao TEXT NOT NULL,
+        documento_id TEXT NOT NULL,
+        marcador TEXT NOT NULL,
+        document_hash TEXT NOT NULL,
+        caracteres INTEGER NOT NULL,
+        calculado_em REAL NOT NULL,
+        PRIMARY KEY (colecao, documento_id)
+    )
+"""
+
+# ==================== CACHE ====================
+
+class CacheHashes:
+    """
+    Hashes de documentos (gerar_hash_documento) já calculados, por coleção e
+    _id, em dois níveis: LRU em memória e SQLite em disco.
+    Cada entrada guarda o marcador do conteúdo (marcador_conteudo) de quando
+    o hash foi calculado. Qualquer escrita no conteúdo do documento muda o
+    marcador, então a entrada deixa de valer sem depender de quem escreveu;
+    ela é recalculada e substituída na próxima consulta.
+    """
+
+    def __init__(self, arquivo=ARQUIVO_CACHE_HASHES, capacidade=CAPACIDADE_LRU_HASHES):
+        self.arquivo = caminho_dados(arquivo)
+        self._memoria = CacheLRU(capacidade)
+        self._trava = threading.Lock()
+        self.contadores = {"acertos_memoria": 0, "acertos_disco": 0, "calculados": 0}
+
+        with conectar(self.arquivo) as conexao:
+            conexao.execute(_ESQUEMA)
+
+    # ---------- Entradas ----------
+
+    def consultar(self, colecao, chaves):
+        """
+        Busca as entradas de [(documento_id, marcador)], primeiro em memória e
+        depois no disco. Retorna, na mesma ordem, (document_hash, caracteres)
+        ou None quando não há entrada ou o marcador não confere
+        """
+        resultado = [None] * len(chaves)
+        faltando = []
+
+        with self._trava:
+            for posicao, (documento_id, marcador) in enumerate(chaves):
+                entrada = self._memoria.obter((colecao, documento_id))
+                if entrada and entrada[0] == marcador:
+                    resultado[posicao] = entrada[1:]
+                else:
+                    faltando.append(posicao)
+            self.contadores["acertos_memoria"] += len(chaves) - len(faltando)
+
+        if not faltando:
+            return resultado
+
+        em_disco = {}
+        with conectar(self.arquivo) as conexao:
+            for inicio in range(0, len(faltando), TAMANHO_LOTE_CONSULTA):
+                ids = [chaves[posicao][0] for posicao in faltando[inicio:inicio + TAMANHO_LOTE_CONSULTA]]
+                em_disco.update(
+                    (documento_id, (marcador, document_hash, caracteres))
+                    for documento_id, marcador, document_hash, caracteres in conexao.execute(
+                        "SELECT documento_id, marcador, document_hash, caracteres FROM hashes "
+                        f"WHERE colecao = ? AND documento_id IN ({', '.join('?' * len(ids))})",
+                        (colecao, *ids)
+                    )
+                )
+
+        with self._trava:
+            for posicao in faltando:
+                documento_id, marcador = chaves[posicao]
+                entrada = em_disco.get(documento_id)
+                if entrada and entrada[0] == marcador:
+                    self._memoria.guardar((colecao, documento_id), entrada)
+                    resultado[posicao] = entrada[1:]
+                    self.contadores["acertos_disco"] += 1
+
+        return resultado
+
+    def guardar(self, colecao, entradas):
+        """
+        Grava (ou substitui) as entradas [(documento_id, marcador, document_hash, caracteres)]
+        """
+        agora = time.time()
+        with conectar(self.arquivo) as conexao:
+            conexao.executemany(
+                "INSERT OR REPLACE INTO hashes "
+                "(colecao, documento_id, marcador, document_hash, caracteres, calculado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(colecao, *entrada, agora) for entrada in entradas]
+            )
+        with self._trava:
+            for documento_id, marcador, document_hash, caracteres in entradas:
+                self._memoria.guardar((colecao, documento_id), (marcador, document_hash, caracteres))
+            self.contadores["calculados"] += len(entradas)
+
+    # ---------- Consultas ----------
+
+    def obter(self, colecao, documentos, pool=None):
+        """
+        Retorna (document_hash, caracteres) de cada documento da `colecao`
+        (nome completo, database.coleção), na mesma ordem.
+        Só os documentos sem entrada válida são hasheados (no pool de processos,
+        quando valer a pena); os novos hashes são gravados no cache.
+        Os documentos precisam trazer todos os campos que entram no hash
+        """
+        chaves = [(str(documento['_id']), marcador_conteudo(documento)) for documento in documentos]
+        resultado = self.consultar(colecao, chaves)
+
+        faltando = [posicao for posicao, entrada in enumerate(resultado) if entrada is None]
+        if faltando:
+            calculados = iterar_resultados((documentos[posicao] for posicao in faltando), hash_e_caracteres, pool=pool)
+            entradas = []
+            for posicao, (hash_hex, caracteres) in zip(faltando, calculados):
+                resultado[posicao] = (hash_hex, caracteres)
+                entradas.append((*chaves[posicao], hash_hex, caracteres))
+            self.guardar(colecao, entradas)
+
+        return resultado
+
+    def estatisticas(self):
+        """
+        Retorna os contadores de acerto/cálculo e o tamanho de cada nível
+        """
+        with conectar(self.arquivo) as conexao:
+            em_disco = conexao.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        with self._trava:
+            return {**self.contadores, "em_memoria": len(self._memoria), "em_disco": em_disco}
+
+@st.cache_resource
+def obter_cache_hashes():
+    """
+    Retorna o cache de hashes de documentos, compartilhado entre sessões e páginas
+    """
+    return CacheHashes()
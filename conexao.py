@@ -0,0 +1,94 @@
+import hashlib
+import time
+import streamlit as st
+from pymongo import MongoClient
+from indices import preparar_indices
+
+# ==================== CONSTANTES ====================
+TIMEOUT_SELECAO_SERVIDOR_MS = 5000
+TAMANHO_MAXIMO_POOL = 20
+TAMANHO_MINIMO_POOL = 1
+# Conexões ociosas no pool são fechadas pelo driver após este tempo
+TEMPO_OCIOSO_MAXIMO_MS = 5 * 60 * 1000
+# Clientes são descartados do cache após este tempo (segundos)
+TTL_CLIENTE = 30 * 60
+# Intervalo mínimo entre verificações de saúde (ping) do mesmo cliente
+INTERVALO_VERIFICACAO_SAUDE = 30
+# Momento do último ping bem-sucedido, guardado no próprio cliente: a marca
+# some com ele, sem depender de id() (reaproveitado por objetos novos)
+ATRIBUTO_ULTIMA_VERIFICACAO = "_prontuarios_ultima_verificacao"
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def montar_uri(usuario, senha, host, database):
+    """
+    Monta a URI de conexão SRV do MongoDB Atlas
+    """
+    return f"mongodb+srv://{usuario}:{senha}@{host}/{database}?retryWrites=true&w=majority"
+
+def _cliente_saudavel(client):
+    """
+    Verificação de saúde usada pelo st.cache_resource antes de reutilizar
+    um cliente. O ping só é repetido após INTERVALO_VERIFICACAO_SAUDE segundos.
+    Se o ping falhar, a entrada sai do cache e os próximos chamadores recebem
+    um cliente novo. O cliente antigo não é fechado: outras sessões, o
+    rastreador de confirmações e os change streams podem estar usando-o (o
+    driver se reconecta sozinho) e ele é liberado quando deixa de ser referenciado.
+    """
+    agora = time.monotonic()
+    if agora - getattr(client, ATRIBUTO_ULTIMA_VERIFICACAO, 0) < INTERVALO_VERIFICACAO_SAUDE:
+        return True
+    
+    try:
+        client.admin.command('ping')
+        setattr(client, ATRIBUTO_ULTIMA_VERIFICACAO, agora)
+        return True
+    except Exception:
+        setattr(client, ATRIBUTO_ULTIMA_VERIFICACAO, 0)
+        return False
+
+@st.cache_resource(ttl=TTL_CLIENTE, validate=_cliente_saudavel, show_spinner=False)
+def _criar_cliente(usuario, host, database, digest_senha, _mongo_uri,
+                   max_pool_size, min_pool_size, max_idle_time_ms):
+    """
+    Cria o MongoClient com pool de conexões. O cache é indexado por
+    (usuário, host, database, digest da senha); a URI com a senha
+    em texto puro não entra na chave do cache.
+    """
+    client = MongoClient(
+        _mongo_uri,
+        serverSelectionTimeoutMS=TIMEOUT_SELECAO_SERVIDOR_MS,
+        maxPoolSize=max_pool_size,
+        minPoolSize=min_pool_size,
+        maxIdleTimeMS=max_idle_time_ms
+    )
+    # Falha cedo (e sem ir para o cache) se credenciais ou host forem inválidos
+    client.admin.command('ping')
+    setattr(client, ATRIBUTO_ULTIMA_VERIFICACAO, time.monotonic())
+    return client
+
+# ==================== GERENCIADOR DE CONEXÕES ====================
+
+def obter_cliente(usuario, senha, host, database,
+                  max_pool_size=TAMANHO_MAXIMO_POOL,
+                  min_pool_size=TAMANHO_MINIMO_POOL,
+                  max_idle_time_ms=TEMPO_OCIOSO_MAXIMO_MS):
+    """
+    Retorna um MongoClient compartilhado entre reruns, páginas e sessões.
+    O cliente não deve ser fechado por quem o utiliza.
+    """
+    digest_senha = hashlib.sha256(senha.encode('utf-8')).hexdigest()
+    return _criar_cliente(
+        usuario, host, database, digest_senha,
+        montar_uri(usuario, senha, host, database),
+        max_pool_size, min_pool_size, max_idle_time_ms
+    )
+
+def obter_colecao(usuario, senha, host, database, collection):
+    """
+    Atalho para obter a coleção a partir do cliente compartilhado.
+    Na primeira vez em cada processo, garante os índices da coleção
+    """
+    colecao = obter_cliente(usuario, senha, host, database)[database][collection]
+    preparar_indices(host, colecao)
+    return colecao
@@ -0,0 +1,257 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from bson import json_util
+from provedor_web3 import obter_web3
+from web3.exceptions import TransactionNotFound
+from registro_lote import operacao_blockchain_info, verificacao_do_evento
+from armazenamento import caminho_dados, conectar
+
+# ==================== CONSTANTES ====================
+# Nomes relativos são resolvidos em armazenamento.DIRETORIO_DADOS
+ARQUIVO_FILA = os.environ.get("PRONTUARIOS_FILA_CONFIRMACOES", "confirmacoes_pendentes.sqlite3")
+INTERVALO_CONSULTA = 5  # segundos entre rodadas de consulta de recibos
+TAMANHO_LOTE_CONSULTA = 50
+MAX_CONSULTAS_PARALELAS = 8
+PRAZO_CONFIRMACAO = 3600  # segundos até uma transação sem recibo passar a desconhecida
+# Transações desconhecidas ainda podem ser mineradas: o recibo é reconsultado neste intervalo
+INTERVALO_RECONSULTA_DESCONHECIDA = 600
+
+STATUS_PENDENTE = "pendente"
+STATUS_CONFIRMADA = "confirmada"
+STATUS_REVERTIDA = "revertida"
+STATUS_DESCONHECIDA = "desconhecida"
+
+_ESQUEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS transacoes (
+        tx_hash TEXT PRIMARY KEY,
+        colecao TEXT NOT NULL,
+        itens TEXT NOT NULL,
+        registered_by TEXT NOT NULL,
+        status TEXT NOT NULL,
+        enviada_em REAL NOT NULL,
+        atualizada_em REAL NOT NULL,
+        bloco INTEGER,
+        documentos_atualizados INTEGER NOT NULL DEFAULT 0,
+        erro TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_transacoes_status ON transacoes (status, enviada_em)",
+    # Filas antigas marcavam como expiradas transações que ainda podiam ser mineradas
+    f"UPDATE transacoes SET status = '{STATUS_DESCONHECIDA}' WHERE status = 'expirada'",
+)
+
+logger = logging.getLogger(__name__)
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def chave_colecao(host, database, collection):
+    """
+    Identifica a coleção de destino na fila sem guardar credenciais
+    """
+    return f"{host}/{database}/{collection}"
+
+# ==================== RASTREADOR ====================
+
+class RastreadorConfirmacoes:
+    """
+    Acompanha em segundo plano as transações enviadas ao contrato.
+    As transações ficam em uma fila SQLite persistida em disco; uma thread
+    consulta os recibos em lotes e grava blockchain_info no MongoDB quando
+    confirmam, independente da página que enviou a transação continuar aberta.
+    As coleções de destino são registradas apenas em memória: após reiniciar
+    o servidor, as pendências de uma coleção voltam a ser processadas assim
+    que alguém se conectar a ela novamente.
+    """
+
+    def __init__(self, rpc_url, contract_address, contract_abi, arquivo=ARQUIVO_FILA,
+                 intervalo=INTERVALO_CONSULTA, prazo=PRAZO_CONFIRMACAO):
+        self.w3 = obter_web3(rpc_url)
+        self.contract = self.w3.eth.contract(address=contract_address, abi=contract_abi)
+        self.arquivo = caminho_dados(arquivo)
+        self.intervalo = intervalo
+        self.prazo = prazo
+        self._colecoes = {}
+        self._acordar = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=MAX_CONSULTAS_PARALELAS)
+
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            for comando in _ESQUEMA:
+                conexao.execute(comando)
+
+        self._thread = threading.Thread(target=self._executar, name="rastreador-confirmacoes", daemon=True)
+        self._thread.start()
+
+    # ---------- API usada pelas páginas ----------
+
+    def registrar_colecao(self, chave, collection):
+        """
+        Informa a coleção onde gravar os resultados das transações desta chave
+        """
+        if self._colecoes.get(chave) is not collection:
+            self._colecoes[chave] = collection
+            self._acordar.set()
+
+    def enfileirar(self, tx_hash_hex, chave, itens, registered_by):
+        """
+        Adiciona uma transação enviada à fila. `itens` são os documentos que
+        ela registra: dicionários com _id, hash_hex e, na âncora Merkle, merkle
+        """
+        agora = time.time()
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            conexao.execute(
+                "INSERT OR IGNORE INTO transacoes "
+                "(tx_hash, colecao, itens, registered_by, status, enviada_em, atualizada_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tx_hash_hex, chave, json_util.dumps(itens), registered_by, STATUS_PENDENTE, agora, agora)
+            )
+        self._acordar.set()
+
+    def listar(self, chave, limite=50):
+        """
+        Lista as transações mais recentes da coleção, sem os itens
+        """
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            linhas = conexao.execute(
+                "SELECT tx_hash, status, enviada_em, atualizada_em, bloco, documentos_atualizados, erro, "
+                "json_array_length(itens) AS documentos "
+                "FROM transacoes WHERE colecao = ? ORDER BY enviada_em DESC LIMIT ?",
+                (chave, limite)
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def resumo(self, chave):
+        """
+        Retorna a quantidade de transações da coleção por status
+        """
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            linhas = conexao.execute(
+                "SELECT status, COUNT(*) FROM transacoes WHERE colecao = ? GROUP BY status",
+                (chave,)
+            ).fetchall()
+        return {status: quantidade for status, quantidade in linhas}
+
+    def ids_pendentes(self, chave):
+        """
+        Retorna os _id dos documentos com transação ainda sem recibo (pendente
+        ou desconhecida), que não devem ser enviados de novo
+        """
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            linhas = conexao.execute(
+                "SELECT itens FROM transacoes WHERE colecao = ? AND status IN (?, ?)",
+                (chave, STATUS_PENDENTE, STATUS_DESCONHECIDA)
+            ).fetchall()
+        return [item['_id'] for (itens,) in linhas for item in json_util.loads(itens)]
+
+    # ---------- Processamento em segundo plano ----------
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.processar_pendentes()
+            except Exception:
+                logger.exception("Falha ao processar confirmações pendentes")
+
+    def _buscar_recibo(self, tx_hash_hex):
+        """
+        Retorna (recibo, erro). O recibo é None enquanto a transação não foi
+        minerada; `erro` descreve uma falha da consulta, tratada apenas na
+        linha correspondente
+        """
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash_hex), None
+        except TransactionNotFound:
+            return None, None
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    def processar_pendentes(self):
+        """
+        Consulta em paralelo os recibos de um lote de transações pendentes
+        (apenas das coleções registradas) e grava os resultados. Transações
+        desconhecidas voltam a ser consultadas a cada
+        INTERVALO_RECONSULTA_DESCONHECIDA segundos.
+        Retorna a quantidade de transações consultadas
+        """
+        colecoes = list(self._colecoes)
+        if not colecoes:
+            return 0
+
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            linhas = conexao.execute(
+                "SELECT tx_hash, colecao, itens, registered_by, status, enviada_em FROM transacoes "
+                f"WHERE colecao IN ({','.join('?' * len(colecoes))}) "
+                "AND (status = ? OR (status = ? AND atualizada_em <= ?)) "
+                "ORDER BY atualizada_em LIMIT ?",
+                (*colecoes, STATUS_PENDENTE, STATUS_DESCONHECIDA,
+                 time.time() - INTERVALO_RECONSULTA_DESCONHECIDA, TAMANHO_LOTE_CONSULTA)
+            ).fetchall()
+
+        if not linhas:
+            return 0
+
+        recibos = self._pool.map(self._buscar_recibo, [linha['tx_hash'] for linha in linhas])
+
+        for linha, (recibo, erro_consulta) in zip(linhas, recibos):
+            try:
+                self._concluir(linha, recibo, erro_consulta)
+            except Exception:
+                logger.exception("Falha ao gravar a confirmação de %s", linha['tx_hash'])
+
+        return len(linhas)
+
+    def _concluir(self, linha, recibo, erro_consulta=None):
+        agora = time.time()
+        bloco = None
+        atualizados = 0
+        erro = None
+
+        if erro_consulta is not None:
+            # A consulta falhou (ex.: RPC indisponível): a linha mantém o status e é reconsultada
+            status = linha['status']
+            erro = f"Falha ao consultar o recibo: {erro_consulta}"
+        elif recibo is None:
+            if linha['status'] == STATUS_PENDENTE and agora - linha['enviada_em'] < self.prazo:
+                status = STATUS_PENDENTE
+            else:
+                # Sem recibo após o prazo a transação pode ter sido descartada ou ainda
+                # ser minerada: continua sendo consultada, sem ser dada como falha
+                status = STATUS_DESCONHECIDA
+                erro = "Recibo não encontrado dentro do prazo; a transação continua sendo consultada"
+        elif recibo.status != 1:
+            status = STATUS_REVERTIDA
+            bloco = recibo.blockNumber
+            erro = "Transação revertida"
+        else:
+            status = STATUS_CONFIRMADA
+            bloco = recibo.blockNumber
+            verificacao = verificacao_do_evento(self.contract, recibo)
+            operacoes = [
+                operacao_blockchain_info(
+                    self.contract, item, linha['tx_hash'], recibo, verificacao, linha['registered_by']
+                )
+                for item in json_util.loads(linha['itens'])
+            ]
+            resultado = self._colecoes[linha['colecao']].bulk_write(operacoes, ordered=False)
+            atualizados = resultado.modified_count
+
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            conexao.execute(
+                "UPDATE transacoes SET status = ?, atualizada_em = ?, bloco = ?, "
+                "documentos_atualizados = ?, erro = ? WHERE tx_hash = ?",
+                (status, agora, bloco, atualizados, erro, linha['tx_hash'])
+            )
+
+@st.cache_resource
+def obter_rastreador(rpc_url, contract_address, _contract_abi):
+    """
+    Retorna o rastreador de confirmações do processo (um por contrato),
+    compartilhado entre sessões e páginas
+    """
+    return RastreadorConfirmacoes(rpc_url, contract_address, _contract_abi)
@@ -0,0 +1,128 @@
+from pymongo import ASCENDING
+from integridade import PROJECAO_VERIFICACAO
+
+# ==================== PROJEÇÕES ====================
+VISAO_CABECALHO = "cabecalho"
+VISAO_HASH = "hash"
+VISAO_COMPLETA = "completa"
+
+PROJECOES = {
+    # Apenas o que os cabeçalhos das listas exibem
+    VISAO_CABECALHO: {
+        '_id': 1,
+        'idAtendimento': 1,
+        'cnsPaciente': 1,
+        'tipoAtendimento': 1,
+        'blockchain_info.document_hash': 1,
+        'blockchain_info.network': 1,
+        'blockchain_info.registered_at': 1
+    },
+    # Conteúdo que entra no hash e os dados de blockchain_info usados na verificação
+    VISAO_HASH: PROJECAO_VERIFICACAO,
+    VISAO_COMPLETA: None
+}
+
+def projetar(documento, visao=VISAO_CABECALHO):
+    """
+    Aplica em memória a projeção da visão a um documento já lido, com o
+    mesmo resultado da consulta com essa projeção. Aceita a visão completa
+    e projeções de inclusão (VISAO_CABECALHO)
+    """
+    projecao = PROJECOES[visao]
+    if projecao is None:
+        return documento
+    if not all(projecao.values()):
+        raise ValueError(f"Projeção de exclusão não suportada em memória: {visao}")
+    
+    projetado = {}
+    for caminho in projecao:
+        origem, destino = documento, projetado
+        *pais, campo = caminho.split('.')
+        for pai in pais:
+            origem = origem.get(pai)
+            if not isinstance(origem, dict):
+                break
+            destino = destino.setdefault(pai, {})
+        else:
+            if campo in origem:
+                destino[campo] = origem[campo]
+    return projetado
+
+def buscar_documento(collection, _id, visao=VISAO_COMPLETA):
+    """
+    Busca um documento pelo _id trazendo apenas os campos da visão indicada
+    """
+    return collection.find_one({'_id': _id}, PROJECOES[visao])
+
+def buscar_documentos(collection, ids, visao=VISAO_COMPLETA):
+    """
+    Busca vários documentos pelo _id em uma única consulta, trazendo apenas
+    os campos da visão indicada (a ordem do resultado não é garantida)
+    """
+    return list(collection.find({'_id': {'$in': list(ids)}}, PROJECOES[visao]))
+
+# ==================== CONTAGENS ====================
+
+def contar_documentos(collection):
+    """
+    Retorna o total de documentos a partir dos metadados da coleção,
+    sem percorrer os documentos (estimated_document_count)
+    """
+    return collection.estimated_document_count()
+
+# ==================== PAGINAÇÃO POR CHAVE (KEYSET) ====================
+
+def buscar_pagina(collection, apos_id=None, limite=10, visao=VISAO_COMPLETA):
+    """
+    Busca até `limite` documentos com _id maior que `apos_id`,
+    em ordem crescente de _id (consulta por intervalo no índice _id)
+    """
+    filtro = {'_id': {'$gt': apos_id}} if apos_id is not None else {}
+    return list(collection.find(filtro, PROJECOES[visao]).sort('_id', ASCENDING).limit(limite))
+
+def localizar_ancora(collection, pagina, docs_por_pagina, fronteiras=None):
+    """
+    Localiza o _id do último documento da página anterior a `pagina`.
+    Percorre apenas o índice _id (projeção somente de _id), a partir da
+    âncora conhecida mais próxima abaixo de `pagina` em `fronteiras`.
+    O custo é proporcional à distância até essa âncora (skip no índice):
+    apenas avançar ou voltar para páginas vizinhas tem custo constante.
+    Retorna (encontrado, _id)
+    """
+    if pagina <= 1:
+        return True, None
+    
+    conhecidas = [p for p in (fronteiras or {}) if p < pagina]
+    pagina_base = max(conhecidas, default=1)
+    ancora_base = fronteiras[pagina_base] if conhecidas else None
+    filtro = {'_id': {'$gt': ancora_base}} if ancora_base is not None else {}
+    
+    resultado = list(
+        collection.find(filtro, {'_id': 1})
+        .sort('_id', ASCENDING)
+        .skip((pagina - pagina_base) * docs_por_pagina - 1)
+        .limit(1)
+    )
+    if not resultado:
+        return False, None
+    return True, resultado[0]['_id']
+
+def buscar_pagina_numerada(collection, pagina, docs_por_pagina, fronteiras, visao=VISAO_COMPLETA):
+    """
+    Busca a página `pagina` usando consultas por chave (_id > último visto).
+    `fronteiras` mapeia número da página -> _id âncora e deve ser preservado
+    entre reruns (st.session_state) para que páginas vizinhas não precisem
+    localizar a âncora novamente. Saltos para páginas distantes das já
+    visitadas custam um skip no índice _id (ver localizar_ancora).
+    Retorna [] para páginas além do fim da coleção.
+    """
+    if pagina not in fronteiras:
+        encontrado, ancora = localizar_ancora(collection, pagina, docs_por_pagina, fronteiras)
+        if not encontrado:
+            return []
+        fronteiras[pagina] = ancora
+    
+    documentos = buscar_pagina(collection, fronteiras[pagina], docs_por_pagina, visao)
+    if documentos:
+        fronteiras[pagina + 1] = documentos[-1]['_id']
+    return documentos
@@ -0,0 +1,201 @@
+import re
+from collections import Counter
+import bson
+import streamlit as st
+
+# ==================== CONSTANTES ====================
+# Tempo (segundos) em que as estatísticas de uma coleção são reaproveitadas
+TTL_ESTATISTICAS = 60
+SEM_VALOR = "(não informado)"
+
+# Mesmo critério de FILTRO_COM_HASH: document_hash presente e não vazio
+_REGISTRADO = {'$ne': [{'$ifNull': ['$blockchain_info.document_hash', '']}, '']}
+# registered_at é gravado em ISO 8601, mas pode ter sido gravado como Date:
+# convertido para texto, os 7 primeiros caracteres são AAAA-MM nos dois casos.
+# Valores em outro formato ficam sem mês; com o prefixo conferido (só ASCII),
+# o corte em bytes de $substr não parte caracteres
+_REGISTRADO_EM = {'$toString': {'$ifNull': ['$blockchain_info.registered_at', '']}}
+PADRAO_MES = "^[0-9]{4}-[0-9]{2}"
+_MES = {'$cond': [
+    {'$regexMatch': {'input': _REGISTRADO_EM, 'regex': PADRAO_MES}},
+    {'$substr': [_REGISTRADO_EM, 0, 7]},
+    ''
+]}
+
+def _contagens(agrupar_por):
+    return [
+        {'$group': {
+            '_id': agrupar_por,
+            'documentos': {'$sum': 1},
+            'com_blockchain': {'$sum': {'$cond': ['$registrado', 1, 0]}}
+        }},
+        {'$sort': {'documentos': -1, '_id': 1}}
+    ]
+
+PIPELINE_ESTATISTICAS = [
+    # Apenas os campos usados nas contagens seguem para o $facet
+    {'$project': {
+        '_id': 0,
+        'tipo': '$tipoAtendimento',
+        'registrado': _REGISTRADO,
+        'mes': _MES,
+        'rede': '$blockchain_info.network'
+    }},
+    {'$facet': {
+        'totais': _contagens(None),
+        'por_tipo': _contagens('$tipo'),
+        'por_mes': [
+            {'$match': {'registrado': True}},
+            {'$group': {'_id': '$mes', 'documentos': {'$sum': 1}}},
+            {'$sort': {'_id': 1}}
+        ],
+        'por_rede': [{'$match': {'registrado': True}}] + _contagens('$rede')
+    }}
+]
+
+# ==================== MOTOR DE ESTATÍSTICAS ====================
+
+def calcular_estatisticas(collection):
+    """
+    Calcula no servidor, com uma única agregação $facet, o total de documentos,
+    quantos têm e não têm registro blockchain e as quebras por tipoAtendimento,
+    por mês de registro e por rede. Apenas o resultado trafega pela rede.
+    """
+    resultado = next(collection.aggregate(PIPELINE_ESTATISTICAS))
+    totais = resultado['totais'][0] if resultado['totais'] else {'documentos': 0, 'com_blockchain': 0}
+
+    return {
+        "documentos": totais['documentos'],
+        "com_blockchain": totais['com_blockchain'],
+        "sem_blockchain": totais['documentos'] - totais['com_blockchain'],
+        "por_tipo": [
+            {"tipoAtendimento": item['_id'] if item['_id'] is not None else SEM_VALOR,
+             "documentos": item['documentos'], "com_blockchain": item['com_blockchain']}
+            for item in resultado['por_tipo']
+        ],
+        "por_mes": [
+            {"mes": item['_id'] or SEM_VALOR, "registros": item['documentos']}
+            for item in resultado['por_mes']
+        ],
+        "por_rede": [
+            {"rede": item['_id'] if item['_id'] is not None else SEM_VALOR, "registros": item['documentos']}
+            for item in resultado['por_rede']
+        ]
+    }
+
+# ==================== ESTATÍSTICAS INCREMENTAIS ====================
+
+class _ValorComposto:
+    """
+    Subdocumento ou array usado como chave de contagem. Como no $group, valores
+    iguais (comparados pelo BSON, com a ordem dos campos) contam juntos
+    """
+    __slots__ = ('valor', '_bson')
+
+    def __init__(self, valor):
+        self.valor = valor
+        self._bson = bson.encode({'v': valor})
+
+    def __eq__(self, outro):
+        return isinstance(outro, _ValorComposto) and self._bson == outro._bson
+
+    def __hash__(self):
+        return hash(self._bson)
+
+    def __str__(self):
+        return str(self.valor)
+
+def _chave(valor):
+    return _ValorComposto(valor) if isinstance(valor, (dict, list)) else valor
+
+def _valor(chave):
+    return chave.valor if isinstance(chave, _ValorComposto) else chave
+
+def classificar_documento(doc):
+    """
+    Aplica a um documento em memória os mesmos critérios do $project de
+    PIPELINE_ESTATISTICAS. Retorna (tipo, registrado, mes, rede)
+    """
+    blockchain_info = doc.get('blockchain_info')
+    if not isinstance(blockchain_info, dict):
+        blockchain_info = {}
+    registrado_em = blockchain_info.get('registered_at')
+    # str() de um datetime começa com AAAA-MM, como o $toString de um Date
+    registrado_em = str(registrado_em) if registrado_em is not None else ''
+    document_hash = blockchain_info.get('document_hash')
+    return (
+        _chave(doc.get('tipoAtendimento')),
+        # Como _REGISTRADO: só ausente, None e '' contam como não registrado (0 e False contam)
+        document_hash is not None and document_hash != '',
+        registrado_em[:7] if re.match(PADRAO_MES, registrado_em) else '',
+        _chave(blockchain_info.get('network'))
+    )
+
+class EstatisticasIncrementais:
+    """
+    Contagens de calcular_estatisticas mantidas em memória: cada documento
+    inserido, alterado ou removido ajusta apenas as suas próprias contagens,
+    sem nova agregação na coleção
+    """
+
+    def __init__(self):
+        self._classes = Counter()
+
+    def adicionar(self, doc):
+        self._classes[classificar_documento(doc)] += 1
+
+    def remover(self, doc):
+        classe = classificar_documento(doc)
+        self._classes[classe] -= 1
+        if self._classes[classe] <= 0:
+            del self._classes[classe]
+
+    def resultado(self):
+        """
+        Retorna as contagens no mesmo formato de calcular_estatisticas
+        """
+        por_tipo = Counter()
+        registrados_por_tipo = Counter()
+        por_mes = Counter()
+        por_rede = Counter()
+
+        for (tipo, registrado, mes, rede), quantidade in self._classes.items():
+            por_tipo[tipo] += quantidade
+            if registrado:
+                registrados_por_tipo[tipo] += quantidade
+                por_mes[mes] += quantidade
+                por_rede[rede] += quantidade
+
+        documentos = sum(por_tipo.values())
+        com_blockchain = sum(registrados_por_tipo.values())
+        # Mesma ordenação dos $sort do pipeline (None antes dos demais valores)
+        ordem = lambda item: (-item[1], item[0] is not None, str(item[0] or ''))
+
+        return {
+            "documentos": documentos,
+            "com_blockchain": com_blockchain,
+            "sem_blockchain": documentos - com_blockchain,
+            "por_tipo": [
+                {"tipoAtendimento": _valor(tipo) if tipo is not None else SEM_VALOR,
+                 "documentos": quantidade, "com_blockchain": registrados_por_tipo[tipo]}
+                for tipo, quantidade in sorted(por_tipo.items(), key=ordem)
+            ],
+            "por_mes": [
+                {"mes": mes or SEM_VALOR, "registros": quantidade}
+                for mes, quantidade in sorted(por_mes.items())
+            ],
+            "por_rede": [
+                {"rede": _valor(rede) if rede is not None else SEM_VALOR, "registros": quantidade}
+                for rede, quantidade in sorted(por_rede.items(), key=ordem)
+            ]
+        }
+
+@st.cache_data(ttl=TTL_ESTATISTICAS, show_spinner=False)
+def obter_estatisticas(usuario, host, database, nome_colecao, _collection):
+    """
+    calcular_estatisticas com cache de curta duração por usuário e coleção,
+    para que reruns e trocas de página não repitam a agregação. O usuário
+    faz parte da chave: estatísticas obtidas com uma credencial não são
+    servidas a outra, que pode nem ter acesso à coleção
+    """
+    return calcular_estatisticas(_collection)
@@ -0,0 +1,364 @@
+import gzip
+import os
+import tempfile
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson import ObjectId, Decimal128, Code, Regex
+from bson.json_util import dumps, default, DEFAULT_JSON_OPTIONS
+
+# ==================== CONSTANTES ====================
+TAMANHO_LOTE_PADRAO = 1000
+# Acima deste tamanho (bytes) o relatório deixa a memória e passa para o disco
+LIMITE_MEMORIA_RELATORIO = 8 * 1024 * 1024
+
+FORMATO_JSON = "json"
+FORMATO_NDJSON = "ndjson"
+
+# Linhas por row group do Parquet (também é o lote usado na inferência de tipos)
+TAMANHO_GRUPO_PARQUET = 10_000
+
+_EPOCA = datetime(1970, 1, 1)
+
+# ==================== FUNÇÃO DE NORMALIZAÇÃO ====================
+
+def _valor_estendido(valor):
+    """
+    Converte um valor BSON (ObjectId, datetime, Decimal128, Binary...) na sua
+    forma Extended JSON, exatamente como bson.json_util.dumps faria.
+    Tipos nativos do JSON são retornados sem alteração.
+    """
+    try:
+        return default(valor, DEFAULT_JSON_OPTIONS)
+    except TypeError:
+        return valor
+
+def _valor_nativo(valor):
+    """
+    Mantém o tipo de um valor escalar (para exportação colunar tipada)
+    """
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return int(valor)
+    return valor
+
+def _valor_texto(valor):
+    """
+    Converte um valor escalar em texto como após a ida e volta por JSON
+    (Int64 vira int, float mantém sua representação mais curta)
+    """
+    if isinstance(valor, bool) or valor is None:
+        return str(valor)
+    if isinstance(valor, int):
+        return str(int(valor))
+    if isinstance(valor, float):
+        return str(float(valor))
+    return str(valor)
+
+def normalizar_documento(doc, sep='.', tipado=False):
+    """
+    Normaliza um documento JSON/BSON, achatando suas chaves (flattening)
+    e convertendo valores para string de forma segura.
+    Percorre os tipos BSON diretamente, em uma única passada iterativa,
+    produzindo as mesmas chaves da forma Extended JSON (ex.: _id.$oid)
+    sem serializar e desserializar o documento inteiro.
+    Com `tipado=True`, números, booleanos e datas mantêm seus tipos
+    (usado na exportação colunar); listas continuam como texto JSON.
+    """
+    dados = {}
+    pilha = [('', iter(doc.items()))]
+
+    while pilha:
+        chave_pai, itens = pilha[-1]
+
+        for k, v in itens:
+            nova_chave = f"{chave_pai}{sep}{k}" if chave_pai else k
+
+            if isinstance(v, (Code, Regex)):
+                # Code é subclasse de str, mas no Extended JSON vira {"$code", "$scope"}
+                pilha.append((nova_chave, iter(_valor_estendido(v).items())))
+                break
+
+            if isinstance(v, str):
+                dados[nova_chave] = v
+                continue
+
+            if hasattr(v, 'items'):
+                # Subdocumento: desce um nível e retoma este depois
+                pilha.append((nova_chave, iter(v.items())))
+                break
+
+            if hasattr(v, '__iter__') and not isinstance(v, bytes):
+                dados[nova_chave] = dumps(v, ensure_ascii=False)
+                continue
+
+            # Tipos BSON mais comuns em prontuários, sem passar por default()
+            if isinstance(v, ObjectId):
+                dados[f"{nova_chave}{sep}$oid"] = str(v)
+                continue
+            if tipado and isinstance(v, datetime):
+                dados[f"{nova_chave}{sep}$date"] = v
+                continue
+            if isinstance(v, datetime) and v.tzinfo is None and v >= _EPOCA:
+                millis = v.microsecond // 1000
+                fracao = ".%03d" % millis if millis else ""
+                dados[f"{nova_chave}{sep}$date"] = (
+                    f"{v.year:04d}-{v.month:02d}-{v.day:02d}T"
+                    f"{v.hour:02d}:{v.minute:02d}:{v.second:02d}{fracao}Z"
+                )
+                continue
+            if isinstance(v, Decimal128):
+                dados[f"{nova_chave}{sep}$numberDecimal"] = str(v)
+                continue
+
+            v = _valor_estendido(v)
+            if isinstance(v, dict):
+                # Demais tipos BSON (Binary, Timestamp, Regex...) viram subdocumentos
+                pilha.append((nova_chave, iter(v.items())))
+                break
+
+            dados[nova_chave] = _valor_nativo(v) if tipado else _valor_texto(v)
+        else:
+            pilha.pop()
+
+    return dados
+
+# ==================== RELATÓRIO ACHATADO (STREAMING) ====================
+
+def gerar_relatorio_txt(documentos, tamanho_previa=0, exportadores=(), resumir=None):
+    """
+    Percorre os documentos (cursor ou lista) e grava o relatório achatado
+    de forma incremental em um arquivo temporário (SpooledTemporaryFile).
+    Com um cursor, nenhum documento fica retido em memória além do lote corrente.
+    Cada documento também é gravado nos `exportadores` informados
+    (ExportadorJSON, ExportadorParquet) na mesma passada pelo cursor.
+    A prévia guarda os primeiros `tamanho_previa` documentos (todos, com None),
+    ou `resumir(documento)` quando informado.
+    Retorna (arquivo, num_documentos, num_com_blockchain, documentos_previa)
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_RELATORIO, mode='w+b')
+
+    cabecalho = (
+        f"--- RELATÓRIO DE DOCUMENTOS MONGODB (Formato Achatado) ---\n"
+        f"Data de Geração: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        + "-" * 70 + "\n\n"
+    )
+    arquivo.write(cabecalho.encode('utf-8'))
+
+    num_documentos = 0
+    num_com_blockchain = 0
+    documentos_previa = []
+
+    for doc in documentos:
+        dados_achatados = normalizar_documento(doc)
+
+        linhas = [f"== DOCUMENTO {num_documentos + 1} == (ID: {dados_achatados.get('_id.$oid', 'N/A')})\n"]
+        linhas.extend(f"{chave}: {valor}\n" for chave, valor in dados_achatados.items())
+        linhas.append("-" * 70 + "\n\n")
+        arquivo.write(''.join(linhas).encode('utf-8'))
+
+        for exportador in exportadores:
+            exportador.escrever(doc)
+        if doc.get('blockchain_info'):
+            num_com_blockchain += 1
+        if tamanho_previa is None or len(documentos_previa) < tamanho_previa:
+            documentos_previa.append(resumir(doc) if resumir else doc)
+        num_documentos += 1
+
+    arquivo.seek(0)
+    return arquivo, num_documentos, num_com_blockchain, documentos_previa
+
+# ==================== EXPORTAÇÃO JSON (STREAMING) ====================
+
+class ExportadorJSON:
+    """
+    Grava documentos um a um em um arquivo temporário, como array JSON
+    ou NDJSON, com compactação gzip opcional. A memória usada é constante,
+    independentemente do tamanho da coleção.
+    """
+
+    def __init__(self, formato=FORMATO_JSON, compactar=False):
+        self.rotulo = "Formato NDJSON" if formato == FORMATO_NDJSON else "Formato JSON"
+        self.formato = formato
+        self.compactar = compactar
+        self.num_documentos = 0
+        self.arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_RELATORIO, mode='w+b')
+        self._saida = gzip.GzipFile(fileobj=self.arquivo, mode='wb') if compactar else self.arquivo
+
+    def escrever(self, doc):
+        if self.formato == FORMATO_NDJSON:
+            pedaco = dumps(doc, ensure_ascii=False) + "\n"
+        else:
+            # Mesmo resultado de json.dumps(lista, indent=2): um nível extra de indentação por elemento
+            elemento = dumps(doc, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            pedaco = ("[\n  " if self.num_documentos == 0 else ",\n  ") + elemento
+        self._saida.write(pedaco.encode('utf-8'))
+        self.num_documentos += 1
+
+    def finalizar(self):
+        """
+        Fecha o array JSON (e o fluxo gzip) e retorna o arquivo posicionado no início
+        """
+        if self.formato == FORMATO_JSON:
+            self._saida.write(("[]" if self.num_documentos == 0 else "\n]").encode('utf-8'))
+        if self.compactar:
+            self._saida.close()
+        self.arquivo.seek(0)
+        return self.arquivo
+
+    @property
+    def extensao(self):
+        extensao = ".ndjson" if self.formato == FORMATO_NDJSON else ".json"
+        return extensao + (".gz" if self.compactar else "")
+
+    @property
+    def mime(self):
+        if self.compactar:
+            return "application/gzip"
+        return "application/x-ndjson" if self.formato == FORMATO_NDJSON else "application/json"
+
+# ==================== EXPORTAÇÃO COLUNAR (PARQUET) ====================
+
+def _mesclar_tipos(tipo_atual, tipo_novo):
+    """
+    Combina o tipo Arrow já inferido para uma coluna com o tipo de um novo lote.
+    Tipos incompatíveis são promovidos para texto.
+    """
+    if tipo_atual is None or pa.types.is_null(tipo_atual):
+        return tipo_novo
+    if pa.types.is_null(tipo_novo) or tipo_atual == tipo_novo:
+        return tipo_atual
+    if pa.types.is_integer(tipo_atual) and pa.types.is_floating(tipo_novo):
+        return tipo_novo
+    if pa.types.is_floating(tipo_atual) and pa.types.is_integer(tipo_novo):
+        return tipo_atual
+    return pa.string()
+
+def _coluna_arrow(valores):
+    """
+    Converte os valores de uma coluna em um array Arrow, inferindo o tipo.
+    Colunas com tipos misturados no mesmo lote viram texto.
+    """
+    try:
+        return pa.array(valores)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return pa.array([None if v is None else str(v) for v in valores], pa.string())
+
+class ExportadorParquet:
+    """
+    Exporta documentos achatados (mesmas chaves de normalizar_documento)
+    para Parquet com esquema Arrow tipado. O esquema é inferido de forma
+    incremental a cada lote; os lotes ficam em arquivos Arrow temporários
+    e, ao finalizar, cada um vira um row group convertido para o esquema final.
+    Apenas um lote fica em memória por vez.
+    """
+
+    rotulo = "Formato Parquet"
+    extensao = ".parquet"
+    mime = "application/vnd.apache.parquet"
+
+    def __init__(self, tamanho_grupo=TAMANHO_GRUPO_PARQUET):
+        self.tamanho_grupo = tamanho_grupo
+        self.num_documentos = 0
+        self.esquema = {}
+        self.arquivo = None
+        self._linhas = []
+        self._lotes = []
+        self._diretorio = tempfile.TemporaryDirectory()
+
+    def escrever(self, doc):
+        self._linhas.append(normalizar_documento(doc, tipado=True))
+        self.num_documentos += 1
+        if len(self._linhas) >= self.tamanho_grupo:
+            self._gravar_lote()
+
+    def _gravar_lote(self):
+        if not self._linhas:
+            return
+
+        # União das chaves do lote, na ordem em que aparecem
+        colunas = dict.fromkeys(chave for linha in self._linhas for chave in linha)
+        arrays = [_coluna_arrow([linha.get(chave) for linha in self._linhas]) for chave in colunas]
+        tabela = pa.Table.from_arrays(arrays, names=list(colunas))
+
+        for campo in tabela.schema:
+            self.esquema[campo.name] = _mesclar_tipos(self.esquema.get(campo.name), campo.type)
+
+        caminho = os.path.join(self._diretorio.name, f"lote_{len(self._lotes)}.arrow")
+        with pa.OSFile(caminho, 'wb') as saida, pa.ipc.new_file(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        self._lotes.append(caminho)
+        self._linhas = []
+
+    def finalizar(self):
+        """
+        Grava o arquivo Parquet (um row group por lote) e retorna o arquivo
+        posicionado no início
+        """
+        self._gravar_lote()
+
+        esquema = pa.schema([
+            (nome, pa.string() if pa.types.is_null(tipo) else tipo)
+            for nome, tipo in self.esquema.items()
+        ])
+        self.arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_RELATORIO, mode='w+b')
+
+        with pq.ParquetWriter(self.arquivo, esquema, compression='zstd') as escritor:
+            for caminho in self._lotes:
+                with pa.memory_map(caminho) as origem:
+                    tabela = pa.ipc.open_file(origem).read_all()
+
+                colunas = []
+                for campo in esquema:
+                    if campo.name in tabela.column_names:
+                        coluna = tabela.column(campo.name)
+                        if coluna.type != campo.type:
+                            coluna = coluna.cast(campo.type)
+                        colunas.append(coluna)
+                    else:
+                        colunas.append(pa.nulls(tabela.num_rows, campo.type))
+
+                escritor.write_table(pa.Table.from_arrays(colunas, schema=esquema))
+
+        self._diretorio.cleanup()
+        self.arquivo.seek(0)
+        return self.arquivo
+
+def tamanho_relatorio(arquivo):
+    """
+    Retorna o tamanho do relatório em bytes
+    """
+    arquivo.seek(0, os.SEEK_END)
+    tamanho = arquivo.tell()
+    arquivo.seek(0)
+    return tamanho
+
+def ler_trecho_relatorio(arquivo, inicio, tamanho):
+    """
+    Lê um trecho do relatório sem carregar o restante do arquivo: as linhas
+    que começam entre os bytes `inicio` e `inicio + tamanho`. Trechos
+    consecutivos (inicio = 0, tamanho, 2 * tamanho...) cobrem o relatório
+    sem repetir nem cortar linhas.
+    """
+    if inicio > 0:
+        # Lê a partir do byte anterior para saber se `inicio` é começo de linha
+        arquivo.seek(inicio - 1)
+        dados = arquivo.read(tamanho + 1)
+        dados = dados[dados.find(b'\n') + 1:] if b'\n' in dados else b''
+    else:
+        arquivo.seek(0)
+        dados = arquivo.read(tamanho)
+    
+    # Completa a última linha, que pode ter sido cortada pelo limite do trecho
+    if dados and not dados.endswith(b'\n'):
+        dados += arquivo.readline()
+    arquivo.seek(0)
+    return dados.decode('utf-8', errors='ignore')
+
+def conteudo_para_download(arquivo):
+    """
+    Retorna os bytes do relatório no formato aceito pelo st.download_button
+    """
+    arquivo.seek(0)
+    dados = arquivo.read()
+    arquivo.seek(0)
+    return dados
@@ -0,0 +1,230 @@
+import os
+import threading
+import streamlit as st
+from eth_utils import event_abi_to_log_topic
+from provedor_web3 import obter_web3
+from armazenamento import caminho_dados, conectar
+
+# ==================== CONSTANTES ====================
+# Nomes relativos são resolvidos em armazenamento.DIRETORIO_DADOS
+ARQUIVO_INDICE = os.environ.get("PRONTUARIOS_INDICE_EVENTOS", "indice_eventos.sqlite3")
+# Bloco de implantação do contrato, quando conhecido (evita a busca binária inicial)
+BLOCO_INICIAL = int(os.environ.get("PRONTUARIOS_BLOCO_INICIAL_CONTRATO", "0"))
+PROFUNDIDADE_CONFIRMACAO = 5  # blocos mais recentes não indexados (proteção contra reorg)
+INTERVALO_INICIAL_BLOCOS = 2_000
+INTERVALO_MINIMO_BLOCOS = 10
+INTERVALO_MAXIMO_BLOCOS = 50_000
+
+ABI_EVENTOS = [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "bytes32", "name": "hash", "type": "bytes32"},
+            {"indexed": True, "internalType": "address", "name": "provider", "type": "address"},
+            {"indexed": False, "internalType": "string", "name": "recordType", "type": "string"},
+            {"indexed": False, "internalType": "string", "name": "recordId", "type": "string"},
+            {"indexed": False, "internalType": "uint256", "name": "timestamp", "type": "uint256"}
+        ],
+        "name": "HashRegistered",
+        "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "bytes32", "name": "hash", "type": "bytes32"},
+            {"indexed": True, "internalType": "address", "name": "invalidatedBy", "type": "address"}
+        ],
+        "name": "HashInvalidated",
+        "type": "event"
+    }
+]
+
+_ESQUEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS registros (
+        contrato TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        record_type TEXT,
+        record_id TEXT,
+        timestamp INTEGER,
+        block_number INTEGER NOT NULL,
+        transaction_hash TEXT NOT NULL,
+        invalidado INTEGER NOT NULL DEFAULT 0,
+        invalidado_por TEXT,
+        invalidado_bloco INTEGER,
+        invalidado_transacao TEXT,
+        PRIMARY KEY (contrato, hash)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS estado (
+        contrato TEXT PRIMARY KEY,
+        ultimo_bloco INTEGER NOT NULL
+    )
+    """,
+)
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def _normalizar_hash(hash_hex):
+    hash_hex = hash_hex.strip().lower()
+    return hash_hex[2:] if hash_hex.startswith('0x') else hash_hex
+
+def localizar_bloco_de_implantacao(w3, endereco, inicio=0, fim=None):
+    """
+    Localiza por busca binária o primeiro bloco em que o contrato possui código
+    (requer um nó com histórico de estado, como o Alchemy)
+    """
+    fim = w3.eth.block_number if fim is None else fim
+
+    while inicio < fim:
+        meio = (inicio + fim) // 2
+        if w3.eth.get_code(endereco, block_identifier=meio):
+            fim = meio
+        else:
+            inicio = meio + 1
+
+    return inicio
+
+# ==================== ÍNDICE ====================
+
+class IndiceEventos:
+    """
+    Índice local (SQLite) hash → registro, construído a partir dos eventos
+    HashRegistered e HashInvalidated do contrato.
+    A sincronização percorre os logs em intervalos de blocos, ajustando o tamanho
+    do intervalo ao limite do provedor, e grava o último bloco indexado na
+    mesma transação dos eventos, retomando de onde parou na próxima execução.
+    """
+
+    def __init__(self, rpc_url, contract_address, arquivo=ARQUIVO_INDICE):
+        self.w3 = obter_web3(rpc_url)
+        self.contract = self.w3.eth.contract(address=contract_address, abi=ABI_EVENTOS)
+        self.contrato = contract_address.lower()
+        self.arquivo = caminho_dados(arquivo)
+        self._trava = threading.Lock()
+        self._evento_registro = self.contract.events.HashRegistered()
+        self._evento_invalidacao = self.contract.events.HashInvalidated()
+        self._topicos = {
+            event_abi_to_log_topic(abi): abi["name"] for abi in ABI_EVENTOS
+        }
+
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            for comando in _ESQUEMA:
+                conexao.execute(comando)
+
+    # ---------- Consulta ----------
+
+    def consultar(self, hash_hex):
+        """
+        Busca o registro de um hash no índice local. Retorna um dicionário ou None
+        """
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            linha = conexao.execute(
+                "SELECT * FROM registros WHERE contrato = ? AND hash = ?",
+                (self.contrato, _normalizar_hash(hash_hex))
+            ).fetchone()
+        return dict(linha) if linha else None
+
+    def estado(self):
+        """
+        Retorna (ultimo_bloco_indexado ou None, quantidade de registros)
+        """
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            linha = conexao.execute(
+                "SELECT ultimo_bloco FROM estado WHERE contrato = ?", (self.contrato,)
+            ).fetchone()
+            total = conexao.execute(
+                "SELECT COUNT(*) FROM registros WHERE contrato = ?", (self.contrato,)
+            ).fetchone()[0]
+        return (linha[0] if linha else None), total
+
+    # ---------- Sincronização ----------
+
+    def _gravar_intervalo(self, logs, ate_bloco):
+        """
+        Grava os eventos de um intervalo e o novo último bloco em uma única transação
+        """
+        logs = sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+
+        with conectar(self.arquivo, linhas_nomeadas=True) as conexao:
+            for log in logs:
+                nome = self._topicos.get(bytes(log['topics'][0]))
+                if nome == "HashRegistered":
+                    evento = self._evento_registro.process_log(log)
+                    args = evento['args']
+                    conexao.execute(
+                        "INSERT OR REPLACE INTO registros "
+                        "(contrato, hash, provider, record_type, record_id, timestamp, block_number, transaction_hash) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (self.contrato, _normalizar_hash(self.w3.to_hex(args['hash'])), args['provider'], args['recordType'],
+                         args['recordId'], args['timestamp'], evento['blockNumber'],
+                         self.w3.to_hex(evento['transactionHash']))
+                    )
+                elif nome == "HashInvalidated":
+                    evento = self._evento_invalidacao.process_log(log)
+                    args = evento['args']
+                    conexao.execute(
+                        "UPDATE registros SET invalidado = 1, invalidado_por = ?, invalidado_bloco = ?, "
+                        "invalidado_transacao = ? WHERE contrato = ? AND hash = ?",
+                        (args['invalidatedBy'], evento['blockNumber'],
+                         self.w3.to_hex(evento['transactionHash']), self.contrato, _normalizar_hash(self.w3.to_hex(args['hash'])))
+                    )
+
+            conexao.execute(
+                "INSERT OR REPLACE INTO estado (contrato, ultimo_bloco) VALUES (?, ?)",
+                (self.contrato, ate_bloco)
+            )
+
+    def sincronizar(self, ao_progredir=None):
+        """
+        Indexa os eventos desde o último bloco indexado até o bloco mais recente
+        com PROFUNDIDADE_CONFIRMACAO confirmações.
+        `ao_progredir(blocos_processados, total_blocos)` é chamado a cada intervalo gravado.
+        Retorna a quantidade de eventos indexados
+        """
+        with self._trava:
+            ultimo_bloco, _ = self.estado()
+            if ultimo_bloco is None:
+                inicio = BLOCO_INICIAL or localizar_bloco_de_implantacao(self.w3, self.contract.address)
+            else:
+                inicio = ultimo_bloco + 1
+
+            bloco_final = self.w3.eth.block_number - PROFUNDIDADE_CONFIRMACAO
+            primeiro_bloco = inicio
+            intervalo = INTERVALO_INICIAL_BLOCOS
+            eventos = 0
+
+            while inicio <= bloco_final:
+                fim = min(inicio + intervalo - 1, bloco_final)
+                try:
+                    logs = self.w3.eth.get_logs({
+                        'address': self.contract.address,
+                        'fromBlock': inicio,
+                        'toBlock': fim,
+                        'topics': [[self.w3.to_hex(topico) for topico in self._topicos]]
+                    })
+                except Exception:
+                    # Intervalo grande demais para o provedor: reduzir e tentar de novo
+                    if intervalo <= INTERVALO_MINIMO_BLOCOS:
+                        raise
+                    intervalo = max(intervalo // 2, INTERVALO_MINIMO_BLOCOS)
+                    continue
+
+                self._gravar_intervalo(logs, fim)
+                eventos += len(logs)
+                inicio = fim + 1
+                intervalo = min(intervalo * 2, INTERVALO_MAXIMO_BLOCOS)
+
+                if ao_progredir:
+                    ao_progredir(fim - primeiro_bloco + 1, bloco_final - primeiro_bloco + 1)
+
+            return eventos
+
+@st.cache_resource
+def obter_indice(rpc_url, contract_address):
+    """
+    Retorna o índice de eventos do contrato, compartilhado entre sessões e páginas
+    """
+    return IndiceEventos(rpc_url, contract_address)
@@ -0,0 +1,164 @@
+import threading
+import streamlit as st
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from integridade import CAMPO_HASH_CONTEUDO
+
+# ==================== CONSTANTES ====================
+# Os índices de cada coleção são conferidos novamente após este tempo (segundos)
+TTL_INDICES = 30 * 60
+NOME_INDICE_HASH_CONTEUDO = "content_hash_unico"
+
+SITUACAO_EXISTENTE = "existente"
+SITUACAO_CRIADO = "criado"
+
+def _somente_com(campo):
+    return {campo: {'$exists': True}}
+
+INDICE_HASH_CONTEUDO = IndexModel(
+    [(CAMPO_HASH_CONTEUDO, ASCENDING)],
+    name=NOME_INDICE_HASH_CONTEUDO,
+    unique=True,
+    partialFilterExpression=_somente_com(CAMPO_HASH_CONTEUDO)
+)
+
+INDICES_PRONTUARIO = [
+    IndexModel([('idAtendimento', ASCENDING)], name='idAtendimento'),
+    IndexModel([('cnsPaciente', ASCENDING)], name='cnsPaciente'),
+    # Índice completo: documentos sem registro ficam nas entradas nulas, então o
+    # mesmo índice atende às buscas por hash e às buscas de pendentes de registro
+    # (partialFilterExpression não aceita $exists: false)
+    IndexModel([('blockchain_info.document_hash', ASCENDING)], name='document_hash'),
+    # Parciais: apenas documentos com blockchain_info entram no índice
+    IndexModel(
+        [('blockchain_info.transaction.transaction_hash', ASCENDING)],
+        name='transaction_hash',
+        partialFilterExpression=_somente_com('blockchain_info.transaction.transaction_hash')
+    ),
+    IndexModel(
+        [('blockchain_info.merkle.root', ASCENDING)],
+        name='merkle_root',
+        partialFilterExpression=_somente_com('blockchain_info.merkle.root')
+    ),
+    INDICE_HASH_CONTEUDO,
+]
+
+# ==================== CRIAÇÃO DOS ÍNDICES ====================
+
+def garantir_indice_hash_conteudo(collection):
+    """
+    Cria (se ainda não existir) o índice único sobre o hash do conteúdo.
+    O índice é parcial: documentos antigos, sem o campo, não entram nele
+    """
+    collection.create_indexes([INDICE_HASH_CONTEUDO])
+
+def garantir_indices(collection, indices=INDICES_PRONTUARIO):
+    """
+    Cria os índices que ainda não existem na coleção (idempotente).
+    Cada índice é criado separadamente, para que uma falha (ex.: falta de
+    permissão ou opções conflitantes) não impeça os demais.
+    Retorna [{"indice", "campos", "situacao"}]
+    """
+    existentes = collection.index_information()
+    relatorio = []
+
+    for indice in indices:
+        nome = indice.document['name']
+        campos = ", ".join(indice.document['key'].keys())
+        if nome in existentes:
+            situacao = SITUACAO_EXISTENTE
+        else:
+            try:
+                collection.create_indexes([indice])
+                situacao = SITUACAO_CRIADO
+            except OperationFailure as e:
+                situacao = f"erro: {e.details.get('errmsg', str(e)) if e.details else str(e)}"
+        relatorio.append({"indice": nome, "campos": campos, "situacao": situacao})
+
+    return relatorio
+
+class PreparacaoIndices:
+    """
+    Executa garantir_indices em uma thread, para que a criação de índices em
+    coleções grandes não bloqueie a página que conectou.
+    `relatorio` fica disponível ao concluir; `erro` descreve uma falha geral
+    """
+
+    def __init__(self, collection):
+        self.relatorio = None
+        self.erro = None
+        self._thread = threading.Thread(
+            target=self._executar, args=(collection,), name=f"indices-{collection.name}", daemon=True
+        )
+        self._thread.start()
+
+    def _executar(self, collection):
+        try:
+            self.relatorio = garantir_indices(collection)
+        except Exception as e:
+            self.erro = str(e) or type(e).__name__
+
+    @property
+    def concluida(self):
+        return not self._thread.is_alive()
+
+    def aguardar(self, timeout=None):
+        """
+        Aguarda o fim da criação dos índices e retorna o relatório
+        """
+        self._thread.join(timeout)
+        return self.relatorio
+
+@st.cache_resource(ttl=TTL_INDICES, show_spinner=False)
+def _preparacao_indices(host, database, nome_colecao, _collection):
+    # Páginas de consulta não devem criar coleções: só coleções existentes são
+    # indexadas. A exceção não fica em cache, então a coleção é conferida de
+    # novo na próxima conexão
+    if not _collection.database.list_collection_names(filter={'name': nome_colecao}):
+        raise LookupError(f"Coleção {database}.{nome_colecao} inexistente")
+    return PreparacaoIndices(_collection)
+
+def preparar_indices(host, collection):
+    """
+    Inicia, uma vez por processo (por TTL_INDICES), a criação dos índices da
+    coleção em segundo plano. Chamada ao conectar; nunca interrompe a página.
+    Retorna a PreparacaoIndices, ou None se a coleção não existe ou não foi
+    possível conferi-la. Uma preparação que falhou é descartada do cache e
+    refeita na chamada seguinte
+    """
+    try:
+        preparacao = _preparacao_indices(host, collection.database.name, collection.name, collection)
+    except Exception:
+        return None
+    if preparacao.erro:
+        _preparacao_indices.clear()
+    return preparacao
+
+# ==================== USO DOS ÍNDICES ====================
+
+def uso_dos_indices(collection):
+    """
+    Consulta $indexStats e soma os acessos de cada índice em todos os membros
+    do cluster. Índices com zero acessos desde `desde` são candidatos a remoção;
+    consultas frequentes sem índice aparecem como ausência de acessos no
+    índice esperado.
+    Retorna [{"indice", "campos", "acessos", "desde"}], do mais ao menos usado
+    """
+    return [
+        {
+            "indice": estatistica['_id'],
+            "campos": ", ".join(estatistica['key'].keys()),
+            "acessos": estatistica['acessos'],
+            "desde": estatistica['desde']
+        }
+        for estatistica in collection.aggregate([
+            {'$indexStats': {}},
+            {'$group': {
+                '_id': '$name',
+                'key': {'$first': '$key'},
+                'acessos': {'$sum': '$accesses.ops'},
+                'desde': {'$min': '$accesses.since'}
+            }},
+            {'$sort': {'acessos': -1, '_id': 1}}
+        ])
+    ]
@@ -0,0 +1,240 @@
+import gzip
+import io
+import json
+import time
+import bson
+import ijson
+from bson.errors import BSONError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from integridade import CAMPO_HASH_CONTEUDO
+from indices import NOME_INDICE_HASH_CONTEUDO, garantir_indice_hash_conteudo
+from motor_hash import calcular_hashes, somente_hash
+
+# ==================== CONSTANTES ====================
+TAMANHO_LOTE_INGESTAO = 1000
+TAMANHO_BUFFER_LEITURA = 64 * 1024
+ASSINATURA_GZIP = b'\x1f\x8b'
+BOM_UTF8 = b'\xef\xbb\xbf'
+
+FORMATO_AUTOMATICO = "auto"
+FORMATO_ARRAY_JSON = "json"
+FORMATO_NDJSON = "ndjson"
+
+# Confirmação de escrita: "1" (primário) ou "majority" (maioria do replica set)
+CONFIRMACOES_ESCRITA = ("1", "majority")
+
+# Tratamento de documentos cujo conteúdo já existe na coleção
+DUPLICADOS_IGNORAR = "ignorar"  # insert_many: o índice único recusa o duplicado
+DUPLICADOS_UPSERT = "upsert"    # update com $setOnInsert: o existente não é alterado
+
+CODIGO_CHAVE_DUPLICADA = 11000
+
+# ==================== LEITURA DO ARQUIVO ====================
+
+def abrir_fluxo(arquivo):
+    """
+    Abre o arquivo enviado como fluxo binário com buffer, descompactando
+    gzip automaticamente (detectado pela assinatura, não pela extensão)
+    """
+    fluxo = io.BufferedReader(arquivo, buffer_size=TAMANHO_BUFFER_LEITURA)
+    if fluxo.peek(2)[:2] == ASSINATURA_GZIP:
+        fluxo = io.BufferedReader(gzip.GzipFile(fileobj=fluxo), buffer_size=TAMANHO_BUFFER_LEITURA)
+    return fluxo
+
+def detectar_formato(fluxo):
+    """
+    Identifica o formato pelo primeiro caractere significativo, sem consumir o
+    fluxo: '[' indica um array JSON; qualquer outro, um objeto por linha (NDJSON)
+    """
+    inicio = fluxo.peek(TAMANHO_BUFFER_LEITURA)
+    if inicio.startswith(BOM_UTF8):
+        inicio = inicio[len(BOM_UTF8):]
+    return FORMATO_ARRAY_JSON if inicio.lstrip()[:1] == b'[' else FORMATO_NDJSON
+
+def iterar_documentos(fluxo, formato=FORMATO_AUTOMATICO):
+    """
+    Lê os documentos um a um, sem carregar o arquivo inteiro.
+    Gera (posicao, documento, erro): a posição é a linha no NDJSON ou o item
+    no array JSON; quando o registro é inválido, documento é None e erro
+    descreve o problema
+    """
+    if formato == FORMATO_AUTOMATICO:
+        formato = detectar_formato(fluxo)
+
+    if formato == FORMATO_NDJSON:
+        for posicao, linha in enumerate(io.TextIOWrapper(fluxo, encoding='utf-8-sig'), 1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                documento = json.loads(linha)
+            except json.JSONDecodeError as e:
+                yield posicao, None, f"JSON inválido: {e}"
+                continue
+            if isinstance(documento, dict):
+                yield posicao, documento, None
+            else:
+                yield posicao, None, "A linha não contém um objeto JSON"
+        return
+
+    if fluxo.peek(len(BOM_UTF8))[:len(BOM_UTF8)] == BOM_UTF8:
+        fluxo.read(len(BOM_UTF8))
+
+    posicao = 0
+    try:
+        for posicao, documento in enumerate(ijson.items(fluxo, 'item', use_float=True), 1):
+            if isinstance(documento, dict):
+                yield posicao, documento, None
+            else:
+                yield posicao, None, "O item não é um objeto JSON"
+    except ijson.JSONError as e:
+        # Depois de um erro de sintaxe o restante do array não pode ser lido
+        yield posicao + 1, None, f"JSON inválido (leitura interrompida): {e}"
+
+# ==================== DEDUPLICAÇÃO ====================
+
+def atribuir_hash_conteudo(documento):
+    """
+    Grava no documento o hash do seu conteúdo (o mesmo de gerar_hash_documento)
+    e o retorna
+    """
+    documento[CAMPO_HASH_CONTEUDO] = somente_hash(documento)
+    return documento[CAMPO_HASH_CONTEUDO]
+
+def _conteudo_duplicado(erro):
+    """
+    Indica se o erro de escrita é uma violação do índice único do hash do
+    conteúdo (e não, por exemplo, de um _id repetido)
+    """
+    if erro.get('code') != CODIGO_CHAVE_DUPLICADA:
+        return False
+    if 'keyPattern' in erro:
+        return CAMPO_HASH_CONTEUDO in erro['keyPattern']
+    return NOME_INDICE_HASH_CONTEUDO in erro.get('errmsg', '')
+
+# ==================== INSERÇÃO EM LOTES ====================
+
+def criar_write_concern(confirmacao="1", journal=False):
+    """
+    Cria o WriteConcern da ingestão a partir da confirmação escolhida
+    ("1" ou "majority") e da exigência de gravação no journal
+    """
+    w = int(confirmacao) if confirmacao.isdigit() else confirmacao
+    return WriteConcern(w=w, j=journal or None)
+
+def _escrever_lote(collection, lote, duplicados):
+    """
+    Grava o lote conforme o tratamento de duplicados.
+    Retorna as posições (no lote) dos documentos inseridos
+    """
+    if duplicados == DUPLICADOS_UPSERT:
+        resultado = collection.bulk_write(
+            [
+                UpdateOne({CAMPO_HASH_CONTEUDO: d[CAMPO_HASH_CONTEUDO]}, {'$setOnInsert': d}, upsert=True)
+                for d in lote
+            ],
+            ordered=False
+        )
+        return set(resultado.upserted_ids)
+    collection.insert_many(lote, ordered=False)
+    return set(range(len(lote)))
+
+def inserir_em_lotes(collection, registros, tamanho_lote=TAMANHO_LOTE_INGESTAO, write_concern=None,
+                     duplicados=DUPLICADOS_IGNORAR, ao_concluir_lote=None):
+    """
+    Insere os documentos gerados por iterar_documentos em lotes de
+    `tamanho_lote`, gravando em cada um o hash do conteúdo. Duplicados são
+    detectados pelo índice único (uma consulta ao índice por documento):
+    com DUPLICADOS_IGNORAR os lotes usam insert_many(ordered=False) e o
+    duplicado é recusado; com DUPLICADOS_UPSERT, bulk_write de updates com
+    $setOnInsert, que inserem apenas o que ainda não existe.
+    Um documento recusado (pelo servidor ou por não poder ser codificado em
+    BSON, ex.: inteiro acima de int64) não interrompe o restante do lote.
+    `ao_concluir_lote(estatisticas_do_lote, resumo)` é chamado após cada lote.
+    Retorna {"inseridos", "duplicados": [{"posicao", "content_hash"}],
+    "falhas": [{"posicao", "erro"}], "lotes": [...]}
+    """
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
+    garantir_indice_hash_conteudo(collection)
+
+    resumo = {"inseridos": 0, "duplicados": [], "falhas": [], "lotes": []}
+    lote = []
+    posicoes = []
+
+    def gravar():
+        # O driver codifica o lote inteiro de uma vez: um documento que não vira
+        # BSON derrubaria todos os outros, então cada um é conferido antes
+        validos = []
+        for indice, documento in enumerate(lote):
+            try:
+                bson.encode(documento)
+                validos.append(indice)
+            except (BSONError, OverflowError, ValueError) as e:
+                resumo["falhas"].append({"posicao": posicoes[indice], "erro": f"Documento inválido para BSON: {e}"})
+        recusados = len(lote) - len(validos)
+        lote[:] = [lote[indice] for indice in validos]
+        posicoes[:] = [posicoes[indice] for indice in validos]
+
+        for documento, hash_conteudo in zip(lote, calcular_hashes(lote)):
+            documento[CAMPO_HASH_CONTEUDO] = hash_conteudo
+
+        inicio = time.perf_counter()
+        erros = []
+        try:
+            inseridos_no_lote = _escrever_lote(collection, lote, duplicados) if lote else set()
+        except BulkWriteError as e:
+            erros = e.details.get('writeErrors', [])
+            if duplicados == DUPLICADOS_UPSERT:
+                inseridos_no_lote = {upsert['index'] for upsert in e.details.get('upserted', [])}
+            else:
+                inseridos_no_lote = set(range(len(lote))) - {erro['index'] for erro in erros}
+        segundos = time.perf_counter() - inicio
+
+        # O que não foi inserido nem falhou por outro motivo já existia na coleção
+        falhas_lote = {erro['index']: erro for erro in erros if not _conteudo_duplicado(erro)}
+        duplicados_lote = [
+            indice for indice in range(len(lote))
+            if indice not in inseridos_no_lote and indice not in falhas_lote
+        ]
+        resumo["falhas"].extend(
+            {"posicao": posicoes[indice], "erro": erro.get('errmsg', str(erro))}
+            for indice, erro in falhas_lote.items()
+        )
+        resumo["duplicados"].extend(
+            {"posicao": posicoes[indice], "content_hash": lote[indice][CAMPO_HASH_CONTEUDO]}
+            for indice in duplicados_lote
+        )
+
+        estatisticas = {
+            "lote": len(resumo["lotes"]) + 1,
+            "documentos": len(lote) + recusados,
+            "inseridos": len(inseridos_no_lote),
+            "duplicados": len(duplicados_lote),
+            "falhas": len(falhas_lote) + recusados,
+            "segundos": round(segundos, 3),
+            "documentos_por_segundo": round(len(lote) / segundos, 1) if segundos else None
+        }
+        resumo["inseridos"] += len(inseridos_no_lote)
+        resumo["lotes"].append(estatisticas)
+        if ao_concluir_lote:
+            ao_concluir_lote(estatisticas, resumo)
+
+        lote.clear()
+        posicoes.clear()
+
+    for posicao, documento, erro in registros:
+        if erro:
+            resumo["falhas"].append({"posicao": posicao, "erro": erro})
+            continue
+        lote.append(documento)
+        posicoes.append(posicao)
+        if len(lote) >= tamanho_lote:
+            gravar()
+
+    if lote:
+        gravar()
+
+    return resumo
@@ -0,0 +1,462 @@
+import hashlib
+import multiprocessing
+import os
+import struct
+from collections import namedtuple
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from merkle import verificar_prova
+
+# ==================== CONSTANTES ====================
+# Hash do conteúdo gravado na ingestão (índice único para deduplicação)
+CAMPO_HASH_CONTEUDO = 'content_hash'
+# Campos que não fazem parte do documento original
+CAMPOS_FORA_DO_HASH = ('_id', 'blockchain_info', CAMPO_HASH_CONTEUDO)
+# Caracteres da concatenação de valores guardados para exibição
+LIMITE_PREVIA_VALORES = 2000
+# Quantidade de caracteres acumulada antes de cada hasher.update()
+TAMANHO_BLOCO_HASH = 64 * 1024
+TAMANHO_LOTE_VERIFICACAO = 500
+FILTRO_COM_HASH = {'blockchain_info.document_hash': {'$exists': True, '$nin': [None, '']}}
+# Complemento de FILTRO_COM_HASH ($in com None também casa o campo ausente), resolvido no índice
+FILTRO_SEM_HASH = {'blockchain_info.document_hash': {'$in': [None, '']}}
+# Subcampos de blockchain_info que não participam da verificação
+PROJECAO_VERIFICACAO = {
+    'blockchain_info.transaction': 0,
+    'blockchain_info.verification': 0,
+    'blockchain_info.etherscan_url': 0,
+}
+
+PreviaValores = namedtuple('PreviaValores', ['texto', 'tamanho'])
+
+# Tamanho do valor dos tipos BSON de tamanho fixo (os demais são lidos do próprio valor)
+_TAMANHO_FIXO_BSON = {
+    0x01: 8, 0x06: 0, 0x07: 12, 0x08: 1, 0x09: 8, 0x0A: 0,
+    0x10: 4, 0x11: 8, 0x12: 8, 0x13: 16, 0x7F: 0, 0xFF: 0
+}
+
+# ==================== FUNÇÕES DE HASH ====================
+
+def iterar_valores_para_hash(obj):
+    """
+    Percorre o objeto JSON e gera, um a um, apenas os VALORES (sem chaves,
+    vírgulas, aspas, etc), convertidos para texto. Chaves de dicionários são
+    visitadas em ordem alfabética para garantir consistência.
+    O percurso é iterativo (pilha de iteradores) e não monta lista alguma.
+    """
+    pilha = [iter((obj,))]
+    
+    while pilha:
+        for item in pilha[-1]:
+            if isinstance(item, dict):
+                pilha.append(map(item.__getitem__, sorted(item.keys())))
+                break
+            if isinstance(item, list):
+                pilha.append(iter(item))
+                break
+            yield str(item)
+        else:
+            pilha.pop()
+
+def _consumir_valores(valores, hashers, limite_previa=0):
+    """
+    Alimenta os hashers com os valores em blocos de até TAMANHO_BLOCO_HASH
+    caracteres, guardando apenas os primeiros `limite_previa` caracteres.
+    Retorna PreviaValores(texto, tamanho total em caracteres)
+    """
+    valores = iter(valores)
+    bloco = []
+    tamanho_bloco = 0
+    total = 0
+    previa = []
+    tamanho_previa = 0
+    
+    def descarregar():
+        dados = ''.join(bloco).encode('utf-8')
+        for hasher in hashers:
+            hasher.update(dados)
+        bloco.clear()
+    
+    # Início da concatenação: também alimenta a prévia
+    if limite_previa:
+        for valor in valores:
+            bloco.append(valor)
+            tamanho_bloco += len(valor)
+            previa.append(valor[:limite_previa - tamanho_previa])
+            tamanho_previa += len(previa[-1])
+            if tamanho_previa >= limite_previa:
+                break
+    
+    acrescentar = bloco.append
+    for valor in valores:
+        acrescentar(valor)
+        tamanho_bloco += len(valor)
+        if tamanho_bloco >= TAMANHO_BLOCO_HASH:
+            descarregar()
+            total += tamanho_bloco
+            tamanho_bloco = 0
+    
+    descarregar()
+    total += tamanho_bloco
+    
+    return PreviaValores(''.join(previa), total)
+
+def _campos_do_hash(documento):
+    """
+    Campos de primeiro nível que participam do hash, em ordem alfabética
+    """
+    return [campo for campo in sorted(documento.keys()) if campo not in CAMPOS_FORA_DO_HASH]
+
+def gerar_hash_documento(documento, limite_previa=LIMITE_PREVIA_VALORES):
+    """
+    Gera hash SHA-256 apenas dos valores do documento,
+    ignorando formatação JSON (aspas, vírgulas, chaves, etc).
+    Os valores são enviados ao SHA-256 à medida que o documento é percorrido,
+    sem montar a concatenação completa em memória.
+    Retorna (hash_hex, PreviaValores) - a prévia traz os primeiros
+    `limite_previa` caracteres da concatenação e o seu tamanho total
+    """
+    hasher = hashlib.sha256()
+    valores = chain.from_iterable(
+        iterar_valores_para_hash(documento[campo]) for campo in _campos_do_hash(documento)
+    )
+    previa = _consumir_valores(valores, (hasher,), limite_previa)
+    
+    return hasher.hexdigest(), previa
+
+def previa_valores(documento, limite_previa=LIMITE_PREVIA_VALORES):
+    """
+    Primeiros `limite_previa` caracteres da concatenação de valores (a mesma
+    de gerar_hash_documento), sem percorrer o restante do documento
+    """
+    valores = chain.from_iterable(
+        iterar_valores_para_hash(documento[campo]) for campo in _campos_do_hash(documento)
+    )
+    previa = []
+    tamanho = 0
+    for valor in valores:
+        if tamanho >= limite_previa:
+            break
+        previa.append(valor[:limite_previa - tamanho])
+        tamanho += len(previa[-1])
+    return ''.join(previa)
+
+def gerar_digests_campos(documento):
+    """
+    Calcula, em uma única passada, o hash do documento (idêntico ao de
+    gerar_hash_documento) e o SHA-256 dos valores de cada campo de primeiro
+    nível. Como os campos entram no hash geral em ordem alfabética, a
+    concatenação dos valores campo a campo reproduz o hash original.
+    Retorna (hash_hex, {campo: digest})
+    """
+    hasher = hashlib.sha256()
+    digests = {}
+    
+    for campo in _campos_do_hash(documento):
+        hasher_campo = hashlib.sha256()
+        _consumir_valores(iterar_valores_para_hash(documento[campo]), (hasher, hasher_campo))
+        digests[campo] = hasher_campo.hexdigest()
+    
+    return hasher.hexdigest(), digests
+
+def campos_adulterados(documento):
+    """
+    Compara os digests por campo armazenados em blockchain_info.field_digests
+    com os do conteúdo atual.
+    Retorna {"modificados": [...], "adicionados": [...], "removidos": [...]}
+    ou None quando o documento não possui digests por campo
+    """
+    digests_armazenados = documento.get('blockchain_info', {}).get('field_digests')
+    if not digests_armazenados:
+        return None
+    
+    _, digests_atuais = gerar_digests_campos(documento)
+    
+    return {
+        "modificados": sorted(
+            campo for campo, digest in digests_atuais.items()
+            if campo in digests_armazenados and digests_armazenados[campo] != digest
+        ),
+        "adicionados": sorted(set(digests_atuais) - set(digests_armazenados)),
+        "removidos": sorted(set(digests_armazenados) - set(digests_atuais))
+    }
+
+def descrever_campos_adulterados(alteracoes):
+    """
+    Resume o resultado de campos_adulterados em uma linha de texto
+    """
+    partes = []
+    if alteracoes["modificados"]:
+        partes.append("modificados: " + ", ".join(alteracoes["modificados"]))
+    if alteracoes["adicionados"]:
+        partes.append("adicionados: " + ", ".join(alteracoes["adicionados"]))
+    if alteracoes["removidos"]:
+        partes.append("removidos: " + ", ".join(alteracoes["removidos"]))
+    return "; ".join(partes)
+
+def verificar_integridade_documento(documento, hash_calculado=None):
+    """
+    Verifica se o hash armazenado no blockchain_info corresponde
+    ao conteúdo atual do documento (excluindo blockchain_info).
+    `hash_calculado`, quando já conhecido (ex.: cache de hashes), evita
+    recalcular o hash do documento
+    """
+    if 'blockchain_info' not in documento:
+        return None, "Documento não possui informações de blockchain"
+    
+    hash_armazenado = documento.get('blockchain_info', {}).get('document_hash')
+    
+    if not hash_armazenado:
+        return None, "Hash não encontrado em blockchain_info"
+    
+    # Calcular hash do documento atual (sem blockchain_info)
+    if hash_calculado is None:
+        hash_calculado, _ = gerar_hash_documento(documento)
+    
+    # Comparar
+    if hash_armazenado != hash_calculado:
+        # Os digests por campo só são recalculados quando o hash geral diverge
+        alteracoes = campos_adulterados(documento)
+        if alteracoes:
+            return False, f"Documento modificado - {descrever_campos_adulterados(alteracoes)}"
+        return False, "Documento modificado - hash não corresponde"
+    
+    # Documento ancorado por raiz Merkle: o caminho até a raiz também precisa fechar
+    merkle = documento['blockchain_info'].get('merkle')
+    if merkle:
+        prova_valida, _ = verificar_prova(hash_calculado, merkle.get('proof', []), merkle.get('root', ''))
+        if not prova_valida:
+            return False, "Prova Merkle inválida - o hash não leva à raiz ancorada"
+        return True, "Documento íntegro - hash corresponde ao conteúdo e à raiz Merkle ancorada"
+    
+    return True, "Documento íntegro - hash corresponde ao conteúdo"
+
+# ==================== MARCADOR DO CONTEÚDO ====================
+
+def _elementos_bson(dados):
+    """
+    Localiza os elementos de primeiro nível de um documento BSON sem
+    decodificá-los. Retorna {nome: (inicio, fim)}, a posição de cada elemento
+    (tipo, nome e valor) em `dados`
+    """
+    elementos = {}
+    posicao = 4
+    final = len(dados) - 1
+    
+    while posicao < final:
+        inicio = posicao
+        tipo = dados[posicao]
+        fim_nome = dados.index(b'\x00', posicao + 1)
+        posicao = fim_nome + 1
+        
+        if tipo in _TAMANHO_FIXO_BSON:
+            posicao += _TAMANHO_FIXO_BSON[tipo]
+        elif tipo in (0x02, 0x0D, 0x0E):  # string, código, símbolo
+            posicao += 4 + struct.unpack_from('<i', dados, posicao)[0]
+        elif tipo in (0x03, 0x04, 0x0F):  # documento, array, código com escopo
+            posicao += struct.unpack_from('<i', dados, posicao)[0]
+        elif tipo == 0x05:  # binário: tamanho, subtipo e dados
+            posicao += 5 + struct.unpack_from('<i', dados, posicao)[0]
+        elif tipo == 0x0B:  # expressão regular: padrão e opções
+            posicao = dados.index(b'\x00', dados.index(b'\x00', posicao) + 1) + 1
+        elif tipo == 0x0C:  # DBPointer: string e ObjectId
+            posicao += 4 + struct.unpack_from('<i', dados, posicao)[0] + 12
+        else:
+            raise ValueError(f"Tipo BSON desconhecido: {tipo:#04x}")
+        
+        elementos[bytes(dados[inicio + 1:fim_nome]).decode('utf-8')] = (inicio, posicao)
+    
+    return elementos
+
+def _decodificar_elementos(dados, posicoes):
+    """
+    Decodifica apenas os elementos indicados (posições de _elementos_bson)
+    """
+    corpo = b''.join(dados[inicio:fim] for inicio, fim in posicoes)
+    return bson.decode(struct.pack('<i', len(corpo) + 5) + corpo + b'\x00')
+
+def _marcador_dos_elementos(dados, elementos):
+    hasher = hashlib.blake2b(digest_size=16)
+    memoria = memoryview(dados)
+    for nome in sorted(elementos):
+        if nome not in CAMPOS_FORA_DO_HASH:
+            inicio, fim = elementos[nome]
+            hasher.update(memoria[inicio:fim])
+    return hasher.hexdigest()
+
+def marcador_conteudo(documento):
+    """
+    Impressão digital do conteúdo que entra no hash: BLAKE2b dos bytes BSON
+    dos campos de primeiro nível fora de CAMPOS_FORA_DO_HASH, sem percorrer
+    os valores. Muda com qualquer escrita nesses campos (por qualquer
+    aplicação) e não depende de blockchain_info nem da projeção usada na
+    leitura, desde que ela traga todos os campos do hash.
+    """
+    dados = documento.raw if isinstance(documento, RawBSONDocument) else bson.encode(documento)
+    return _marcador_dos_elementos(dados, _elementos_bson(dados))
+
+def identificar_bruto(bruto):
+    """
+    Lê de um documento BSON bruto o _id (como texto) e o marcador do conteúdo,
+    decodificando apenas o _id.
+    Retorna (documento_id, marcador)
+    """
+    elementos = _elementos_bson(bruto)
+    documento_id = _decodificar_elementos(bruto, [elementos['_id']])['_id']
+    return str(documento_id), _marcador_dos_elementos(bruto, elementos)
+
+# ==================== VERIFICAÇÃO EM LOTE ====================
+
+def contexto_processos():
+    """
+    Contexto dos pools de processos de hash. Os processos partem de um
+    servidor forkserver (ou spawn, onde não há forkserver), nunca de um
+    fork do servidor Streamlit com suas threads e conexões abertas.
+    O forkserver carrega apenas este módulo, e não o __main__ do Streamlit
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    contexto = multiprocessing.get_context("forkserver")
+    contexto.set_forkserver_preload([__name__])
+    return contexto
+
+def _verificar_lote_bruto(lote_bruto, hashes_conhecidos=None):
+    """
+    Executado nos processos do pool: decodifica os documentos BSON brutos
+    e recalcula o hash de cada um. Com `hashes_conhecidos` (um hash ou None
+    por documento, vindos do cache de hashes), um documento cujo hash
+    conhecido confere com o registrado não é decodificado nem recalculado:
+    apenas blockchain_info é lido, para conferir a prova Merkle.
+    Retorna (integros, modificados, sem_registro, divergencias, calculados),
+    em que calculados traz (posição no lote, hash, caracteres) dos hashes
+    recalculados
+    """
+    integros = modificados = sem_registro = 0
+    divergencias = []
+    calculados = []
+    
+    for indice, bruto in enumerate(lote_bruto):
+        hash_calculado = hashes_conhecidos[indice] if hashes_conhecidos else None
+        documento = None
+        
+        if hash_calculado is not None:
+            elementos = _elementos_bson(bruto)
+            if 'blockchain_info' in elementos:
+                parcial = _decodificar_elementos(bruto, [elementos['blockchain_info']])
+                if (parcial['blockchain_info'] or {}).get('document_hash') == hash_calculado:
+                    documento = parcial
+        
+        if documento is None:
+            documento = bson.decode(bruto)
+            if hash_calculado is None:
+                hash_calculado, previa = gerar_hash_documento(documento, limite_previa=0)
+                calculados.append((indice, hash_calculado, previa.tamanho))
+        
+        integro, _ = verificar_integridade_documento(documento, hash_calculado)
+        
+        if integro is True:
+            integros += 1
+        elif integro is False:
+            modificados += 1
+            if '_id' not in documento:
+                # Hash conhecido, mas a prova Merkle não fecha: os campos vêm do documento completo
+                documento = bson.decode(bruto)
+            alteracoes = campos_adulterados(documento)
+            divergencias.append({
+                "_id": str(documento.get('_id')),
+                "idAtendimento": documento.get('idAtendimento', ''),
+                "hash_armazenado": documento['blockchain_info']['document_hash'],
+                "hash_calculado": hash_calculado,
+                "campos_alterados": descrever_campos_adulterados(alteracoes) if alteracoes else ""
+            })
+        else:
+            sem_registro += 1
+    
+    return integros, modificados, sem_registro, divergencias, calculados
+
+def verificar_colecao(collection, tamanho_lote=TAMANHO_LOTE_VERIFICACAO, max_processos=None, ao_progredir=None,
+                      pool=None, cache=None):
+    """
+    Verifica a integridade de todos os documentos da coleção.
+    Os documentos com hash registrado são lidos como BSON bruto (sem decodificar
+    no processo principal) e verificados em lotes por um pool de processos.
+    Documentos sem registro são apenas contados no servidor.
+    `ao_progredir(processados, total)` é chamado a cada lote concluído.
+    Com `pool`, os lotes usam um pool já existente (que não é encerrado ao final).
+    Com `cache` (CacheHashes), os hashes de documentos não alterados desde a
+    verificação anterior são reaproveitados e os recalculados são gravados.
+    Retorna um dicionário com o resumo e a lista de divergências.
+    """
+    max_processos = max_processos or os.cpu_count() or 1
+    colecao_bruta = collection.with_options(
+        codec_options=CodecOptions(document_class=RawBSONDocument)
+    )
+    
+    total = collection.count_documents(FILTRO_COM_HASH)
+    resumo = {
+        "integros": 0,
+        "modificados": 0,
+        "sem_registro": collection.count_documents(FILTRO_SEM_HASH),
+        "divergencias": [],
+        "total_verificado": 0
+    }
+    
+    colecao = collection.full_name
+    chaves_dos_lotes = {}  # futuro -> [(documento_id, marcador)] do lote
+    
+    def acumular(futuro):
+        integros, modificados, sem_registro, divergencias, calculados = futuro.result()
+        resumo["integros"] += integros
+        resumo["modificados"] += modificados
+        resumo["sem_registro"] += sem_registro
+        resumo["divergencias"].extend(divergencias)
+        resumo["total_verificado"] += integros + modificados + sem_registro
+        
+        chaves = chaves_dos_lotes.pop(futuro, None)
+        if chaves and calculados:
+            cache.guardar(colecao, [
+                (*chaves[indice], hash_hex, caracteres) for indice, hash_hex, caracteres in calculados
+            ])
+        if ao_progredir:
+            ao_progredir(resumo["total_verificado"], total)
+    
+    def enviar(lote):
+        if cache is None:
+            pendentes.add(pool.submit(_verificar_lote_bruto, lote))
+            return
+        # Marcadores lidos dos bytes, sem decodificar os documentos no processo principal
+        chaves = [identificar_bruto(bruto) for bruto in lote]
+        hashes_conhecidos = [entrada and entrada[0] for entrada in cache.consultar(colecao, chaves)]
+        futuro = pool.submit(_verificar_lote_bruto, lote, hashes_conhecidos)
+        chaves_dos_lotes[futuro] = chaves
+        pendentes.add(futuro)
+    
+    cursor = colecao_bruta.find(FILTRO_COM_HASH, PROJECAO_VERIFICACAO).batch_size(tamanho_lote)
+    
+    with nullcontext(pool) if pool else ProcessPoolExecutor(max_processos, mp_context=contexto_processos()) as pool:
+        pendentes = set()
+        lote = []
+        
+        for documento in cursor:
+            lote.append(documento.raw)
+            if len(lote) >= tamanho_lote:
+                enviar(lote)
+                lote = []
+            
+            # Limita os lotes em voo para manter a memória constante
+            if len(pendentes) >= max_processos * 2:
+                concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    acumular(futuro)
+        
+        if lote:
+            enviar(lote)
+        
+        for futuro in pendentes:
+            acumular(futuro)
+    
+    return resumo
@@ -0,0 +1,105 @@
+import hashlib
+
+# ==================== CONSTANTES ====================
+ALGORITMO_MERKLE = "sha256"
+# Prefixos de domínio: impedem que um nó interno seja apresentado como folha
+PREFIXO_FOLHA = b'\x00'
+PREFIXO_NO = b'\x01'
+LADO_ESQUERDO = "esquerda"
+LADO_DIREITO = "direita"
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def _normalizar_hex(hash_hex):
+    """
+    Remove espaços e o prefixo 0x de um hash hexadecimal
+    """
+    hash_hex = hash_hex.strip().lower()
+    if hash_hex.startswith('0x'):
+        hash_hex = hash_hex[2:]
+    return hash_hex
+
+def hash_folha(hash_hex):
+    """
+    Calcula o nó folha a partir do hash SHA-256 do documento
+    """
+    return hashlib.sha256(PREFIXO_FOLHA + bytes.fromhex(_normalizar_hex(hash_hex))).digest()
+
+def hash_no(esquerda, direita):
+    """
+    Calcula o nó interno a partir dos dois filhos
+    """
+    return hashlib.sha256(PREFIXO_NO + esquerda + direita).digest()
+
+# ==================== ÁRVORE MERKLE ====================
+
+def construir_arvore(hashes_hex):
+    """
+    Constrói a árvore Merkle sobre os hashes dos documentos (na ordem recebida).
+    Um nó sem par é promovido ao nível seguinte sem ser duplicado.
+    Retorna a lista de níveis, das folhas (níveis[0]) até a raiz (níveis[-1])
+    """
+    if not hashes_hex:
+        raise ValueError("A árvore Merkle precisa de pelo menos um hash")
+
+    niveis = [[hash_folha(h) for h in hashes_hex]]
+
+    while len(niveis[-1]) > 1:
+        atual = niveis[-1]
+        proximo = [hash_no(atual[i], atual[i + 1]) for i in range(0, len(atual) - 1, 2)]
+        if len(atual) % 2:
+            proximo.append(atual[-1])
+        niveis.append(proximo)
+
+    return niveis
+
+def raiz_da_arvore(niveis):
+    """
+    Retorna a raiz da árvore em hexadecimal
+    """
+    return niveis[-1][0].hex()
+
+def gerar_prova(niveis, indice):
+    """
+    Gera a prova de inclusão da folha `indice`: a lista de irmãos, da folha
+    até a raiz, com o lado em que cada irmão deve ser concatenado
+    """
+    prova = []
+
+    for nivel in niveis[:-1]:
+        irmao = indice ^ 1
+        if irmao < len(nivel):
+            prova.append({
+                "hash": nivel[irmao].hex(),
+                "lado": LADO_ESQUERDO if irmao < indice else LADO_DIREITO
+            })
+        indice //= 2
+
+    return prova
+
+def calcular_raiz_da_prova(hash_hex, prova):
+    """
+    Recalcula a raiz a partir do hash do documento e da sua prova de inclusão
+    """
+    no = hash_folha(hash_hex)
+
+    for passo in prova:
+        irmao = bytes.fromhex(_normalizar_hex(passo["hash"]))
+        if passo["lado"] == LADO_ESQUERDO:
+            no = hash_no(irmao, no)
+        else:
+            no = hash_no(no, irmao)
+
+    return no.hex()
+
+def verificar_prova(hash_hex, prova, raiz_hex):
+    """
+    Verifica se o hash do documento pertence à árvore com a raiz informada.
+    Retorna (valida, raiz_calculada)
+    """
+    try:
+        raiz_calculada = calcular_raiz_da_prova(hash_hex, prova)
+    except (KeyError, TypeError, ValueError):
+        return False, None
+
+    return raiz_calculada == _normalizar_hex(raiz_hex), raiz_calculada
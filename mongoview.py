@@ -1,9 +1,39 @@
-import json
+import time
 import streamlit as st
-from pymongo import MongoClient
+from collections import OrderedDict
+from itertools import islice
+from conexao import obter_colecao
 from datetime import datetime
 from bson.json_util import dumps
-import io
+from exportacao import (
+    TAMANHO_LOTE_PADRAO,
+    FORMATO_JSON,
+    FORMATO_NDJSON,
+    ExportadorJSON,
+    ExportadorParquet,
+    gerar_relatorio_txt,
+    tamanho_relatorio,
+    ler_trecho_relatorio,
+    conteudo_para_download
+)
+from consultas import (
+    VISAO_CABECALHO,
+    VISAO_HASH,
+    contar_documentos,
+    buscar_documento,
+    buscar_documentos,
+    buscar_pagina_numerada,
+    projetar
+)
+from integridade import FILTRO_COM_HASH, verificar_integridade_documento
+from cache_hashes import obter_cache_hashes
+from indices import preparar_indices, uso_dos_indices
+from estatisticas import obter_estatisticas
+from monitoramento import (
+    CAMPO_POLLING_PADRAO,
+    FONTE_CHANGE_STREAM,
+    MonitorColecao
+)
 
 # ==================== CONFIGURAÇÃO DA PÁGINA ====================
 st.set_page_config(
@@ -51,30 +81,15 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ==================== FUNÇÃO DE NORMALIZAÇÃO ====================
-
-def normalizar_documento(doc):
-    """
-    Normaliza um documento JSON/BSON, achatando suas chaves (flattening) 
-    e convertendo valores para string de forma segura.
-    """
-    doc_json = json.loads(dumps(doc))
-    
-    def achatar(d, chave_pai='', sep='.'):
-        itens = []
-        for k, v in d.items():
-            nova_chave = f"{chave_pai}{sep}{k}" if chave_pai else k
-            
-            if isinstance(v, dict):
-                itens.extend(achatar(v, nova_chave, sep=sep).items())
-            elif isinstance(v, list):
-                itens.append((nova_chave, json.dumps(v, ensure_ascii=False)))
-            else:
-                itens.append((nova_chave, str(v)))
-                
-        return dict(itens)
-        
-    return achatar(doc_json)
+# ==================== CONSTANTES ====================
+DOCS_POR_PAGINA = 10
+MODO_COMPLETO = "Completo"
+MODO_STREAMING = "Streaming (coleções grandes)"
+MODO_PAGINADO = "Paginado no servidor"
+MODO_AO_VIVO = "Ao vivo (change stream)"
+INTERVALO_ATUALIZACAO_AO_VIVO = 5  # segundos entre atualizações automáticas
+LIMITE_PREVIA_TXT = 200_000  # bytes exibidos por trecho do formato achatado
+MAX_DOCUMENTOS_FORMATADOS = 50  # JSONs formatados mantidos em cache por sessão
 
 # ==================== FUNÇÃO DE FORMATAÇÃO JSON ====================
 
@@ -82,54 +97,572 @@ def formatar_json_mongodb(doc):
     """
     Formata o documento no estilo MongoDB Atlas (JSON com indentação)
     """
-    # Converte BSON para JSON mantendo a estrutura original
-    doc_json = json.loads(dumps(doc))
-    return json.dumps(doc_json, indent=2, ensure_ascii=False)
+    # Serializa BSON diretamente com indentação (mesma saída de loads/dumps, em uma passada)
+    return dumps(doc, indent=2, ensure_ascii=False)
+
+def json_formatado(formatados, chave, carregar):
+    """
+    Retorna o JSON formatado do documento `chave` a partir do cache LRU
+    `formatados` (OrderedDict); em caso de ausência, obtém o documento com
+    `carregar()` e o formata. Retorna None se o documento não existe mais.
+    """
+    if chave in formatados:
+        formatados.move_to_end(chave)
+        return formatados[chave]
+    
+    doc = carregar()
+    if doc is None:
+        return None
+    
+    formatados[chave] = formatar_json_mongodb(doc)
+    while len(formatados) > MAX_DOCUMENTOS_FORMATADOS:
+        formatados.popitem(last=False)
+    return formatados[chave]
 
 # ==================== FUNÇÃO DE EXTRAÇÃO ====================
 
-def buscar_e_gerar_dados(mongo_uri, database_name, collection_name):
+def buscar_e_gerar_dados(usuario, senha, host, database_name, collection_name, modo_streaming=False,
+                         tamanho_lote=TAMANHO_LOTE_PADRAO, formato_json=FORMATO_JSON, compactar_json=False,
+                         exportar_parquet=False):
     """
     Conecta ao MongoDB e busca os documentos.
-    Retorna (sucesso, conteudo_txt, documentos_originais, num_documentos)
+    O relatório achatado e as exportações (JSON e, opcionalmente, Parquet) são
+    gravados de forma incremental em arquivos temporários, na mesma passada pelo cursor.
+    Dos documentos, apenas os cabeçalhos (VISAO_CABECALHO) são mantidos: todos
+    no modo completo, só os da primeira página no modo streaming.
+    Retorna (sucesso, relatorio, exportadores, cabecalhos, num_documentos, num_com_blockchain)
     """
-    client = None
+    exportadores = []
     try:
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-        db = client[database_name]
-        collection = db[collection_name]
-        client.server_info()
+        collection = obter_colecao(usuario, senha, host, database_name, collection_name)
+        exportadores.append(ExportadorJSON(formato_json, compactar_json))
+        if exportar_parquet:
+            exportadores.append(ExportadorParquet())
         
-        documentos = list(collection.find())
+        cursor = collection.find().batch_size(tamanho_lote)
+        relatorio, num_docs, num_com_blockchain, cabecalhos = gerar_relatorio_txt(
+            cursor, tamanho_previa=DOCS_POR_PAGINA if modo_streaming else None,
+            exportadores=exportadores, resumir=projetar
+        )
         
-        # Gerar conteúdo TXT (formato achatado)
-        output = io.StringIO()
-        output.write(f"--- RELATÓRIO DE DOCUMENTOS MONGODB (Formato Achatado) ---\n")
-        output.write(f"Data de Geração: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        output.write("-" * 70 + "\n\n")
+        for exportador in exportadores:
+            exportador.finalizar()
+        return True, relatorio, exportadores, cabecalhos, num_docs, num_com_blockchain
         
-        for idx, doc in enumerate(documentos):
-            dados_achatados = normalizar_documento(doc)
-            
-            output.write(f"== DOCUMENTO {idx + 1} ==")
-            output.write(f" (ID: {dados_achatados.get('_id.$oid', 'N/A')})\n")
-            
-            for chave, valor in dados_achatados.items():
-                output.write(f"{chave}: {valor}\n")
-                
-            output.write("-" * 70 + "\n\n")
+    except Exception as e:
+        fechar_arquivos(None, exportadores)
+        return False, str(e), None, [], 0, 0
+
+def fechar_arquivos(relatorio, exportadores):
+    """
+    Fecha os arquivos temporários do relatório e das exportações
+    """
+    arquivos = [relatorio] + [exportador.arquivo for exportador in exportadores or ()]
+    for arquivo in arquivos:
+        if arquivo is not None:
+            arquivo.close()
+
+def descartar_extracao():
+    """
+    Remove a extração da sessão, fechando os seus arquivos temporários
+    """
+    extracao = st.session_state.pop('extracao', None)
+    if extracao:
+        fechar_arquivos(extracao['relatorio'], extracao['exportadores'])
+
+# ==================== FUNÇÕES DE EXIBIÇÃO ====================
+
+def exibir_estatisticas(estatisticas):
+    """
+    Exibe os cartões de estatísticas (Documentos / Com Blockchain / Sem Blockchain)
+    e, quando calculadas no servidor, as quebras por tipo, mês de registro e rede
+    """
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="stats-box">
+            <div class="stats-number">{estatisticas['documentos']}</div>
+            <div class="stats-label">Documentos</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="stats-box" style="background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);">
+            <div class="stats-number">{estatisticas['com_blockchain']}</div>
+            <div class="stats-label">🔗 Com Blockchain</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="stats-box" style="background: linear-gradient(135deg, #FF9800 0%, #F57C00 100%);">
+            <div class="stats-number">{estatisticas['sem_blockchain']}</div>
+            <div class="stats-label">📄 Sem Blockchain</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if 'por_tipo' not in estatisticas:
+        st.caption("ℹ️ Detalhamento indisponível: a agregação de estatísticas falhou; exibindo apenas as contagens")
+    else:
+        with st.expander("📈 Detalhamento"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown("**Por tipo de atendimento**")
+                st.dataframe(estatisticas['por_tipo'], use_container_width=True, hide_index=True)
+            with col2:
+                st.markdown("**Registros por mês**")
+                st.dataframe(estatisticas['por_mes'], use_container_width=True, hide_index=True)
+            with col3:
+                st.markdown("**Registros por rede**")
+                st.dataframe(estatisticas['por_rede'], use_container_width=True, hide_index=True)
+
+def estatisticas_da_colecao(usuario, host, database, collection, coll, num_docs, num_com_blockchain=None):
+    """
+    Estatísticas calculadas no servidor ($facet, em cache por alguns segundos).
+    Se a agregação falhar, usa as contagens já conhecidas, sem detalhamento:
+    as da própria extração ou, na paginação, o total estimado e a contagem
+    indexada dos documentos registrados
+    """
+    try:
+        return obter_estatisticas(usuario, host, database, collection, coll)
+    except Exception:
+        pass
+    
+    if num_com_blockchain is None:
+        try:
+            num_com_blockchain = coll.count_documents(FILTRO_COM_HASH)
+        except Exception:
+            return {"documentos": num_docs, "com_blockchain": "—", "sem_blockchain": "—"}
+    return {
+        "documentos": num_docs,
+        "com_blockchain": num_com_blockchain,
+        "sem_blockchain": max(num_docs - num_com_blockchain, 0)
+    }
+
+def exibir_indices(host, coll):
+    """
+    Exibe a situação dos índices garantidos na conexão e o uso de cada índice ($indexStats)
+    """
+    with st.expander("🗂️ Índices da Coleção"):
+        preparacao = preparar_indices(host, coll)
+        if preparacao is None:
+            st.caption("ℹ️ Não foi possível conferir os índices (coleção inexistente ou sem acesso)")
+        elif not preparacao.concluida:
+            st.caption("⏳ Os índices estão sendo criados em segundo plano; reabra esta seção para ver o resultado")
+        elif preparacao.erro:
+            st.caption(f"ℹ️ Não foi possível garantir os índices: {preparacao.erro}")
+        else:
+            st.markdown("**Índices garantidos na conexão**")
+            st.dataframe(preparacao.relatorio, use_container_width=True, hide_index=True)
+        
+        try:
+            uso = uso_dos_indices(coll)
+        except Exception as e:
+            st.caption(f"ℹ️ $indexStats indisponível: {e}")
+        else:
+            st.markdown("**Uso dos índices ($indexStats)**")
+            st.dataframe(uso, use_container_width=True, hide_index=True)
+            sem_uso = [u['indice'] for u in uso if not u['acessos'] and u['indice'] != '_id_']
+            if sem_uso:
+                st.caption(f"💡 Sem acessos desde o último reinício do servidor: {', '.join(sem_uso)}")
+
+def integridade_da_pagina(coll, cabecalhos):
+    """
+    Integridade dos documentos registrados entre os cabeçalhos exibidos.
+    Busca, em uma consulta, apenas o conteúdo que entra no hash (VISAO_HASH)
+    """
+    registrados = [doc['_id'] for doc in cabecalhos if (doc.get('blockchain_info') or {}).get('document_hash')]
+    if not registrados:
+        return {}
+    return integridade_dos_documentos(coll.full_name, buscar_documentos(coll, registrados, visao=VISAO_HASH))
+
+def integridade_dos_documentos(colecao, documentos):
+    """
+    Situação de integridade (verificar_integridade_documento) de cada documento
+    registrado, por _id. Os hashes vêm do cache de hashes: só documentos novos
+    ou alterados desde o último cálculo são hasheados.
+    Retorna {} quando não é possível verificar (ex.: cache indisponível)
+    """
+    registrados = [doc for doc in documentos if (doc.get('blockchain_info') or {}).get('document_hash')]
+    if not registrados:
+        return {}
+    try:
+        hashes = obter_cache_hashes().obter(colecao, registrados)
+    except Exception:
+        return {}
+    return {
+        doc['_id']: verificar_integridade_documento(doc, hash_hex)
+        for doc, (hash_hex, _) in zip(registrados, hashes)
+    }
+
+def exibir_cabecalho(doc, doc_num, integridade=None):
+    """
+    Exibe o cabeçalho de um documento, com indicação de blockchain e, quando
+    verificada, da integridade ((integro, mensagem) de verificar_integridade_documento)
+    """
+    doc_id = str(doc.get('_id', 'N/A'))
+    
+    # Verificar se existe marca de blockchain (campo blockchain_info)
+    tem_blockchain = 'blockchain_info' in doc and doc['blockchain_info']
+    integro = integridade[0] if integridade else None
+    
+    # Cor e ícone baseado na presença de blockchain
+    if tem_blockchain and integro is False:
+        cor_borda = "#F44336"  # Vermelho
+        icone = "⚠️⛓️"
+        status_text = "REGISTRADO · MODIFICADO"
+    elif tem_blockchain and integro is True:
+        cor_borda = "#4CAF50"  # Verde
+        icone = "🛡️⛓️"
+        status_text = "REGISTRADO · ÍNTEGRO"
+    elif tem_blockchain:
+        cor_borda = "#4CAF50"  # Verde
+        icone = "🔗⛓️"
+        status_text = "REGISTRADO EM BLOCKCHAIN"
+    else:
+        cor_borda = "#FF9800"  # Laranja
+        icone = "📄"
+        status_text = "SEM REGISTRO BLOCKCHAIN"
+    
+    # Header do documento com indicação de blockchain
+    st.markdown(f"""
+    <div class="json-header" style="border-left: 4px solid {cor_borda};">
+        {icone} Documento {doc_num} - ID: {doc_id}
+        <span style="float: right; font-size: 0.85em; background-color: {cor_borda}; 
+              padding: 4px 12px; border-radius: 12px; color: white;">
+            {status_text}
+        </span>
+    </div>
+    """, unsafe_allow_html=True)
+
+def exibir_documento_sob_demanda(cabecalho, doc_num, formatados, carregar, integridade=None):
+    """
+    Exibe apenas o cabeçalho; o documento só é obtido (`carregar`) e formatado
+    quando o usuário o abre. O JSON formatado fica no cache LRU `formatados`
+    (_id -> texto), então reabrir o documento ou trocar de página não repete
+    a busca nem a formatação.
+    """
+    exibir_cabecalho(cabecalho, doc_num, integridade)
+    if integridade and integridade[0] is False:
+        st.caption(f"⚠️ {integridade[1]}")
+    
+    resumo = [
+        f"{rotulo}: {cabecalho[campo]}"
+        for campo, rotulo in (('idAtendimento', "Atendimento"), ('cnsPaciente', "CNS"), ('tipoAtendimento', "Tipo"))
+        if cabecalho.get(campo) is not None
+    ]
+    if resumo:
+        st.caption(" · ".join(resumo))
+    
+    chave = str(cabecalho['_id'])
+    if st.toggle("Ver documento completo", key=f"abrir_{chave}"):
+        texto = json_formatado(formatados, chave, carregar)
+        if texto is None:
+            st.warning("⚠️ O documento não existe mais na coleção")
+        else:
+            st.code(texto, language='json')
+
+def exibir_trecho_relatorio(relatorio, chave):
+    """
+    Exibe o formato achatado em trechos de LIMITE_PREVIA_TXT bytes, lidos do
+    arquivo do relatório sob demanda (apenas o trecho escolhido é carregado)
+    """
+    total = tamanho_relatorio(relatorio)
+    total_trechos = max(1, -(-total // LIMITE_PREVIA_TXT))
+    trecho = 1
+    if total_trechos > 1:
+        trecho = st.number_input(
+            "Trecho",
+            min_value=1,
+            max_value=total_trechos,
+            value=1,
+            key=chave,
+            help=f"O relatório ({total:,} bytes) é exibido em trechos de até {LIMITE_PREVIA_TXT:,} bytes"
+        )
+    st.text_area(
+        "Conteúdo Achatado",
+        ler_trecho_relatorio(relatorio, (int(trecho) - 1) * LIMITE_PREVIA_TXT, LIMITE_PREVIA_TXT),
+        height=400
+    )
+
+def exibir_download(arquivo, rotulo, nome_arquivo, mime, chave):
+    """
+    Download de um arquivo da extração sob demanda: os bytes só são lidos
+    quando o usuário clica em "Preparar" e valem apenas para essa execução,
+    então os demais reruns não leem o arquivo nem registram o download
+    """
+    if st.button(f"📦 Preparar {rotulo}", key=chave, use_container_width=True):
+        st.download_button(
+            label=f"📥 Download {rotulo}",
+            data=conteudo_para_download(arquivo),
+            file_name=nome_arquivo,
+            mime=mime,
+            use_container_width=True
+        )
+
+def exibir_visualizacao_paginada(paginacao):
+    """
+    Visualização com paginação no servidor: cada página é uma consulta por
+    chave (_id > último visto, limit N) e o total vem de estimated_document_count.
+    O estado (credenciais e âncoras das páginas) fica em st.session_state,
+    então trocar de página não repete a extração da coleção.
+    Cada página traz apenas os campos do cabeçalho; o corpo de um documento
+    é buscado quando ele é aberto.
+    """
+    try:
+        coll = obter_colecao(
+            paginacao['usuario'], paginacao['senha'], paginacao['host'],
+            paginacao['database'], paginacao['collection']
+        )
+        
+        num_docs = contar_documentos(coll)
+        
+        st.success(f"✅ Conexão estabelecida com sucesso!")
+        exibir_estatisticas(
+            estatisticas_da_colecao(
+                paginacao['usuario'], paginacao['host'], paginacao['database'], paginacao['collection'],
+                coll, num_docs
+            )
+        )
+        exibir_indices(paginacao['host'], coll)
+        
+        st.markdown("---")
+        st.markdown("### 📋 Documentos (Formato MongoDB Atlas)")
+        
+        total_paginas = max(1, -(-num_docs // DOCS_POR_PAGINA))
+        pagina = st.number_input(
+            "Página",
+            min_value=1,
+            max_value=total_paginas,
+            value=1,
+            key="pagina_servidor",
+            help=f"Exibindo {DOCS_POR_PAGINA} documentos por página (consulta no servidor)"
+        )
+        
+        verificar_pagina = st.toggle(
+            "🛡️ Verificar a integridade dos documentos da página",
+            key="integridade_pagina",
+            help="Busca o conteúdo dos documentos registrados da página; os hashes vêm do cache "
+                 "e só são recalculados para documentos alterados desde a última verificação"
+        )
         
-        conteudo_txt = output.getvalue()
-        output.close()
+        docs_exibir = buscar_pagina_numerada(
+            coll, int(pagina), DOCS_POR_PAGINA, paginacao['fronteiras'], visao=VISAO_CABECALHO
+        )
+        inicio = (pagina - 1) * DOCS_POR_PAGINA
         
-        return True, conteudo_txt, documentos, len(documentos)
+        integridade = integridade_da_pagina(coll, docs_exibir) if verificar_pagina else {}
+        
+        if docs_exibir:
+            st.info(f"📄 Exibindo documentos {inicio + 1} a {inicio + len(docs_exibir)} de ~{num_docs}")
+        else:
+            st.warning("⚠️ Nenhum documento nesta página")
+        
+        formatados = paginacao.setdefault('documentos_formatados', OrderedDict())
+        for idx, cabecalho in enumerate(docs_exibir):
+            exibir_documento_sob_demanda(
+                cabecalho, inicio + idx + 1, formatados,
+                lambda _id=cabecalho['_id']: buscar_documento(coll, _id),
+                integridade.get(cabecalho['_id'])
+            )
+        
+        st.markdown("---")
+        st.caption("💡 Os downloads TXT/JSON estão disponíveis nos modos Completo e Streaming")
         
     except Exception as e:
-        return False, str(e), [], 0
+        st.error("❌ **Falha de Conexão**")
+        with st.expander("🔍 Detalhes do Erro"):
+            st.code(str(e))
+
+def exibir_extracao(extracao):
+    """
+    Exibe o resultado de uma extração Completa ou Streaming, guardado em
+    st.session_state para que trocar de página, abrir documentos ou navegar
+    pelo relatório não repita a extração. A sessão guarda apenas os cabeçalhos
+    e os arquivos do relatório e das exportações; cada documento é buscado e
+    formatado quando aberto.
+    """
+    st.success(f"✅ Conexão estabelecida com sucesso!")
+    
+    # Estatísticas
+    coll = obter_colecao(
+        extracao['usuario'], extracao['senha'], extracao['host'],
+        extracao['database'], extracao['collection']
+    )
+    exibir_estatisticas(
+        estatisticas_da_colecao(
+            extracao['usuario'], extracao['host'], extracao['database'], extracao['collection'], coll,
+            extracao['num_docs'], extracao['num_com_blockchain']
+        )
+    )
+    exibir_indices(extracao['host'], coll)
+    
+    st.markdown("---")
+    
+    # Visualização em formato MongoDB Atlas
+    st.markdown("### 📋 Documentos (Formato MongoDB Atlas)")
+    
+    # Controle de paginação
+    num_docs = extracao['num_docs']
+    documentos = extracao['documentos']
+    docs_por_pagina = DOCS_POR_PAGINA
+    if extracao['modo_streaming']:
+        docs_exibir = documentos
+        idx_offset = 0
+        
+        if num_docs > docs_por_pagina:
+            st.info(f"📄 Modo streaming: exibindo os primeiros {len(docs_exibir)} de {num_docs} documentos")
+    elif num_docs > docs_por_pagina:
+        pagina = st.number_input(
+            "Página", 
+            min_value=1, 
+            max_value=-(-num_docs // docs_por_pagina),
+            value=1,
+            key="pagina_extracao",
+            help=f"Exibindo {docs_por_pagina} documentos por página"
+        )
+        inicio = (pagina - 1) * docs_por_pagina
+        fim = min(inicio + docs_por_pagina, num_docs)
+        docs_exibir = documentos[inicio:fim]
+        idx_offset = inicio
         
-    finally:
-        if client:
-            client.close()
+        st.info(f"📄 Exibindo documentos {inicio + 1} a {fim} de {num_docs}")
+    else:
+        docs_exibir = documentos
+        idx_offset = 0
+    
+    integridade = integridade_da_pagina(coll, docs_exibir)
+    for idx, cabecalho in enumerate(docs_exibir):
+        exibir_documento_sob_demanda(
+            cabecalho, idx + idx_offset + 1, extracao['documentos_formatados'],
+            lambda _id=cabecalho['_id']: buscar_documento(coll, _id),
+            integridade.get(cabecalho['_id'])
+        )
+    
+    # Aba para formato achatado (TXT)
+    st.markdown("---")
+    with st.expander("📄 Ver Formato Achatado (TXT)", expanded=False):
+        exibir_trecho_relatorio(extracao['relatorio'], "trecho_relatorio")
+    
+    # Botões de download (cada arquivo só é lido quando o seu download é preparado)
+    st.markdown("---")
+    exportadores = extracao['exportadores']
+    colunas_download = st.columns(1 + len(exportadores))
+    
+    with colunas_download[0]:
+        # Download formato achatado
+        exibir_download(
+            extracao['relatorio'], "Formato Achatado (.txt)",
+            f"relatorio_achatado_{extracao['gerado_em']}.txt", "text/plain", "download_txt"
+        )
+    
+    # Downloads JSON/Parquet (gravados documento a documento durante a extração)
+    for coluna, exportador in zip(colunas_download[1:], exportadores):
+        with coluna:
+            exibir_download(
+                exportador.arquivo, f"{exportador.rotulo} ({exportador.extensao})",
+                f"documentos_{extracao['gerado_em']}{exportador.extensao}", exportador.mime,
+                f"download{exportador.extensao}"
+            )
+
+def exibir_monitoramento(monitoramento):
+    """
+    Visualização ao vivo: a cada rerun apenas as alterações ocorridas desde o
+    anterior (change stream ou polling) são aplicadas ao cache de documentos
+    e às estatísticas, sem nova extração. Só os documentos alterados perdem o
+    JSON formatado em cache; os demais são reaproveitados.
+    """
+    monitor = monitoramento['monitor']
+    formatados = monitoramento['documentos_formatados']
+    
+    try:
+        alteracoes = monitor.atualizar()
+    except Exception as e:
+        alteracoes = []
+        st.warning(f"⚠️ Não foi possível consultar as alterações (exibindo os últimos dados): {e}")
+    
+    for alteracao in alteracoes:
+        formatados.pop(str(alteracao['_id']), None)
+    
+    if monitor.fonte == FONTE_CHANGE_STREAM:
+        st.success(f"🟢 Ao vivo via change stream · {len(monitor.documentos):,} documentos em cache")
+    else:
+        st.info(
+            f"🟡 Ao vivo via polling no campo `{monitor.campo_polling}` (change streams indisponíveis "
+            f"nesta implantação) · {len(monitor.documentos):,} documentos em cache"
+        )
+    if monitor.invalidado:
+        st.warning(f"⚠️ {monitor.invalidado}")
+    
+    exibir_estatisticas(monitor.estatisticas.resultado())
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("🔄 Atualizar agora", use_container_width=True)
+    with col2:
+        st.toggle(
+            f"Atualizar automaticamente a cada {INTERVALO_ATUALIZACAO_AO_VIVO}s",
+            key="atualizacao_automatica"
+        )
+    
+    with st.expander(f"🔔 Alterações recentes ({len(monitor.alteracoes)})", expanded=bool(alteracoes)):
+        if monitor.alteracoes:
+            st.dataframe(
+                [
+                    {"Quando": a['quando'].strftime('%H:%M:%S'), "Operação": a['operacao'], "_id": str(a['_id'])}
+                    for a in monitor.alteracoes
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.caption("Nenhuma alteração desde o início do monitoramento")
+    
+    st.markdown("---")
+    st.markdown("### 📋 Documentos (Formato MongoDB Atlas)")
+    
+    num_docs = len(monitor.documentos)
+    pagina = st.number_input(
+        "Página",
+        min_value=1,
+        max_value=max(1, -(-num_docs // DOCS_POR_PAGINA)),
+        value=1,
+        key="pagina_ao_vivo",
+        help=f"Exibindo {DOCS_POR_PAGINA} documentos por página (a partir do cache)"
+    )
+    inicio = (int(pagina) - 1) * DOCS_POR_PAGINA
+    docs_exibir = list(islice(monitor.documentos.values(), inicio, inicio + DOCS_POR_PAGINA))
+    
+    if docs_exibir:
+        st.info(f"📄 Exibindo documentos {inicio + 1} a {inicio + len(docs_exibir)} de {num_docs}")
+    else:
+        st.warning("⚠️ Nenhum documento nesta página")
+    
+    integridade = integridade_dos_documentos(monitor.collection.full_name, docs_exibir)
+    for idx, doc in enumerate(docs_exibir):
+        exibir_documento_sob_demanda(doc, inicio + idx + 1, formatados, lambda doc=doc: doc, integridade.get(doc['_id']))
+    
+    # O relatório é gerado a partir do cache, sem consultar a coleção, e apenas quando pedido
+    st.markdown("---")
+    with st.expander("📄 Ver Formato Achatado (TXT)", expanded=False):
+        if st.button("🔄 Gerar relatório com os dados atuais"):
+            fechar_arquivos(monitoramento.get('relatorio'), ())
+            monitoramento['relatorio'] = gerar_relatorio_txt(monitor.documentos.values())[0]
+            monitoramento['versao_relatorio'] = monitor.versao
+            monitoramento['relatorio_gerado_em'] = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if 'relatorio' not in monitoramento:
+            st.caption("Nenhum relatório gerado nesta sessão")
+            return
+        pendentes = monitor.versao - monitoramento['versao_relatorio']
+        if pendentes:
+            st.caption(f"{pendentes} alterações desde a geração do relatório")
+        exibir_trecho_relatorio(monitoramento['relatorio'], "trecho_ao_vivo")
+        exibir_download(
+            monitoramento['relatorio'], "Formato Achatado (.txt)",
+            f"relatorio_achatado_{monitoramento['relatorio_gerado_em']}.txt", "text/plain", "download_ao_vivo"
+        )
 
 # ==================== INTERFACE STREAMLIT ====================
 
@@ -157,152 +690,125 @@ with st.form("credenciais_form"):
         help="Endereço do cluster MongoDB"
     )
     
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        modo = st.selectbox(
+            "Modo de extração",
+            (MODO_COMPLETO, MODO_STREAMING, MODO_PAGINADO, MODO_AO_VIVO),
+            help="Streaming percorre a coleção em lotes sem manter os documentos em memória; "
+                 "Paginado consulta apenas a página exibida; "
+                 "Ao vivo carrega a coleção uma vez e aplica apenas as alterações seguintes"
+        )
+        campo_polling = st.text_input(
+            "Campo crescente (polling)",
+            value=CAMPO_POLLING_PADRAO,
+            help="Modo Ao vivo sem change streams (ex.: mongod local standalone): inserções são detectadas "
+                 "pelo _id; informe um campo de data de atualização para detectar também alterações"
+        )
+    
+    with col2:
+        tamanho_lote = st.number_input(
+            "Tamanho do lote",
+            min_value=100,
+            max_value=50_000,
+            value=TAMANHO_LOTE_PADRAO,
+            step=100,
+            help="Quantidade de documentos buscados por lote do cursor"
+        )
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        formato_json = st.selectbox(
+            "Formato da exportação JSON",
+            (FORMATO_JSON, FORMATO_NDJSON),
+            format_func=lambda f: "JSON (array)" if f == FORMATO_JSON else "NDJSON (um documento por linha)"
+        )
+    
+    with col2:
+        compactar_json = st.checkbox("Compactar exportação JSON (gzip)", value=False)
+        exportar_parquet = st.checkbox(
+            "Gerar exportação Parquet (colunar)",
+            value=False,
+            help="Chaves achatadas com tipos preservados, para cargas analíticas"
+        )
+    
     submitted = st.form_submit_button("🚀 Conectar e Extrair Dados", type="primary", use_container_width=True)
 
 # Processamento após submit
 if submitted:
+    # Um novo envio do formulário descarta a visualização anterior
+    if st.session_state.get('monitoramento'):
+        st.session_state.monitoramento['monitor'].fechar()
+        fechar_arquivos(st.session_state.monitoramento.get('relatorio'), ())
+    descartar_extracao()
+    for chave in ('paginacao', 'pagina_servidor', 'integridade_pagina', 'pagina_extracao',
+                  'trecho_relatorio', 'monitoramento', 'pagina_ao_vivo', 'trecho_ao_vivo'):
+        st.session_state.pop(chave, None)
+    
     if not senha:
         st.error("⚠️ Por favor, informe a senha do banco de dados.")
     elif len(senha) < 12:
         st.error("⚠️ A senha deve ter exatamente 12 caracteres.")
+    elif modo == MODO_PAGINADO:
+        # Usar apenas os 8 primeiros caracteres da senha
+        senha_utilizada = senha[:8]
+        st.session_state.paginacao = {
+            'usuario': usuario,
+            'senha': senha_utilizada,
+            'host': host,
+            'database': database,
+            'collection': collection,
+            'fronteiras': {},
+            'documentos_formatados': OrderedDict()
+        }
+    elif modo == MODO_AO_VIVO:
+        # Usar apenas os 8 primeiros caracteres da senha
+        senha_utilizada = senha[:8]
+        try:
+            with st.spinner("🔄 Conectando ao MongoDB e carregando a coleção..."):
+                monitor = MonitorColecao(
+                    obter_colecao(usuario, senha_utilizada, host, database, collection), campo_polling.strip()
+                )
+                monitor.iniciar()
+            st.session_state.monitoramento = {'monitor': monitor, 'documentos_formatados': OrderedDict()}
+        except Exception as e:
+            st.error("❌ **Falha de Conexão**")
+            with st.expander("🔍 Detalhes do Erro"):
+                st.code(str(e))
     else:
         # Usar apenas os 8 primeiros caracteres da senha
         senha_utilizada = senha[:8]
-        mongo_uri = f"mongodb+srv://{usuario}:{senha_utilizada}@{host}/{database}?retryWrites=true&w=majority"
+        modo_streaming = modo == MODO_STREAMING
         
         with st.spinner("🔄 Conectando ao MongoDB e extraindo dados..."):
-            sucesso, resultado_txt, documentos_originais, num_docs = buscar_e_gerar_dados(mongo_uri, database, collection)
+            sucesso, resultado, exportadores, cabecalhos, num_docs, documentos_com_blockchain = buscar_e_gerar_dados(
+                usuario, senha_utilizada, host, database, collection, modo_streaming=modo_streaming, tamanho_lote=int(tamanho_lote),
+                formato_json=formato_json, compactar_json=compactar_json, exportar_parquet=exportar_parquet
+            )
         
         if sucesso:
-            st.success(f"✅ Conexão estabelecida com sucesso!")
-            
-            # Estatísticas
-            col1, col2, col3 = st.columns(3)
-            
-            # Calcular quantidade com blockchain (verifica campo blockchain_info)
-            documentos_com_blockchain = sum(1 for doc in documentos_originais 
-                                           if 'blockchain_info' in doc and doc['blockchain_info'])
-            
-            with col1:
-                st.markdown(f"""
-                <div class="stats-box">
-                    <div class="stats-number">{num_docs}</div>
-                    <div class="stats-label">Documentos</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown(f"""
-                <div class="stats-box" style="background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);">
-                    <div class="stats-number">{documentos_com_blockchain}</div>
-                    <div class="stats-label">🔗 Com Blockchain</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                documentos_sem_blockchain = num_docs - documentos_com_blockchain
-                st.markdown(f"""
-                <div class="stats-box" style="background: linear-gradient(135deg, #FF9800 0%, #F57C00 100%);">
-                    <div class="stats-number">{documentos_sem_blockchain}</div>
-                    <div class="stats-label">📄 Sem Blockchain</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown("---")
-            
-            # Visualização em formato MongoDB Atlas
-            st.markdown("### 📋 Documentos (Formato MongoDB Atlas)")
-            
-            # Controle de paginação
-            docs_por_pagina = 10
-            if num_docs > docs_por_pagina:
-                pagina = st.number_input(
-                    "Página", 
-                    min_value=1, 
-                    max_value=(num_docs // docs_por_pagina) + 1,
-                    value=1,
-                    help=f"Exibindo {docs_por_pagina} documentos por página"
-                )
-                inicio = (pagina - 1) * docs_por_pagina
-                fim = min(inicio + docs_por_pagina, num_docs)
-                docs_exibir = documentos_originais[inicio:fim]
-                idx_offset = inicio
-                
-                st.info(f"📄 Exibindo documentos {inicio + 1} a {fim} de {num_docs}")
-            else:
-                docs_exibir = documentos_originais
-                idx_offset = 0
-            
-            # Renderizar cada documento em formato JSON
-            for idx, doc in enumerate(docs_exibir):
-                doc_num = idx + idx_offset + 1
-                doc_id = str(doc.get('_id', 'N/A'))
-                
-                # Verificar se existe marca de blockchain (campo blockchain_info)
-                tem_blockchain = 'blockchain_info' in doc and doc['blockchain_info']
-                
-                # Cor e ícone baseado na presença de blockchain
-                if tem_blockchain:
-                    cor_borda = "#4CAF50"  # Verde
-                    icone = "🔗⛓️"
-                    status_text = "REGISTRADO EM BLOCKCHAIN"
-                else:
-                    cor_borda = "#FF9800"  # Laranja
-                    icone = "📄"
-                    status_text = "SEM REGISTRO BLOCKCHAIN"
-                
-                # Header do documento com indicação de blockchain
-                st.markdown(f"""
-                <div class="json-header" style="border-left: 4px solid {cor_borda};">
-                    {icone} Documento {doc_num} - ID: {doc_id}
-                    <span style="float: right; font-size: 0.85em; background-color: {'#4CAF50' if tem_blockchain else '#FF9800'}; 
-                          padding: 4px 12px; border-radius: 12px; color: white;">
-                        {status_text}
-                    </span>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # JSON formatado
-                json_formatado = formatar_json_mongodb(doc)
-                st.code(json_formatado, language='json')
-            
-            # Aba para formato achatado (TXT)
-            st.markdown("---")
-            with st.expander("📄 Ver Formato Achatado (TXT)", expanded=False):
-                st.text_area("Conteúdo Achatado", resultado_txt, height=400)
-            
-            # Botão de download
-            st.markdown("---")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Download formato achatado
-                st.download_button(
-                    label="📥 Download Formato Achatado (.txt)",
-                    data=resultado_txt,
-                    file_name=f"relatorio_achatado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain",
-                    use_container_width=True
-                )
-            
-            with col2:
-                # Download formato JSON original
-                json_completo = json.dumps(
-                    [json.loads(dumps(doc)) for doc in documentos_originais],
-                    indent=2,
-                    ensure_ascii=False
-                )
-                st.download_button(
-                    label="📥 Download Formato JSON (.json)",
-                    data=json_completo,
-                    file_name=f"documentos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json",
-                    use_container_width=True
-                )
+            st.session_state.extracao = {
+                'usuario': usuario,
+                'senha': senha_utilizada,
+                'host': host,
+                'database': database,
+                'collection': collection,
+                'modo': modo,
+                'modo_streaming': modo_streaming,
+                'relatorio': resultado,
+                'exportadores': exportadores,
+                'documentos': cabecalhos,
+                'num_docs': num_docs,
+                'num_com_blockchain': documentos_com_blockchain,
+                'gerado_em': datetime.now().strftime('%Y%m%d_%H%M%S'),
+                'documentos_formatados': OrderedDict()
+            }
         else:
             st.error("❌ **Falha de Conexão**")
             with st.expander("🔍 Detalhes do Erro"):
-                st.code(resultado_txt)
+                st.code(resultado)
             
             st.info("""
             💡 **Dicas de Troubleshooting:**
@@ -313,6 +819,22 @@ if submitted:
             - ✓ Teste a conexão diretamente no MongoDB Compass
             """)
 
+# Visualizações persistem entre reruns (paginação, documentos abertos, trechos do relatório).
+# Uma extração de outro modo ou coleção (ex.: formulário recriado ao voltar de outra página) é descartada
+extracao = st.session_state.get('extracao')
+if extracao and (extracao['modo'], extracao['host'], extracao['database'], extracao['collection']) != (modo, host, database, collection):
+    descartar_extracao()
+if st.session_state.get('extracao'):
+    exibir_extracao(st.session_state.extracao)
+if st.session_state.get('paginacao'):
+    exibir_visualizacao_paginada(st.session_state.paginacao)
+if st.session_state.get('monitoramento'):
+    exibir_monitoramento(st.session_state.monitoramento)
+
 # Rodapé
 st.markdown("---")
-st.caption("🔒 Suas credenciais não são armazenadas e são usadas apenas durante a sessão atual.")
\ No newline at end of file
+st.caption("🔒 Suas credenciais não são armazenadas e são usadas apenas durante a sessão atual.")
+# Atualização automática do modo ao vivo: o próximo rerun aplica as alterações acumuladas
+if st.session_state.get('monitoramento') and st.session_state.get('atualizacao_automatica'):
+    time.sleep(INTERVALO_ATUALIZACAO_AO_VIVO)
+    st.rerun()
@@ -0,0 +1,214 @@
+from collections import deque
+from datetime import datetime
+from pymongo.errors import OperationFailure, PyMongoError
+from estatisticas import EstatisticasIncrementais
+
+# ==================== CONSTANTES ====================
+TEMPO_ESPERA_EVENTOS_MS = 200  # espera máxima por novos eventos em cada leitura do change stream
+MAX_ALTERACOES_POR_ATUALIZACAO = 5000  # o restante é aplicado na atualização seguinte
+MAX_ALTERACOES_RECENTES = 100
+CAMPO_POLLING_PADRAO = "_id"
+
+FONTE_CHANGE_STREAM = "change stream"
+FONTE_POLLING = "polling"
+
+OPERACAO_INSERIDO = "inserido"
+OPERACAO_ALTERADO = "alterado"
+OPERACAO_REMOVIDO = "removido"
+
+# Eventos que encerram o change stream da coleção
+EVENTOS_INVALIDACAO = ("drop", "rename", "dropDatabase", "invalidate")
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def _valor_campo(doc, campo):
+    """
+    Lê um campo com notação de ponto (ex.: blockchain_info.registered_at)
+    """
+    valor = doc
+    for parte in campo.split('.'):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+# ==================== MONITOR ====================
+
+class MonitorColecao:
+    """
+    Mantém em memória os documentos de uma coleção, indexados por _id, e as
+    estatísticas correspondentes. Após a carga inicial (a única leitura
+    completa), cada atualização aplica apenas as alterações ocorridas desde a
+    anterior. As alterações vêm de um change stream (replica sets e Atlas);
+    onde ele não está disponível (ex.: mongod local standalone), de consultas
+    por um campo crescente (polling).
+
+    No polling, inserções são detectadas pelo _id e alterações apenas quando
+    `campo_polling` (ex.: um timestamp de atualização) é diferente de _id.
+    Quando a contagem da coleção diverge do cache, os _id são comparados
+    (consulta coberta pelo índice _id_) para detectar remoções e inserções
+    fora de ordem (ex.: _id definido pela aplicação).
+    """
+
+    def __init__(self, collection, campo_polling=CAMPO_POLLING_PADRAO):
+        self.collection = collection
+        self.campo_polling = campo_polling or CAMPO_POLLING_PADRAO
+        self.documentos = {}  # _id -> documento, na ordem de chegada
+        self.estatisticas = EstatisticasIncrementais()
+        self.alteracoes = deque(maxlen=MAX_ALTERACOES_RECENTES)
+        self.versao = 0  # incrementada a cada alteração aplicada
+        self.fonte = None
+        self.invalidado = None  # motivo, quando o monitoramento não pode continuar
+        self._stream = None
+        self._ultimo_id = None
+        self._ultimo_valor = None
+
+    def _abrir_stream(self, resume_after=None):
+        return self.collection.watch(
+            full_document='updateLookup',
+            resume_after=resume_after,
+            max_await_time_ms=TEMPO_ESPERA_EVENTOS_MS
+        )
+
+    def iniciar(self):
+        """
+        Abre o change stream (ou, se indisponível, passa ao polling) e carrega
+        a coleção. O stream é aberto antes da carga: alterações feitas durante
+        a leitura são reaplicadas em seguida, sem perda, pois cada evento
+        apenas grava ou remove o documento pelo seu _id
+        """
+        try:
+            self._stream = self._abrir_stream()
+            self.fonte = FONTE_CHANGE_STREAM
+        except OperationFailure:
+            self.fonte = FONTE_POLLING
+
+        for doc in self.collection.find().sort('_id', 1):
+            self.documentos[doc['_id']] = doc
+            self.estatisticas.adicionar(doc)
+            self._avancar_marcadores(doc)
+
+    def fechar(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def atualizar(self):
+        """
+        Aplica ao cache e às estatísticas as alterações ocorridas desde a
+        última chamada.
+        Retorna as alterações aplicadas [{"operacao", "_id", "quando"}]
+        """
+        if self.invalidado:
+            return []
+        if self.fonte == FONTE_CHANGE_STREAM:
+            aplicadas = self._ler_change_stream()
+        else:
+            aplicadas = self._consultar_alteracoes()
+        return [alteracao for alteracao in aplicadas if alteracao]
+
+    # ---------- Aplicação das alterações ----------
+
+    def _registrar(self, operacao, _id):
+        alteracao = {"operacao": operacao, "_id": _id, "quando": datetime.now()}
+        self.alteracoes.appendleft(alteracao)
+        self.versao += 1
+        return alteracao
+
+    def _guardar(self, doc):
+        anterior = self.documentos.get(doc['_id'])
+        if anterior == doc:
+            return None
+        if anterior is not None:
+            self.estatisticas.remover(anterior)
+        self.documentos[doc['_id']] = doc
+        self.estatisticas.adicionar(doc)
+        return self._registrar(OPERACAO_INSERIDO if anterior is None else OPERACAO_ALTERADO, doc['_id'])
+
+    def _remover(self, _id):
+        anterior = self.documentos.pop(_id, None)
+        if anterior is None:
+            return None
+        self.estatisticas.remover(anterior)
+        return self._registrar(OPERACAO_REMOVIDO, _id)
+
+    # ---------- Change stream ----------
+
+    def _aplicar_evento(self, evento):
+        operacao = evento['operationType']
+        if operacao in EVENTOS_INVALIDACAO:
+            self.invalidado = f"A coleção foi alterada ({operacao}); reinicie o monitoramento"
+            self.fechar()
+            return None
+        if operacao == 'delete':
+            return self._remover(evento['documentKey']['_id'])
+        if operacao in ('insert', 'update', 'replace'):
+            # Sem fullDocument o documento foi removido antes da consulta do updateLookup
+            if evento.get('fullDocument') is None:
+                return self._remover(evento['documentKey']['_id'])
+            return self._guardar(evento['fullDocument'])
+        return None
+
+    def _ler_change_stream(self):
+        aplicadas = []
+        try:
+            while self._stream is not None and len(aplicadas) < MAX_ALTERACOES_POR_ATUALIZACAO:
+                evento = self._stream.try_next()
+                if evento is None:
+                    break
+                aplicadas.append(self._aplicar_evento(evento))
+        except PyMongoError:
+            # O driver já retoma erros transitórios; aqui o cursor foi perdido.
+            # Fecha o stream antigo e reabre a partir do último evento lido (resume token)
+            antigo, self._stream = self._stream, None
+            token = antigo.resume_token
+            try:
+                antigo.close()
+            except PyMongoError:
+                pass  # o cursor já não existe no servidor
+            try:
+                self._stream = self._abrir_stream(resume_after=token)
+            except PyMongoError as e:
+                self._stream = None
+                self.invalidado = f"Não foi possível retomar o change stream: {e}"
+        return aplicadas
+
+    # ---------- Polling ----------
+
+    def _avancar_marcadores(self, doc):
+        if self._ultimo_id is None or doc['_id'] > self._ultimo_id:
+            self._ultimo_id = doc['_id']
+        if self.campo_polling != CAMPO_POLLING_PADRAO:
+            valor = _valor_campo(doc, self.campo_polling)
+            if valor is not None and (self._ultimo_valor is None or valor > self._ultimo_valor):
+                self._ultimo_valor = valor
+
+    def _buscar_posteriores(self, campo, ultimo):
+        filtro = {campo: {'$gt': ultimo}} if ultimo is not None else {campo: {'$exists': True}}
+        return self.collection.find(filtro).sort(campo, 1).limit(MAX_ALTERACOES_POR_ATUALIZACAO)
+
+    def _consultar_alteracoes(self):
+        aplicadas = []
+
+        # Inserções: _id maior que o último visto
+        for doc in self._buscar_posteriores('_id', self._ultimo_id):
+            aplicadas.append(self._guardar(doc))
+            self._avancar_marcadores(doc)
+
+        # Alterações: campo crescente maior que o último visto
+        if self.campo_polling != CAMPO_POLLING_PADRAO:
+            for doc in self._buscar_posteriores(self.campo_polling, self._ultimo_valor):
+                aplicadas.append(self._guardar(doc))
+                self._avancar_marcadores(doc)
+
+        # Remoções e inserções fora de ordem: só quando a contagem não confere com o cache
+        if self.collection.estimated_document_count() != len(self.documentos):
+            existentes = {doc['_id'] for doc in self.collection.find({}, {'_id': 1})}
+            for _id in [_id for _id in self.documentos if _id not in existentes]:
+                aplicadas.append(self._remover(_id))
+            ausentes = list(existentes - self.documentos.keys())
+            if ausentes:
+                for doc in self.collection.find({'_id': {'$in': ausentes}}):
+                    aplicadas.append(self._guardar(doc))
+
+        return aplicadas
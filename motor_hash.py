@@ -0,0 +1,127 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, islice
+import bson
+import streamlit as st
+from bson.raw_bson import RawBSONDocument
+from integridade import contexto_processos, gerar_digests_campos
+# Funções executadas nos processos ficam em tarefas_hash, que não importa o Streamlit
+from tarefas_hash import _processar_lote, hash_e_caracteres, somente_hash
+
+# ==================== CONSTANTES ====================
+MAX_PROCESSOS_HASH = int(os.environ.get("PRONTUARIOS_PROCESSOS_HASH", "0")) or os.cpu_count() or 1
+# Bytes de BSON enviados a cada tarefa: lotes grandes diluem o custo de
+# serialização entre processos, lotes pequenos equilibram melhor a carga
+BYTES_POR_LOTE = 1024 * 1024
+# Abaixo desta quantidade de documentos o hash é calculado no próprio processo
+MIN_DOCUMENTOS_POOL = 64
+LOTES_EM_VOO_POR_PROCESSO = 2
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def _para_bson(documento):
+    if isinstance(documento, RawBSONDocument):
+        return documento.raw
+    return bson.encode(documento)
+
+def _para_dict(documento):
+    if isinstance(documento, RawBSONDocument):
+        return bson.decode(documento.raw)
+    return documento
+
+def _em_lotes(documentos, bytes_por_lote):
+    """
+    Agrupa os documentos, já codificados em BSON, em lotes de aproximadamente
+    `bytes_por_lote` bytes
+    """
+    lote = []
+    tamanho = 0
+
+    for documento in documentos:
+        bruto = _para_bson(documento)
+        lote.append(bruto)
+        tamanho += len(bruto)
+        if tamanho >= bytes_por_lote:
+            yield lote
+            lote = []
+            tamanho = 0
+
+    if lote:
+        yield lote
+
+@st.cache_resource(show_spinner=False)
+def obter_pool_hash(max_processos=MAX_PROCESSOS_HASH):
+    """
+    Retorna o pool de processos de hash, compartilhado entre reruns e páginas
+    (os processos são criados uma única vez, a partir do forkserver)
+    """
+    return ProcessPoolExecutor(max_workers=max_processos, mp_context=contexto_processos())
+
+# ==================== MOTOR DE HASH ====================
+
+def iterar_resultados(documentos, funcao=somente_hash, pool=None, bytes_por_lote=BYTES_POR_LOTE,
+                      ao_progredir=None):
+    """
+    Aplica `funcao` (somente_hash, gerar_digests_campos...) a cada documento
+    de um iterável, distribuindo lotes de BSON bruto entre os processos do pool.
+    Os resultados são gerados na ordem dos documentos, com uma quantidade
+    limitada de lotes em voo para manter a memória constante.
+    Os documentos são hasheados como seriam lidos de volta do MongoDB.
+    `ao_progredir(processados)` é chamado a cada lote concluído.
+    """
+    documentos = iter(documentos)
+    inicio = list(islice(documentos, MIN_DOCUMENTOS_POOL))
+
+    # Poucos documentos ou um único processador: criar tarefas custaria mais
+    # que o próprio hash
+    if len(inicio) < MIN_DOCUMENTOS_POOL or (pool is None and MAX_PROCESSOS_HASH < 2):
+        processados = 0
+        for processados, documento in enumerate(chain(inicio, documentos), 1):
+            yield funcao(_para_dict(documento))
+            if ao_progredir and processados % MIN_DOCUMENTOS_POOL == 0:
+                ao_progredir(processados)
+        if ao_progredir:
+            ao_progredir(processados)
+        return
+
+    pool = pool or obter_pool_hash()
+    max_em_voo = MAX_PROCESSOS_HASH * LOTES_EM_VOO_POR_PROCESSO
+    em_voo = deque()
+    processados = 0
+
+    def concluir_mais_antigo():
+        resultados = em_voo.popleft().result()
+        if ao_progredir:
+            ao_progredir(processados + len(resultados))
+        return resultados
+
+    try:
+        for lote in _em_lotes(chain(inicio, documentos), bytes_por_lote):
+            em_voo.append(pool.submit(_processar_lote, funcao, lote))
+            if len(em_voo) >= max_em_voo:
+                resultados = concluir_mais_antigo()
+                processados += len(resultados)
+                yield from resultados
+
+        while em_voo:
+            resultados = concluir_mais_antigo()
+            processados += len(resultados)
+            yield from resultados
+    except BrokenProcessPool:
+        # Um processo morreu (ex.: falta de memória): o próximo uso recria o pool
+        obter_pool_hash.clear()
+        raise
+
+def calcular_hashes(documentos, **opcoes):
+    """
+    Retorna a lista de hashes dos documentos, na mesma ordem
+    """
+    return list(iterar_resultados(documentos, somente_hash, **opcoes))
+
+def calcular_digests(documentos, **opcoes):
+    """
+    Retorna a lista de (hash_hex, {campo: digest}) dos documentos, na mesma ordem
+    """
+    return list(iterar_resultados(documentos, gerar_digests_campos, **opcoes))
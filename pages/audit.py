@@ -1,7 +1,11 @@
 import streamlit as st
-from web3 import Web3
+from provedor_web3 import obter_web3
 import requests
 import json
+from merkle import calcular_raiz_da_prova
+from indice_eventos import obter_indice
+from cache_blockchain import obter_cache_blockchain
+import time
 from datetime import datetime
 
 # ==================== CONFIGURAÇÃO DA PÁGINA ====================
@@ -112,22 +116,22 @@ st.markdown("""
 
 # ==================== FUNÇÕES ====================
 
-def buscar_transacao_web3(w3, tx_hash):
+def buscar_transacao_web3(cache, tx_hash):
     """
-    Busca informações da transação via Web3 (Alchemy)
+    Busca informações da transação via Web3 (Alchemy), passando pelo cache
     """
     try:
-        tx = w3.eth.get_transaction(tx_hash)
+        tx = cache.obter_transacao(tx_hash)
         return True, tx
     except Exception as e:
         return False, str(e)
 
-def buscar_receipt_web3(w3, tx_hash):
+def buscar_receipt_web3(cache, tx_hash):
     """
-    Busca o receipt da transação via Web3 (Alchemy)
+    Busca o receipt da transação via Web3 (Alchemy), passando pelo cache
     """
     try:
-        receipt = w3.eth.get_transaction_receipt(tx_hash)
+        receipt = cache.obter_recibo(tx_hash)
         return True, receipt
     except Exception as e:
         return False, str(e)
@@ -189,6 +193,36 @@ st.title("🔍 Verificador de Blockchain - Sepolia Testnet")
 st.markdown("### Sistema de Verificação de Integridade Blockchain")
 st.markdown("---")
 
+# ==================== ÍNDICE LOCAL DE EVENTOS ====================
+
+indice = obter_indice(ALCHEMY_URL, CONTRACT_ADDRESS)
+cache = obter_cache_blockchain(ALCHEMY_URL)
+
+with st.expander("📇 Índice Local de Eventos", expanded=False):
+    ultimo_bloco_indexado, total_indexado = indice.estado()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Último Bloco Indexado", f"#{ultimo_bloco_indexado}" if ultimo_bloco_indexado is not None else "N/A")
+    with col2:
+        st.metric("Hashes Indexados", f"{total_indexado:,}")
+    
+    st.caption("💡 O índice guarda os eventos HashRegistered/HashInvalidated do contrato; "
+               "com ele a auditoria precisa apenas do hash do documento.")
+    
+    if st.button("🔄 Sincronizar Índice", use_container_width=True):
+        barra_indice = st.progress(0.0, text="⏳ Lendo eventos do contrato...")
+        try:
+            novos_eventos = indice.sincronizar(
+                ao_progredir=lambda feitos, total: barra_indice.progress(
+                    feitos / total, text=f"⏳ Indexados {feitos:,} de {total:,} blocos"
+                )
+            )
+            barra_indice.progress(1.0, text="✅ Índice sincronizado")
+            st.success(f"✅ {novos_eventos} novos eventos indexados")
+        except Exception as e:
+            st.error(f"❌ Erro ao sincronizar índice: {e}")
+
 # ==================== FORMULÁRIO ====================
 
 with st.form("verification_form"):
@@ -201,18 +235,26 @@ with st.form("verification_form"):
     )
     
     tx_hash = st.text_input(
-        "Transaction Hash (TX Hash)",
-        help="Hash da transação no Sepolia (com ou sem 0x)",
+        "Transaction Hash (TX Hash) - opcional",
+        help="Hash da transação no Sepolia (com ou sem 0x). Se vazio, a verificação usa o índice local de eventos",
         placeholder="0x1234567890abcdef..."
     )
     
+    prova_merkle = st.text_area(
+        "Prova Merkle (opcional)",
+        help="Para documentos ancorados por raiz Merkle: cole o campo blockchain_info.merkle "
+             "(ou apenas a lista proof) do MongoDB",
+        placeholder='{"root": "...", "proof": [{"hash": "...", "lado": "direita"}]}',
+        height=100
+    )
+    
     submit = st.form_submit_button("🔍 Verificar no Blockchain", use_container_width=True)
 
 # ==================== PROCESSAMENTO ====================
 
 if submit:
-    if not hash_documento or not tx_hash:
-        st.error("⚠️ Por favor, preencha ambos os campos.")
+    if not hash_documento:
+        st.error("⚠️ Por favor, informe o hash do documento.")
     else:
         # Normalizar hash do documento
         hash_documento = hash_documento.strip().lower()
@@ -221,7 +263,7 @@ if submit:
         
         # Normalizar TX hash
         tx_hash = tx_hash.strip()
-        if not tx_hash.startswith('0x'):
+        if tx_hash and not tx_hash.startswith('0x'):
             tx_hash = '0x' + tx_hash
         
         # Validar comprimentos
@@ -229,213 +271,336 @@ if submit:
             st.error(f"❌ Hash do documento inválido. Deve ter 64 caracteres (tem {len(hash_documento)})")
             st.stop()
         
-        if len(tx_hash) != 66:  # 0x + 64 chars
+        if tx_hash and len(tx_hash) != 66:  # 0x + 64 chars
             st.error(f"❌ Transaction hash inválido. Deve ter 66 caracteres com 0x (tem {len(tx_hash)})")
             st.stop()
         
         st.markdown("---")
         
-        # ==================== VERIFICAÇÃO 1: SMART CONTRACT ====================
+        # Hash efetivamente registrado no contrato: o próprio hash do documento
+        # ou, para documentos ancorados, a raiz recalculada a partir da prova
+        hash_registrado = hash_documento
         
-        st.subheader("🔗 Verificação no Smart Contract")
+        # ==================== VERIFICAÇÃO 0: PROVA MERKLE ====================
         
-        with st.spinner("Consultando smart contract no Sepolia..."):
+        if prova_merkle.strip():
+            st.subheader("🌳 Prova de Inclusão Merkle")
+            
+            try:
+                dados_prova = json.loads(prova_merkle)
+            except json.JSONDecodeError as e:
+                st.error(f"❌ Prova Merkle inválida (JSON): {e}")
+                st.stop()
+            
+            prova = dados_prova.get('proof', []) if isinstance(dados_prova, dict) else dados_prova
+            
             try:
-                w3 = Web3(Web3.HTTPProvider(ALCHEMY_URL))
+                hash_registrado = calcular_raiz_da_prova(hash_documento, prova)
+            except (KeyError, TypeError, ValueError):
+                st.error("❌ Prova Merkle malformada: cada passo deve ter 'hash' e 'lado'")
+                st.stop()
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.metric("Passos da Prova", len(prova))
+            
+            with col2:
+                st.markdown("**Raiz Recalculada a partir do Hash do Documento:**")
+                st.code(hash_registrado, language=None)
+            
+            raiz_informada = dados_prova.get('root') if isinstance(dados_prova, dict) else None
+            if raiz_informada and raiz_informada.lower() != hash_registrado:
+                st.warning("⚠️ A raiz recalculada difere da raiz informada na prova - o documento não pertence a esta âncora")
+            else:
+                st.info("💡 A raiz recalculada será verificada no contrato e na transação")
+            
+            st.markdown("---")
+        
+        if not tx_hash:
+            # ==================== CONSULTA NO ÍNDICE LOCAL ====================
+            
+            st.subheader("📇 Consulta no Índice Local de Eventos")
+            
+            inicio_consulta = time.perf_counter()
+            registro = indice.consultar(hash_registrado)
+            duracao_us = (time.perf_counter() - inicio_consulta) * 1_000_000
+            ultimo_bloco, _ = indice.estado()
+            
+            if ultimo_bloco is None:
+                st.warning("⚠️ O índice local ainda não foi sincronizado. Use o botão \"Sincronizar Índice\" acima "
+                           "ou informe o Transaction Hash para verificar diretamente no blockchain.")
+            elif registro is None:
+                st.markdown(f"""
+                <div class="verification-box-warning">
+                    <h2 style="margin: 0;">⚠️ HASH NÃO ENCONTRADO</h2>
+                    <p style="margin: 10px 0 0 0; font-size: 1.1em;">Nenhum evento HashRegistered para este hash até o bloco #{ultimo_bloco}</p>
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                if registro['invalidado']:
+                    st.markdown("""
+                    <div class="verification-box-warning">
+                        <h2 style="margin: 0;">🔴 HASH INVALIDADO</h2>
+                        <p style="margin: 10px 0 0 0; font-size: 1.1em;">O hash foi registrado e posteriormente invalidado no contrato</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.markdown("""
+                    <div class="verification-box-success">
+                        <h2 style="margin: 0;">✅ HASH REGISTRADO</h2>
+                        <p style="margin: 10px 0 0 0; font-size: 1.1em;">O hash está registrado e válido no contrato</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                col1, col2, col3, col4 = st.columns(4)
                 
-                if not w3.is_connected():
-                    st.error("❌ Não foi possível conectar à Sepolia Testnet")
-                    st.stop()
+                with col1:
+                    st.metric("Status", "🔴 INVALIDADO" if registro['invalidado'] else "🟢 VÁLIDO")
+                
+                with col2:
+                    dt = datetime.fromtimestamp(registro['timestamp'])
+                    st.metric("Data de Registro", dt.strftime('%d/%m/%Y'))
+                    st.caption(dt.strftime('%H:%M:%S'))
+                
+                with col3:
+                    st.metric("Provedor", registro['provider'][:10] + "...")
                 
-                contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
-                resultado_contrato = verificar_hash_no_contrato(w3, contract, hash_documento)
+                with col4:
+                    st.metric("Bloco", f"#{registro['block_number']}")
                 
-                if "error" in resultado_contrato:
-                    st.error(f"❌ Erro ao consultar contrato: {resultado_contrato['error']}")
-                elif resultado_contrato["exists"]:
-                    st.success("✅ Hash encontrado no smart contract!")
+                st.write("**Tipo de Registro:**", registro['record_type'])
+                st.write("**Record ID:**", registro['record_id'])
+                st.write("**Transação:**", registro['transaction_hash'])
+                
+                with st.expander("📋 Registro Completo do Índice"):
+                    st.json(registro)
+                
+                st.link_button(
+                    "🔗 Ver Transação Completa no Etherscan",
+                    f"https://sepolia.etherscan.io/tx/{registro['transaction_hash']}",
+                    use_container_width=True
+                )
+            
+            if ultimo_bloco is not None:
+                st.caption(f"⚡ Consulta local em {duracao_us:.0f} µs - índice atualizado até o bloco #{ultimo_bloco}")
+        else:
+            # ==================== VERIFICAÇÃO 1: SMART CONTRACT ====================
+        
+            st.subheader("🔗 Verificação no Smart Contract")
+        
+            with st.spinner("Consultando smart contract no Sepolia..."):
+                try:
+                    w3 = obter_web3(ALCHEMY_URL)
+                
+                    contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+                    resultado_contrato = verificar_hash_no_contrato(w3, contract, hash_registrado)
+                
+                    if "error" in resultado_contrato:
+                        st.error(f"❌ Erro ao consultar contrato: {resultado_contrato['error']}")
+                    elif resultado_contrato["exists"]:
+                        st.success("✅ Hash encontrado no smart contract!")
                     
-                    col1, col2, col3 = st.columns(3)
+                        col1, col2, col3 = st.columns(3)
                     
-                    with col1:
-                        status = "🟢 VÁLIDO" if resultado_contrato["is_valid"] else "🔴 INVALIDADO"
-                        st.metric("Status", status)
+                        with col1:
+                            status = "🟢 VÁLIDO" if resultado_contrato["is_valid"] else "🔴 INVALIDADO"
+                            st.metric("Status", status)
                     
-                    with col2:
-                        if resultado_contrato["timestamp"] > 0:
-                            dt = datetime.fromtimestamp(resultado_contrato["timestamp"])
-                            st.metric("Data de Registro", dt.strftime('%d/%m/%Y'))
-                            st.caption(dt.strftime('%H:%M:%S'))
-                        else:
-                            st.metric("Data de Registro", "N/A")
+                        with col2:
+                            if resultado_contrato["timestamp"] > 0:
+                                dt = datetime.fromtimestamp(resultado_contrato["timestamp"])
+                                st.metric("Data de Registro", dt.strftime('%d/%m/%Y'))
+                                st.caption(dt.strftime('%H:%M:%S'))
+                            else:
+                                st.metric("Data de Registro", "N/A")
                     
-                    with col3:
-                        st.metric("Provedor", resultado_contrato["provider"][:10] + "...")
+                        with col3:
+                            st.metric("Provedor", resultado_contrato["provider"][:10] + "...")
                     
-                    with st.expander("📋 Detalhes Completos do Contrato"):
-                        st.json(resultado_contrato)
-                else:
-                    st.warning("⚠️ Hash NÃO encontrado no smart contract")
-                    st.info("Isso pode significar que o hash nunca foi registrado ou foi registrado em outro contrato.")
+                        with st.expander("📋 Detalhes Completos do Contrato"):
+                            st.json(resultado_contrato)
+                    else:
+                        st.warning("⚠️ Hash NÃO encontrado no smart contract")
+                        st.info("Isso pode significar que o hash nunca foi registrado ou foi registrado em outro contrato.")
                 
-            except Exception as e:
-                st.error(f"❌ Erro ao verificar contrato: {e}")
-                resultado_contrato = None
+                except Exception as e:
+                    st.error(f"❌ Erro ao verificar contrato: {e}")
+                    resultado_contrato = None
         
-        # ==================== VERIFICAÇÃO 2: TRANSAÇÃO WEB3 ====================
+            # ==================== VERIFICAÇÃO 2: TRANSAÇÃO WEB3 ====================
         
-        st.markdown("---")
-        st.subheader("📡 Verificação da Transação (Web3)")
+            st.markdown("---")
+            st.subheader("📡 Verificação da Transação (Web3)")
         
-        with st.spinner("Buscando transação via Web3/Alchemy..."):
-            sucesso_tx, dados_tx = buscar_transacao_web3(w3, tx_hash)
+            with st.spinner("Buscando transação via Web3/Alchemy..."):
+                sucesso_tx, dados_tx = buscar_transacao_web3(cache, tx_hash)
             
-            if sucesso_tx:
-                st.success("✅ Transação encontrada!")
+                if sucesso_tx:
+                    st.success("✅ Transação encontrada!")
                 
-                # Informações da transação
-                col1, col2, col3 = st.columns(3)
+                    # Informações da transação
+                    col1, col2, col3 = st.columns(3)
                 
-                with col1:
-                    st.metric("Bloco", f"#{dados_tx['blockNumber']}")
+                    with col1:
+                        st.metric("Bloco", f"#{dados_tx['blockNumber']}")
                 
-                with col2:
-                    st.metric("From", dados_tx['from'][:10] + "...")
+                    with col2:
+                        st.metric("From", dados_tx['from'][:10] + "...")
                 
-                with col3:
-                    st.metric("To (Contrato)", dados_tx['to'][:10] + "..." if dados_tx['to'] else "N/A")
+                    with col3:
+                        st.metric("To (Contrato)", dados_tx['to'][:10] + "..." if dados_tx['to'] else "N/A")
                 
-                # Verificar input data
-                input_data = dados_tx.get("input", "")
-                hash_extraido = extrair_hash_do_input_data(input_data)
+                    # Verificar input data
+                    input_data = dados_tx.get("input", "")
+                    hash_extraido = extrair_hash_do_input_data(input_data)
                 
-                if hash_extraido:
-                    st.markdown("---")
-                    st.subheader("🔐 Comparação de Hashes")
+                    if hash_extraido:
+                        st.markdown("---")
+                        st.subheader("🔐 Comparação de Hashes")
                     
-                    col1, col2 = st.columns(2)
+                        col1, col2 = st.columns(2)
                     
-                    with col1:
-                        st.markdown("**Hash do Documento (Informado):**")
-                        st.code(hash_documento, language=None)
+                        with col1:
+                            if hash_registrado != hash_documento:
+                                st.markdown("**Raiz Merkle (Recalculada):**")
+                            else:
+                                st.markdown("**Hash do Documento (Informado):**")
+                            st.code(hash_registrado, language=None)
                     
-                    with col2:
-                        st.markdown("**Hash Extraído da Transação:**")
-                        st.code(hash_extraido, language=None)
+                        with col2:
+                            st.markdown("**Hash Extraído da Transação:**")
+                            st.code(hash_extraido, language=None)
                     
-                    # Comparar hashes
-                    if hash_documento.lower() == hash_extraido.lower():
-                        st.markdown("""
-                        <div class="verification-box-success">
-                            <h2 style="margin: 0;">✅ VERIFICAÇÃO COMPLETA</h2>
-                            <p style="margin: 10px 0 0 0; font-size: 1.2em;">Os hashes correspondem perfeitamente!</p>
-                            <p style="margin: 10px 0 0 0;">O hash do documento está registrado nesta transação blockchain</p>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        # Comparar hashes
+                        if hash_registrado.lower() == hash_extraido.lower():
+                            st.markdown("""
+                            <div class="verification-box-success">
+                                <h2 style="margin: 0;">✅ VERIFICAÇÃO COMPLETA</h2>
+                                <p style="margin: 10px 0 0 0; font-size: 1.2em;">Os hashes correspondem perfeitamente!</p>
+                                <p style="margin: 10px 0 0 0;">O hash do documento está registrado nesta transação blockchain</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        else:
+                            st.markdown("""
+                            <div class="verification-box-warning">
+                                <h2 style="margin: 0;">⚠️ HASHES DIFERENTES</h2>
+                                <p style="margin: 10px 0 0 0; font-size: 1.2em;">Os hashes não correspondem</p>
+                                <p style="margin: 10px 0 0 0;">O hash informado NÃO corresponde ao registrado nesta transação</p>
+                            </div>
+                            """, unsafe_allow_html=True)
                     else:
-                        st.markdown("""
-                        <div class="verification-box-warning">
-                            <h2 style="margin: 0;">⚠️ HASHES DIFERENTES</h2>
-                            <p style="margin: 10px 0 0 0; font-size: 1.2em;">Os hashes não correspondem</p>
-                            <p style="margin: 10px 0 0 0;">O hash informado NÃO corresponde ao registrado nesta transação</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.warning("⚠️ Não foi possível extrair o hash dos dados da transação")
+                        st.warning("⚠️ Não foi possível extrair o hash dos dados da transação")
                 
-                # Mostrar input data completo
-                with st.expander("🔍 Ver Input Data Completo"):
-                    if hasattr(input_data, 'hex'):
-                        st.code(input_data.hex(), language=None)
-                    else:
-                        st.code(str(input_data), language=None)
+                    # Mostrar input data completo
+                    with st.expander("🔍 Ver Input Data Completo"):
+                        if hasattr(input_data, 'hex'):
+                            st.code(input_data.hex(), language=None)
+                        else:
+                            st.code(str(input_data), language=None)
                 
-            else:
-                st.error(f"❌ Transação não encontrada: {dados_tx}")
+                else:
+                    st.error(f"❌ Transação não encontrada: {dados_tx}")
         
-        # Buscar receipt
-        with st.spinner("Buscando receipt da transação..."):
-            sucesso_receipt, dados_receipt = buscar_receipt_web3(w3, tx_hash)
+            # Buscar receipt
+            with st.spinner("Buscando receipt da transação..."):
+                sucesso_receipt, dados_receipt = buscar_receipt_web3(cache, tx_hash)
             
-            if sucesso_receipt:
-                status = dados_receipt.get("status", 0)
+                if sucesso_receipt:
+                    status = dados_receipt.get("status", 0)
                 
-                if status == 1:
-                    st.success("✅ Transação confirmada com sucesso")
-                else:
-                    st.error("❌ Transação falhou ou foi revertida")
+                    if status == 1:
+                        st.success("✅ Transação confirmada com sucesso")
+                    else:
+                        st.error("❌ Transação falhou ou foi revertida")
                 
-                col1, col2 = st.columns(2)
+                    col1, col2, col3 = st.columns(3)
                 
-                with col1:
-                    gas_used = dados_receipt.get("gasUsed", 0)
-                    st.metric("Gas Usado", f"{gas_used:,}")
+                    with col1:
+                        gas_used = dados_receipt.get("gasUsed", 0)
+                        st.metric("Gas Usado", f"{gas_used:,}")
                 
-                with col2:
-                    st.metric("Status", "✅ Sucesso" if status == 1 else "❌ Falhou")
+                    with col2:
+                        st.metric("Status", "✅ Sucesso" if status == 1 else "❌ Falhou")
+                
+                    with col3:
+                        try:
+                            bloco = cache.obter_bloco(dados_receipt["blockNumber"])
+                            dt = datetime.fromtimestamp(bloco["timestamp"])
+                            st.metric("Data do Bloco", dt.strftime('%d/%m/%Y'))
+                            st.caption(dt.strftime('%H:%M:%S'))
+                        except Exception:
+                            st.metric("Data do Bloco", "N/A")
+            
+            estatisticas = cache.estatisticas()
+            st.caption(
+                f"🗄️ Cache blockchain: {estatisticas['acertos_memoria'] + estatisticas['acertos_disco']} acertos "
+                f"({estatisticas['acertos_memoria']} memória, {estatisticas['acertos_disco']} disco), "
+                f"{estatisticas['faltas']} consultas RPC, {estatisticas['em_disco']} entradas em disco"
+            )
         
-        # ==================== RESUMO FINAL ====================
+            # ==================== RESUMO FINAL ====================
         
-        st.markdown("---")
-        st.subheader("📊 Resumo da Verificação")
+            st.markdown("---")
+            st.subheader("📊 Resumo da Verificação")
         
-        # Determinar resultado final
-        hash_no_contrato = resultado_contrato and resultado_contrato.get("exists", False)
-        hash_na_transacao = sucesso_tx and hash_extraido and (hash_documento.lower() == hash_extraido.lower())
+            # Determinar resultado final
+            hash_no_contrato = resultado_contrato and resultado_contrato.get("exists", False)
+            hash_na_transacao = sucesso_tx and hash_extraido and (hash_registrado.lower() == hash_extraido.lower())
         
-        if hash_no_contrato and hash_na_transacao:
-            st.markdown("""
-            <div class="info-card" style="border-left-color: #4CAF50;">
-                <h4>🎉 Verificação Completa e Bem-Sucedida</h4>
-                <ul>
-                    <li>✅ Hash encontrado no smart contract</li>
-                    <li>✅ Hash confirmado na transação blockchain</li>
-                    <li>✅ Hashes correspondem perfeitamente</li>
-                    <li>✅ Documento autêntico e não adulterado</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        elif hash_no_contrato and not hash_na_transacao:
-            st.markdown("""
-            <div class="info-card" style="border-left-color: #FF9800;">
-                <h4>⚠️ Verificação Parcial</h4>
-                <ul>
-                    <li>✅ Hash encontrado no smart contract</li>
-                    <li>❌ Hash não corresponde à transação informada</li>
-                    <li>💡 O hash pode ter sido registrado em outra transação</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        elif not hash_no_contrato and hash_na_transacao:
-            st.markdown("""
-            <div class="info-card" style="border-left-color: #FF9800;">
-                <h4>⚠️ Situação Inconsistente</h4>
-                <ul>
-                    <li>❌ Hash NÃO encontrado no smart contract</li>
-                    <li>✅ Hash presente na transação</li>
-                    <li>⚠️ A transação pode ter falhado ou sido revertida</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown("""
-            <div class="info-card" style="border-left-color: #f44336;">
-                <h4>❌ Verificação Falhou</h4>
-                <ul>
-                    <li>❌ Hash NÃO encontrado no smart contract</li>
-                    <li>❌ Hash não corresponde à transação</li>
-                    <li>⚠️ Verifique se os dados informados estão corretos</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
+            if hash_no_contrato and hash_na_transacao:
+                st.markdown("""
+                <div class="info-card" style="border-left-color: #4CAF50;">
+                    <h4>🎉 Verificação Completa e Bem-Sucedida</h4>
+                    <ul>
+                        <li>✅ Hash encontrado no smart contract</li>
+                        <li>✅ Hash confirmado na transação blockchain</li>
+                        <li>✅ Hashes correspondem perfeitamente</li>
+                        <li>✅ Documento autêntico e não adulterado</li>
+                    </ul>
+                </div>
+                """, unsafe_allow_html=True)
+            elif hash_no_contrato and not hash_na_transacao:
+                st.markdown("""
+                <div class="info-card" style="border-left-color: #FF9800;">
+                    <h4>⚠️ Verificação Parcial</h4>
+                    <ul>
+                        <li>✅ Hash encontrado no smart contract</li>
+                        <li>❌ Hash não corresponde à transação informada</li>
+                        <li>💡 O hash pode ter sido registrado em outra transação</li>
+                    </ul>
+                </div>
+                """, unsafe_allow_html=True)
+            elif not hash_no_contrato and hash_na_transacao:
+                st.markdown("""
+                <div class="info-card" style="border-left-color: #FF9800;">
+                    <h4>⚠️ Situação Inconsistente</h4>
+                    <ul>
+                        <li>❌ Hash NÃO encontrado no smart contract</li>
+                        <li>✅ Hash presente na transação</li>
+                        <li>⚠️ A transação pode ter falhado ou sido revertida</li>
+                    </ul>
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                st.markdown("""
+                <div class="info-card" style="border-left-color: #f44336;">
+                    <h4>❌ Verificação Falhou</h4>
+                    <ul>
+                        <li>❌ Hash NÃO encontrado no smart contract</li>
+                        <li>❌ Hash não corresponde à transação</li>
+                        <li>⚠️ Verifique se os dados informados estão corretos</li>
+                    </ul>
+                </div>
+                """, unsafe_allow_html=True)
         
-        # Link para Etherscan
-        st.markdown("---")
-        st.link_button(
-            "🔗 Ver Transação Completa no Etherscan",
-            f"https://sepolia.etherscan.io/tx/{tx_hash}",
-            use_container_width=True
-        )
+            # Link para Etherscan
+            st.markdown("---")
+            st.link_button(
+                "🔗 Ver Transação Completa no Etherscan",
+                f"https://sepolia.etherscan.io/tx/{tx_hash}",
+                use_container_width=True
+            )
 
 # ==================== INSTRUÇÕES ====================
 
@@ -454,8 +619,12 @@ with st.expander("ℹ️ Como Usar Este Verificador"):
     ### 📝 Como Usar
     
     1. **Hash do Documento**: Cole o hash SHA-256 (64 caracteres) do documento
-    2. **Transaction Hash**: Cole o hash da transação blockchain (66 caracteres com 0x)
-    3. Clique em "Verificar no Blockchain"
+    2. **Transaction Hash** (opcional): Cole o hash da transação blockchain (66 caracteres com 0x).
+       Se ficar vazio, o hash é procurado no índice local de eventos, sem consultas ao blockchain
+       (sincronize o índice antes em "Índice Local de Eventos")
+    3. **Prova Merkle** (apenas documentos ancorados em lote): cole o campo `blockchain_info.merkle`;
+       a raiz é recalculada a partir do hash do documento e verificada no lugar dele
+    4. Clique em "Verificar no Blockchain"
     
     ### ✅ Resultados Possíveis
     
@@ -467,6 +636,7 @@ with st.expander("ℹ️ Como Usar Este Verificador"):
     
     - **Hash do Documento**: Campo `blockchain_info.document_hash` no MongoDB
     - **Transaction Hash**: Campo `blockchain_info.transaction.transaction_hash` no MongoDB
+    - **Prova Merkle**: Campo `blockchain_info.merkle` no MongoDB (quando `anchoring` = `merkle`)
     - Ou use o sistema de visualização de documentos para copiar os valores
     """)
 
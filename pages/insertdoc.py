@@ -1,6 +1,25 @@
 import streamlit as st
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from conexao import obter_colecao
+from ingestao import (
+    TAMANHO_LOTE_INGESTAO,
+    FORMATO_AUTOMATICO,
+    FORMATO_ARRAY_JSON,
+    FORMATO_NDJSON,
+    CONFIRMACOES_ESCRITA,
+    DUPLICADOS_IGNORAR,
+    DUPLICADOS_UPSERT,
+    abrir_fluxo,
+    iterar_documentos,
+    criar_write_concern,
+    atribuir_hash_conteudo,
+    inserir_em_lotes
+)
+from integridade import CAMPO_HASH_CONTEUDO
+from indices import garantir_indice_hash_conteudo
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from datetime import datetime
+import csv
+import io
 import json
 
 # ==================== CONFIGURAÇÃO DA PÁGINA ====================
@@ -40,6 +59,19 @@ st.title("📤 Upload de Documento para MongoDB")
 st.markdown("### Sistema de Inserção de Registros JSON")
 st.markdown("---")
 
+MODO_DOCUMENTO_UNICO = "unico"
+MODO_LOTE = "lote"
+
+modo_insercao = st.radio(
+    "Modo de inserção",
+    options=[MODO_DOCUMENTO_UNICO, MODO_LOTE],
+    format_func=lambda modo: {
+        MODO_DOCUMENTO_UNICO: "📄 Documento único",
+        MODO_LOTE: "📦 Ingestão em lote (array JSON, NDJSON, gzip)"
+    }[modo],
+    horizontal=True
+)
+
 # ==================== FORMULÁRIO ====================
 
 with st.form("upload_form"):
@@ -67,14 +99,65 @@ with st.form("upload_form"):
     st.markdown("---")
     st.subheader("📄 Arquivo JSON")
     
-    uploaded_file = st.file_uploader(
-        "Selecione o arquivo JSON",
-        type=['json', 'txt'],
-        help="Arquivo deve conter um único objeto JSON válido"
-    )
+    if modo_insercao == MODO_LOTE:
+        uploaded_file = st.file_uploader(
+            "Selecione o arquivo de documentos",
+            type=['json', 'ndjson', 'jsonl', 'txt', 'gz'],
+            help="Array JSON de objetos ou um objeto JSON por linha (NDJSON), opcionalmente compactado com gzip"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            formato = st.selectbox(
+                "Formato",
+                options=[FORMATO_AUTOMATICO, FORMATO_ARRAY_JSON, FORMATO_NDJSON],
+                format_func=lambda f: {
+                    FORMATO_AUTOMATICO: "Detectar automaticamente",
+                    FORMATO_ARRAY_JSON: "Array JSON",
+                    FORMATO_NDJSON: "NDJSON (um objeto por linha)"
+                }[f]
+            )
+            tamanho_lote = st.number_input(
+                "Documentos por lote",
+                min_value=100,
+                max_value=50_000,
+                value=TAMANHO_LOTE_INGESTAO,
+                step=100,
+                help="Quantidade de documentos enviada em cada insert_many"
+            )
+        with col2:
+            confirmacao_escrita = st.selectbox(
+                "Confirmação de escrita (w)",
+                options=CONFIRMACOES_ESCRITA,
+                help="1: confirmação do primário (mais rápido); majority: confirmação da maioria do replica set"
+            )
+            journal = st.checkbox(
+                "Exigir gravação no journal (j)",
+                value=False,
+                help="Mais seguro contra quedas do servidor, porém mais lento"
+            )
+            duplicados = st.selectbox(
+                "Documentos já existentes",
+                options=[DUPLICADOS_IGNORAR, DUPLICADOS_UPSERT],
+                format_func=lambda d: {
+                    DUPLICADOS_IGNORAR: "Ignorar (recusados pelo índice único)",
+                    DUPLICADOS_UPSERT: "Upsert (inserir apenas os novos)"
+                }[d],
+                help="Duplicados são identificados pelo hash do conteúdo (o mesmo usado no registro blockchain). "
+                     "Nos dois modos o documento existente não é alterado."
+            )
+    else:
+        uploaded_file = st.file_uploader(
+            "Selecione o arquivo JSON",
+            type=['json', 'txt'],
+            help="Arquivo deve conter um único objeto JSON válido"
+        )
     
     # Prévia do arquivo
-    if uploaded_file is not None:
+    if uploaded_file is not None and modo_insercao == MODO_LOTE:
+        st.info(f"📦 {uploaded_file.name} ({uploaded_file.size / 1024 ** 2:.1f} MB) - "
+                "os documentos serão lidos e validados durante a ingestão")
+    elif uploaded_file is not None:
         try:
             # Ler conteúdo do arquivo
             file_content = uploaded_file.read().decode('utf-8')
@@ -110,6 +193,87 @@ if submit:
         st.error("⚠️ A senha deve ter exatamente 12 caracteres.")
     elif uploaded_file is None:
         st.error("⚠️ Por favor, selecione um arquivo JSON.")
+    elif modo_insercao == MODO_LOTE:
+        try:
+            # Usar apenas os 8 primeiros caracteres da senha
+            senha_utilizada = senha_mongodb[:8]
+            
+            with st.spinner("🔄 Conectando ao MongoDB..."):
+                coll = obter_colecao(usuario, senha_utilizada, host, database, collection)
+            st.success("✅ Conexão estabelecida com MongoDB!")
+            
+            status_lote = st.empty()
+            
+            def ao_concluir_lote(estatisticas, resumo):
+                status_lote.info(
+                    f"📦 Lote {estatisticas['lote']}: {estatisticas['inseridos']:,} de "
+                    f"{estatisticas['documentos']:,} inseridos em {estatisticas['segundos']:.2f}s "
+                    f"({estatisticas['documentos_por_segundo'] or 0:,.0f} docs/s) - "
+                    f"total {resumo['inseridos']:,} inseridos, {len(resumo['duplicados']):,} duplicados, "
+                    f"{len(resumo['falhas']):,} falhas"
+                )
+            
+            # Leitura em fluxo: os documentos são lidos e inseridos lote a lote
+            inicio = datetime.now()
+            resumo = inserir_em_lotes(
+                coll,
+                iterar_documentos(abrir_fluxo(uploaded_file), formato),
+                tamanho_lote=int(tamanho_lote),
+                write_concern=criar_write_concern(confirmacao_escrita, journal),
+                duplicados=duplicados,
+                ao_concluir_lote=ao_concluir_lote
+            )
+            duracao = (datetime.now() - inicio).total_seconds()
+            status_lote.empty()
+            
+            st.markdown("---")
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                st.metric("Inseridos", f"{resumo['inseridos']:,}")
+            with col2:
+                st.metric("Duplicados", f"{len(resumo['duplicados']):,}")
+            with col3:
+                st.metric("Falhas", f"{len(resumo['falhas']):,}")
+            with col4:
+                st.metric("Lotes", len(resumo['lotes']))
+            with col5:
+                st.metric("Docs/s", f"{resumo['inseridos'] / duracao:,.0f}" if duracao else "N/A")
+            
+            st.caption(f"⏱️ Ingestão concluída em {duracao:.1f}s")
+            
+            if resumo['lotes']:
+                with st.expander(f"📊 Vazão por Lote ({len(resumo['lotes'])})"):
+                    st.dataframe(resumo['lotes'], use_container_width=True, hide_index=True)
+            
+            if resumo['duplicados']:
+                with st.expander(f"♻️ Documentos Já Existentes ({len(resumo['duplicados']):,})"):
+                    st.caption("Conteúdo idêntico a um documento da coleção (ou repetido no próprio arquivo) - não inseridos")
+                    st.dataframe(resumo['duplicados'][:1000], use_container_width=True, hide_index=True)
+            
+            if resumo['falhas']:
+                with st.expander(f"❌ Registros Recusados ({len(resumo['falhas']):,})", expanded=True):
+                    st.caption("Posição = linha no NDJSON ou item no array JSON")
+                    st.dataframe(resumo['falhas'][:1000], use_container_width=True, hide_index=True)
+                    
+                    saida = io.StringIO()
+                    escritor = csv.DictWriter(saida, fieldnames=["posicao", "erro"])
+                    escritor.writeheader()
+                    escritor.writerows(resumo['falhas'])
+                    st.download_button(
+                        "📥 Baixar Falhas (CSV)",
+                        saida.getvalue(),
+                        file_name=f"falhas_ingestao_{collection}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
+            elif resumo['inseridos']:
+                st.balloons()
+            
+        except ConnectionFailure:
+            st.error("❌ Falha ao conectar ao MongoDB. Verifique suas credenciais e conexão de rede.")
+        except Exception as e:
+            st.error(f"❌ Erro inesperado: {e}")
+            st.info("💡 Os documentos dos lotes já concluídos permanecem inseridos na coleção")
     else:
         try:
             # Ler e validar JSON
@@ -122,27 +286,27 @@ if submit:
             
             # Usar apenas os 8 primeiros caracteres da senha
             senha_utilizada = senha_mongodb[:8]
-            mongo_uri = f"mongodb+srv://{usuario}:{senha_utilizada}@{host}/{database}?retryWrites=true&w=majority"
             
-            # Conectar ao MongoDB
+            # Conectar ao MongoDB (cliente compartilhado, conexão testada com ping ao ser criada)
             with st.spinner("🔄 Conectando ao MongoDB..."):
-                client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-                
-                # Testar conexão
-                client.admin.command('ping')
+                coll = obter_colecao(usuario, senha_utilizada, host, database, collection)
                 st.success("✅ Conexão estabelecida com MongoDB!")
                 
-                # Selecionar database e coleção
-                db = client[database]
-                coll = db[collection]
-                
-                # Inserir documento
+                # Inserir documento (o índice único do hash do conteúdo impede duplicatas)
                 with st.spinner("📝 Inserindo documento..."):
-                    result = coll.insert_one(documento)
+                    garantir_indice_hash_conteudo(coll)
+                    hash_conteudo = atribuir_hash_conteudo(documento)
+                    try:
+                        result = coll.insert_one(documento)
+                    except DuplicateKeyError:
+                        existente = coll.find_one({CAMPO_HASH_CONTEUDO: hash_conteudo}, {'_id': 1})
+                        if existente is None:
+                            raise
+                        st.warning("♻️ Este conteúdo já existe na coleção - nenhum documento foi inserido")
+                        st.code(str(existente['_id']), language=None)
+                        st.caption(f"Hash do conteúdo: {hash_conteudo}")
+                        st.stop()
                     object_id = result.inserted_id
-                
-                # Fechar conexão
-                client.close()
             
             # Exibir sucesso
             st.markdown("---")
@@ -223,10 +387,15 @@ with st.expander("ℹ️ Instruções de Uso"):
        - Use-o para consultas e verificações
     
     ### ⚠️ Observações:
-    - Cada upload cria um **novo documento** no MongoDB
+    - Cada upload cria um **novo documento** no MongoDB, a menos que o mesmo conteúdo já exista
     - O ObjectId (_id) é gerado automaticamente pelo MongoDB
-    - Não há verificação de duplicatas
-    - O hash será gerado apenas no momento do registro blockchain
+    - Duplicatas são detectadas pelo hash do conteúdo (campo `content_hash`, com índice único)
+    - O hash SHA-256 do conteúdo é calculado na inserção e é o mesmo registrado depois no blockchain
+    
+    ### 📦 Ingestão em lote:
+    - Aceita um **array JSON** de objetos ou **NDJSON** (um objeto por linha), com ou sem **gzip**
+    - O arquivo é lido em fluxo e inserido em lotes com `insert_many(ordered=False)`
+    - Registros inválidos ou recusados não interrompem a ingestão; são listados ao final com a posição no arquivo
     """)
 
 # ==================== RODAPÉ ====================
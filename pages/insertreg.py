@@ -1,8 +1,29 @@
 import streamlit as st
-from web3 import Web3
-from pymongo import MongoClient
+from provedor_web3 import obter_web3
+from conexao import obter_colecao
+from consultas import VISAO_HASH, buscar_documento
 from bson.objectid import ObjectId
-import hashlib
+from integridade import FILTRO_SEM_HASH, PreviaValores, previa_valores, gerar_digests_campos
+from cache_hashes import obter_cache_hashes
+from registro_lote import (
+    MAX_DOCUMENTOS_LOTE,
+    ETHERSCAN_TX_URL,
+    MODO_TRANSACAO_POR_DOCUMENTO,
+    MODO_ANCORA_MERKLE,
+    calcular_taxas,
+    assinar_e_enviar,
+    buscar_documentos_sem_registro,
+    enviar_transacoes,
+    enviar_ancora_merkle
+)
+from confirmacoes import (
+    STATUS_PENDENTE,
+    STATUS_CONFIRMADA,
+    STATUS_REVERTIDA,
+    STATUS_DESCONHECIDA,
+    chave_colecao,
+    obter_rastreador
+)
 import json
 from datetime import datetime
 
@@ -321,46 +342,6 @@ CONTRACT_ABI = [
     }
 ]
 
-# ==================== FUNÇÕES AUXILIARES ====================
-
-def extrair_valores_para_hash(obj, valores=[]):
-    """
-    Extrai recursivamente apenas os VALORES (sem chaves, vírgulas, aspas, etc)
-    de um objeto JSON para gerar hash consistente.
-    """
-    if isinstance(obj, dict):
-        # Ordenar chaves para garantir consistência
-        for key in sorted(obj.keys()):
-            extrair_valores_para_hash(obj[key], valores)
-    elif isinstance(obj, list):
-        for item in obj:
-            extrair_valores_para_hash(item, valores)
-    else:
-        # Converter valor para string e adicionar
-        valores.append(str(obj))
-    return valores
-
-def gerar_hash_documento(documento):
-    """
-    Gera hash SHA-256 apenas dos valores do documento,
-    ignorando formatação JSON (aspas, vírgulas, chaves, etc)
-    """
-    # Remover campo _id para não afetar o hash
-    doc_copy = documento.copy()
-    if '_id' in doc_copy:
-        del doc_copy['_id']
-    
-    # Extrair apenas valores
-    valores = extrair_valores_para_hash(doc_copy)
-    
-    # Concatenar todos os valores
-    valores_concatenados = ''.join(valores)
-    
-    # Gerar hash SHA-256
-    hash_hex = hashlib.sha256(valores_concatenados.encode('utf-8')).hexdigest()
-    
-    return hash_hex, valores_concatenados
-
 # ==================== INTERFACE STREAMLIT ====================
 
 st.title("🔗 Registro de Documentos no Blockchain")
@@ -373,6 +354,12 @@ if 'mongodb_connected' not in st.session_state:
     st.session_state.mongodb_connected = False
     st.session_state.documento = None
 
+# Rastreador de confirmações compartilhado pelo processo (thread em segundo plano)
+rastreador = obter_rastreador(ALCHEMY_URL, CONTRACT_ADDRESS, CONTRACT_ABI)
+
+if st.session_state.mongodb_connected:
+    rastreador.registrar_colecao(st.session_state.chave_colecao, st.session_state.collection)
+
 if not st.session_state.mongodb_connected:
     st.subheader("📊 Etapa 1: Conectar ao MongoDB")
     
@@ -401,6 +388,24 @@ if not st.session_state.mongodb_connected:
             help="Digite o _id do documento que será registrado no blockchain"
         )
         
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            registrar_lote = st.checkbox(
+                "📦 Registrar em lote (documentos sem blockchain_info)",
+                value=False,
+                help="Registra todos os documentos ainda não registrados; o ObjectId é ignorado"
+            )
+        
+        with col2:
+            max_documentos = st.number_input(
+                "Máximo de documentos por execução",
+                min_value=1,
+                max_value=5_000,
+                value=MAX_DOCUMENTOS_LOTE,
+                help="Quantidade máxima de documentos registrados em um lote"
+            )
+        
         submit_mongo = st.form_submit_button("🔌 Conectar e Buscar Documento", use_container_width=True)
     
     if submit_mongo:
@@ -408,33 +413,51 @@ if not st.session_state.mongodb_connected:
             st.error("⚠️ Por favor, informe a senha do MongoDB.")
         elif len(senha_mongodb) < 12:
             st.error("⚠️ A senha deve ter exatamente 12 caracteres.")
-        elif not object_id_input:
+        elif not object_id_input and not registrar_lote:
             st.error("⚠️ Por favor, informe o ObjectId do documento.")
+        elif registrar_lote:
+            # Usar apenas os 8 primeiros caracteres da senha
+            senha_utilizada = senha_mongodb[:8]
+            
+            try:
+                with st.spinner("🔄 Conectando ao MongoDB..."):
+                    coll = obter_colecao(usuario, senha_utilizada, host, database, collection)
+                    pendentes = coll.count_documents(FILTRO_SEM_HASH)
+                
+                st.session_state.mongodb_connected = True
+                st.session_state.modo_lote = True
+                st.session_state.documentos_pendentes = pendentes
+                st.session_state.max_documentos = int(max_documentos)
+                st.session_state.collection = coll
+                st.session_state.chave_colecao = chave_colecao(host, database, collection)
+                st.session_state.database_name = database
+                st.session_state.collection_name = collection
+                st.rerun()
+                
+            except Exception as e:
+                st.error(f"❌ Erro ao conectar: {e}")
         else:
             # Usar apenas os 8 primeiros caracteres da senha
             senha_utilizada = senha_mongodb[:8]
-            mongo_uri = f"mongodb+srv://{usuario}:{senha_utilizada}@{host}/{database}?retryWrites=true&w=majority"
             
             try:
                 with st.spinner("🔄 Conectando ao MongoDB..."):
-                    mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-                    db = mongo_client[database]
-                    coll = db[collection]
-                    mongo_client.server_info()
+                    # Cliente compartilhado (pool reaproveitado entre reruns e páginas)
+                    coll = obter_colecao(usuario, senha_utilizada, host, database, collection)
                     
                     # Buscar documento
                     object_id = ObjectId(object_id_input)
-                    documento = coll.find_one({"_id": object_id})
+                    documento = buscar_documento(coll, object_id, VISAO_HASH)
                     
                     if not documento:
                         st.error(f"❌ Documento com _id '{object_id_input}' não encontrado!")
-                        mongo_client.close()
                     else:
                         st.session_state.mongodb_connected = True
+                        st.session_state.modo_lote = False
                         st.session_state.documento = documento
                         st.session_state.object_id = object_id
-                        st.session_state.mongo_client = mongo_client
                         st.session_state.collection = coll
+                        st.session_state.chave_colecao = chave_colecao(host, database, collection)
                         st.session_state.database_name = database
                         st.session_state.collection_name = collection
                         st.rerun()
@@ -442,9 +465,165 @@ if not st.session_state.mongodb_connected:
             except Exception as e:
                 st.error(f"❌ Erro ao conectar: {e}")
 
+# ==================== ETAPA 2 (LOTE): REGISTRAR DOCUMENTOS PENDENTES ====================
+
+if st.session_state.mongodb_connected and st.session_state.get('modo_lote'):
+    st.success("✅ Conectado ao MongoDB com sucesso!")
+    
+    st.subheader("📦 Registro em Lote")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Documentos sem Blockchain", f"{st.session_state.documentos_pendentes:,}")
+    with col2:
+        st.metric("Limite desta Execução", f"{st.session_state.max_documentos:,}")
+    
+    st.info("💡 As transações são enviadas em sequência com nonces atribuídos localmente. "
+            "As confirmações são acompanhadas em segundo plano: o MongoDB é atualizado quando "
+            "cada transação confirma, mesmo que esta página seja fechada.")
+    
+    with st.form("blockchain_lote_form"):
+        st.markdown("**Credenciais da Carteira Ethereum**")
+        
+        private_key = st.text_input(
+            "Chave Privada (sem 0x)",
+            type="password",
+            help="Sua chave privada da carteira Ethereum autorizada"
+        )
+        
+        record_type = st.text_input(
+            "Tipo de Registro (padrão)",
+            value="atendimento_saude",
+            help="Usado quando o documento não possui tipoAtendimento"
+        )
+        
+        modo_registro = st.radio(
+            "Modo de Registro",
+            options=[MODO_TRANSACAO_POR_DOCUMENTO, MODO_ANCORA_MERKLE],
+            format_func=lambda modo: {
+                MODO_TRANSACAO_POR_DOCUMENTO: "🔗 Uma transação por documento",
+                MODO_ANCORA_MERKLE: "🌳 Âncora Merkle (uma transação para o lote inteiro)"
+            }[modo],
+            help="Na âncora Merkle apenas a raiz da árvore é registrada no contrato; "
+                 "cada documento guarda sua prova de inclusão em blockchain_info.merkle"
+        )
+        
+        submit_lote = st.form_submit_button("🚀 Registrar Lote no Blockchain Sepolia", use_container_width=True)
+    
+    if submit_lote:
+        if not private_key:
+            st.error("⚠️ Por favor, informe a chave privada.")
+        else:
+            try:
+                with st.spinner("🔄 Conectando à Sepolia Testnet..."):
+                    w3 = obter_web3(ALCHEMY_URL)
+                    # Falha cedo se o nó estiver inacessível; o chain id fica em cache no provedor
+                    w3.eth.chain_id
+                
+                if private_key.startswith('0x'):
+                    private_key = private_key[2:]
+                
+                account = w3.eth.account.from_key(private_key)
+                st.info(f"👤 Conta: {account.address}")
+                
+                contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+                
+                if not contract.functions.isProviderAuthorized(account.address).call():
+                    st.error("❌ Sua conta não está autorizada como provedor!")
+                    st.stop()
+                
+                chave = st.session_state.chave_colecao
+                coll = st.session_state.collection
+                documentos = buscar_documentos_sem_registro(
+                    coll, st.session_state.max_documentos, ignorar_ids=rastreador.ids_pendentes(chave)
+                )
+                
+                if not documentos:
+                    st.success("✅ Nenhum documento pendente de registro!")
+                    st.stop()
+                
+                inicio = datetime.now()
+                
+                if modo_registro == MODO_ANCORA_MERKLE:
+                    # Uma única transação com a raiz Merkle do lote
+                    with st.spinner(f"⏳ Ancorando {len(documentos)} documentos em uma transação..."):
+                        raiz_hex, itens, tx_hash_hex = enviar_ancora_merkle(
+                            w3, contract, account, private_key, documentos, record_type
+                        )
+                    
+                    # Confirmação acompanhada em segundo plano
+                    rastreador.enfileirar(tx_hash_hex, chave, itens, account.address)
+                    duracao = (datetime.now() - inicio).total_seconds()
+                    
+                    st.markdown("---")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("Documentos Ancorados", len(itens))
+                    with col2:
+                        st.metric("Status", "⏳ Pendente")
+                    
+                    st.markdown("**Raiz Merkle Enviada:**")
+                    st.code(raiz_hex, language=None)
+                    st.caption(f"⏱️ Transação enviada em {duracao:.1f}s")
+                    st.link_button("🔗 Ver Transação no Etherscan", ETHERSCAN_TX_URL.format(tx_hash_hex), use_container_width=True)
+                else:
+                    # Envio das transações (nonces sequenciais)
+                    barra_envio = st.progress(0.0, text="⏳ Enviando transações...")
+                    enviados, falhas = enviar_transacoes(
+                        w3, contract, account, private_key, documentos, record_type,
+                        ao_progredir=lambda feitos, total: barra_envio.progress(
+                            feitos / total, text=f"⏳ Enviadas {feitos} de {total} transações"
+                        )
+                    )
+                    
+                    # Confirmações acompanhadas em segundo plano
+                    for envio in enviados:
+                        rastreador.enfileirar(
+                            envio['tx_hash_hex'], chave,
+                            [{"_id": envio['_id'], "hash_hex": envio['hash_hex'],
+                              "field_digests": envio['field_digests']}],
+                            account.address
+                        )
+                    duracao = (datetime.now() - inicio).total_seconds()
+                    
+                    st.markdown("---")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("Enviadas", len(enviados))
+                    with col2:
+                        st.metric("Falhas de Envio", len(falhas))
+                    
+                    st.caption(f"⏱️ Transações enviadas em {duracao:.1f}s")
+                    
+                    if enviados:
+                        with st.expander(f"⏳ Transações Enviadas ({len(enviados)})"):
+                            st.dataframe(
+                                [
+                                    {"_id": str(envio['_id']), "document_hash": envio['hash_hex'],
+                                     "transaction_hash": envio['tx_hash_hex'], "nonce": envio['nonce']}
+                                    for envio in enviados
+                                ],
+                                use_container_width=True
+                            )
+                    if falhas:
+                        with st.expander(f"❌ Falhas ({len(falhas)})", expanded=True):
+                            st.dataframe(falhas, use_container_width=True)
+                
+                st.info("💡 A confirmação é acompanhada em segundo plano: o MongoDB é atualizado quando a "
+                        "transação for minerada, mesmo que esta página seja fechada.")
+                
+            except Exception as e:
+                st.error(f"❌ Erro inesperado: {e}")
+    
+    st.markdown("---")
+    if st.button("🔄 Voltar ao Registro Individual"):
+        st.session_state.mongodb_connected = False
+        st.session_state.modo_lote = False
+        st.rerun()
+
 # ==================== ETAPA 2: VISUALIZAR E REGISTRAR ====================
 
-if st.session_state.mongodb_connected:
+if st.session_state.mongodb_connected and not st.session_state.get('modo_lote'):
     st.success("✅ Conectado ao MongoDB com sucesso!")
     
     documento = st.session_state.documento
@@ -471,16 +650,18 @@ if st.session_state.mongodb_connected:
     # Gerar hash do documento
     st.subheader("🔐 Hash do Documento")
     
-    hash_hex, valores_concatenados = gerar_hash_documento(documento)
+    # Lido do cache de hashes quando o documento não mudou desde o último cálculo
+    hash_hex, caracteres = obter_cache_hashes().obter(st.session_state.collection.full_name, [documento])[0]
+    previa = PreviaValores(previa_valores(documento, limite_previa=1000), caracteres)
     
     col1, col2 = st.columns([2, 1])
     with col1:
         st.code(hash_hex, language=None)
     with col2:
-        st.info(f"📊 {len(valores_concatenados)} caracteres processados")
+        st.info(f"📊 {previa.tamanho} caracteres processados")
     
     with st.expander("🔍 Ver Valores Concatenados (Base do Hash)"):
-        st.text_area("Valores extraídos do JSON", valores_concatenados[:1000] + "..." if len(valores_concatenados) > 1000 else valores_concatenados, height=200)
+        st.text_area("Valores extraídos do JSON", previa.texto + "..." if previa.tamanho > len(previa.texto) else previa.texto, height=200)
     
     st.markdown("---")
     
@@ -511,11 +692,9 @@ if st.session_state.mongodb_connected:
             try:
                 # Conectar ao Web3
                 with st.spinner("🔄 Conectando à Sepolia Testnet..."):
-                    w3 = Web3(Web3.HTTPProvider(ALCHEMY_URL))
-                    
-                    if not w3.is_connected():
-                        st.error("❌ Não foi possível conectar à Sepolia!")
-                        st.stop()
+                    w3 = obter_web3(ALCHEMY_URL)
+                    # Falha cedo se o nó estiver inacessível; o chain id fica em cache no provedor
+                    chain_id = w3.eth.chain_id
                     
                     st.success("✅ Conectado à Sepolia Testnet!")
                 
@@ -544,117 +723,41 @@ if st.session_state.mongodb_connected:
                 st.markdown("---")
                 st.subheader("📝 Registrando Hash no Blockchain...")
                 
-                hash_bytes32 = w3.to_bytes(hexstr=hash_hex)
                 record_id = str(object_id)
                 
+                # Hash e digests por campo em uma única passada pelo documento
+                hash_hex, field_digests = gerar_digests_campos(documento)
+                
                 with st.spinner("⏳ Enviando transação..."):
-                    nonce = w3.eth.get_transaction_count(account.address)
-                    
-                    # Gas dinâmico
-                    latest_block = w3.eth.get_block('latest')
-                    base_fee = latest_block['baseFeePerGas']
-                    max_priority_fee = w3.to_wei(2, 'gwei')
-                    max_fee = base_fee * 2 + max_priority_fee
+                    max_fee, max_priority_fee = calcular_taxas(w3)
                     
-                    transaction = contract.functions.registerHash(
-                        hash_bytes32,
-                        record_type,
-                        record_id
-                    ).build_transaction({
-                        'from': account.address,
-                        'nonce': nonce,
-                        'gas': 300000,
-                        'maxFeePerGas': max_fee,
-                        'maxPriorityFeePerGas': max_priority_fee,
-                    })
-                    
-                    signed_txn = w3.eth.account.sign_transaction(transaction, private_key)
-                    tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+                    tx_hash = assinar_e_enviar(
+                        w3, contract, account, private_key, hash_hex, record_type, record_id,
+                        w3.eth.get_transaction_count(account.address, 'pending'),
+                        max_fee, max_priority_fee, chain_id
+                    )
                     tx_hash_hex = w3.to_hex(tx_hash)
-                    
-                    st.info(f"🔗 Transação enviada: {tx_hash_hex}")
-                    st.link_button("🔍 Ver no Etherscan", f"https://sepolia.etherscan.io/tx/{tx_hash_hex}")
-                    
-                    # Aguardar confirmação
-                    with st.spinner("⏳ Aguardando confirmação na blockchain..."):
-                        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=180)
-                    
-                    if tx_receipt.status == 1:
-                        st.success("✅ HASH REGISTRADO COM SUCESSO!")
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Bloco", f"#{tx_receipt.blockNumber}")
-                        with col2:
-                            st.metric("Gas Usado", f"{tx_receipt.gasUsed:,}")
-                        with col3:
-                            st.metric("Status", "✅ Confirmado")
-                        
-                        # Verificar hash no blockchain
-                        st.markdown("---")
-                        st.subheader("🔍 Verificação no Blockchain")
-                        
-                        with st.spinner("Verificando hash registrado..."):
-                            exists, is_valid, timestamp, provider, returned_type, returned_id = \
-                                contract.functions.verifyHash(hash_bytes32).call()
-                            
-                            if exists:
-                                date_time = datetime.fromtimestamp(timestamp).strftime('%d/%m/%Y %H:%M:%S')
-                                
-                                st.success("✅ Hash encontrado e verificado no blockchain!")
-                                
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.write("**Status:**", "🟢 VÁLIDO" if is_valid else "🔴 INVÁLIDO")
-                                    st.write("**Data de Registro:**", date_time)
-                                    st.write("**Provedor:**", provider)
-                                with col2:
-                                    st.write("**Tipo:**", returned_type)
-                                    st.write("**Record ID:**", returned_id)
-                                    st.write("**Integridade:**", "✅ OK" if returned_type == record_type and returned_id == record_id else "⚠️ Divergência")
-                        
-                        # Atualizar MongoDB
-                        st.markdown("---")
-                        st.subheader("💾 Atualizando MongoDB")
-                        
-                        blockchain_data = {
-                            "blockchain_info": {
-                                "document_hash": hash_hex,
-                                "transaction": {
-                                    "transaction_hash": tx_hash_hex,
-                                    "block_number": tx_receipt.blockNumber,
-                                    "gas_used": tx_receipt.gasUsed,
-                                    "transaction_status": "success"
-                                },
-                                "verification": {
-                                    "exists": exists,
-                                    "is_valid": is_valid,
-                                    "timestamp": timestamp,
-                                    "datetime": datetime.fromtimestamp(timestamp).isoformat(),
-                                    "provider": provider,
-                                    "record_type": returned_type,
-                                    "record_id": returned_id
-                                },
-                                "contract_address": CONTRACT_ADDRESS,
-                                "network": "Sepolia Testnet",
-                                "registered_by": account.address,
-                                "registered_at": datetime.now().isoformat(),
-                                "etherscan_url": f"https://sepolia.etherscan.io/tx/{tx_hash_hex}"
-                            }
-                        }
-                        
-                        result = st.session_state.collection.update_one(
-                            {"_id": object_id},
-                            {"$set": blockchain_data}
-                        )
-                        
-                        if result.modified_count > 0:
-                            st.success("✅ Documento atualizado no MongoDB com informações da blockchain!")
-                        
-                        st.balloons()
-                        
-                    else:
-                        st.error("❌ Transação falhou (revertida)")
+                
+                # Confirmação acompanhada em segundo plano: a página não fica bloqueada
+                # aguardando o recibo e a gravação no MongoDB não depende dela
+                rastreador.enfileirar(
+                    tx_hash_hex, st.session_state.chave_colecao,
+                    [{"_id": object_id, "hash_hex": hash_hex, "field_digests": field_digests}],
+                    account.address
+                )
+                
+                st.success("✅ TRANSAÇÃO ENVIADA!")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Status", "⏳ Pendente")
+                with col2:
+                    st.metric("Record ID", record_id[:12] + "...")
+                
+                st.info(f"🔗 Transação enviada: {tx_hash_hex}")
+                st.link_button("🔍 Ver no Etherscan", ETHERSCAN_TX_URL.format(tx_hash_hex))
+                st.info("💡 A confirmação é acompanhada em segundo plano: o MongoDB é atualizado quando a "
+                        "transação for minerada, mesmo que esta página seja fechada.")
                         
             except ValueError as e:
                 if "Hash ja existe" in str(e) or "already exists" in str(e).lower():
@@ -668,6 +771,49 @@ if st.session_state.mongodb_connected:
     st.markdown("---")
     if st.button("🔄 Registrar Outro Documento"):
         st.session_state.mongodb_connected = False
-        st.session_state.mongo_client.close()
-
         st.rerun()
+
+# ==================== CONFIRMAÇÕES EM SEGUNDO PLANO ====================
+
+if st.session_state.mongodb_connected:
+    st.markdown("---")
+    st.subheader("⏳ Confirmações em Segundo Plano")
+    
+    chave = st.session_state.chave_colecao
+    resumo_fila = rastreador.resumo(chave)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Pendentes", resumo_fila.get(STATUS_PENDENTE, 0))
+    with col2:
+        st.metric("Confirmadas", resumo_fila.get(STATUS_CONFIRMADA, 0))
+    with col3:
+        st.metric("Revertidas", resumo_fila.get(STATUS_REVERTIDA, 0))
+    with col4:
+        st.metric(
+            "Desconhecidas",
+            resumo_fila.get(STATUS_DESCONHECIDA, 0),
+            help="Sem recibo após o prazo: a transação ainda pode ser minerada e continua sendo consultada"
+        )
+    
+    transacoes = rastreador.listar(chave)
+    if transacoes:
+        st.dataframe(
+            [
+                {
+                    "Transação": transacao['tx_hash'],
+                    "Status": transacao['status'],
+                    "Documentos": transacao['documentos'],
+                    "Atualizados": transacao['documentos_atualizados'],
+                    "Bloco": transacao['bloco'],
+                    "Enviada em": datetime.fromtimestamp(transacao['enviada_em']).strftime('%d/%m/%Y %H:%M:%S'),
+                    "Erro": transacao['erro'] or ""
+                }
+                for transacao in transacoes
+            ],
+            use_container_width=True
+        )
+    else:
+        st.caption("Nenhuma transação enviada para esta coleção.")
+    
+    st.button("🔄 Atualizar Status")
@@ -1,7 +1,21 @@
 import streamlit as st
-from pymongo import MongoClient
+from conexao import obter_colecao
+from consultas import VISAO_COMPLETA, buscar_documento
 from bson.objectid import ObjectId
-import hashlib
+from integridade import (
+    TAMANHO_LOTE_VERIFICACAO,
+    PreviaValores,
+    previa_valores,
+    campos_adulterados,
+    verificar_integridade_documento,
+    verificar_colecao
+)
+from merkle import calcular_raiz_da_prova
+from cache_hashes import obter_cache_hashes
+from motor_hash import MAX_PROCESSOS_HASH, obter_pool_hash
+from verificacao_contrato import verificar_hashes_no_contrato, hashes_registrados_na_colecao
+import csv
+import io
 import json
 from datetime import datetime
 
@@ -50,72 +64,21 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ==================== FUNÇÕES AUXILIARES ====================
-
-def extrair_valores_para_hash(obj, valores=None):
-    """
-    Extrai recursivamente apenas os VALORES (sem chaves, vírgulas, aspas, etc)
-    de um objeto JSON para gerar hash consistente.
-    """
-    if valores is None:
-        valores = []
-    
-    if isinstance(obj, dict):
-        # Ordenar chaves para garantir consistência
-        for key in sorted(obj.keys()):
-            extrair_valores_para_hash(obj[key], valores)
-    elif isinstance(obj, list):
-        for item in obj:
-            extrair_valores_para_hash(item, valores)
-    else:
-        # Converter valor para string e adicionar
-        valores.append(str(obj))
-    return valores
+# ==================== CONSTANTES ====================
+ALCHEMY_URL = "https://eth-sepolia.g.alchemy.com/v2/lda58Tw_56pU42krLOmDH"
+CONTRACT_ADDRESS = "0xe363FEcb00805AE86bDA1071e681f66758Bc69F4"
 
-def gerar_hash_documento(documento):
-    """
-    Gera hash SHA-256 apenas dos valores do documento,
-    ignorando formatação JSON (aspas, vírgulas, chaves, etc)
-    """
-    # Remover campos que não fazem parte do documento original
-    doc_copy = documento.copy()
-    if '_id' in doc_copy:
-        del doc_copy['_id']
-    if 'blockchain_info' in doc_copy:
-        del doc_copy['blockchain_info']
-    
-    # Extrair apenas valores (sempre criar nova lista)
-    valores = extrair_valores_para_hash(doc_copy, valores=None)
-    
-    # Concatenar todos os valores
-    valores_concatenados = ''.join(valores)
-    
-    # Gerar hash SHA-256
-    hash_hex = hashlib.sha256(valores_concatenados.encode('utf-8')).hexdigest()
-    
-    return hash_hex, valores_concatenados
+# ==================== FUNÇÕES AUXILIARES ====================
 
-def verificar_integridade_documento(documento):
+def gerar_csv_divergencias(divergencias):
     """
-    Verifica se o hash armazenado no blockchain_info corresponde
-    ao conteúdo atual do documento (excluindo blockchain_info)
+    Gera o CSV com a lista de documentos modificados (verificação em lote)
     """
-    if 'blockchain_info' not in documento:
-        return None, "Documento não possui informações de blockchain"
-    
-    hash_armazenado = documento.get('blockchain_info', {}).get('document_hash')
-    
-    if not hash_armazenado:
-        return None, "Hash não encontrado em blockchain_info"
-    
-    # Calcular hash do documento atual (sem blockchain_info)
-    hash_calculado, _ = gerar_hash_documento(documento)
-    
-    # Comparar
-    if hash_armazenado == hash_calculado:
-        return True, "Documento íntegro - hash corresponde ao conteúdo"
-    else:
-        return False, "Documento modificado - hash não corresponde"
+    saida = io.StringIO()
+    escritor = csv.DictWriter(saida, fieldnames=["_id", "idAtendimento", "hash_armazenado", "hash_calculado", "campos_alterados"])
+    escritor.writeheader()
+    escritor.writerows(divergencias)
+    return saida.getvalue()
 
 # ==================== INTERFACE STREAMLIT ====================
 
@@ -157,6 +120,31 @@ if not st.session_state.mongodb_connected:
             help="Digite o _id do documento que será verificado"
         )
         
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            verificar_lote = st.checkbox(
+                "📦 Verificar a coleção inteira (lote)",
+                value=False,
+                help="Verifica todos os documentos com blockchain_info; o ObjectId é ignorado"
+            )
+            
+            conferir_contrato = st.checkbox(
+                "🔗 Conferir os hashes também no contrato",
+                value=False,
+                help="Consulta verifyHash para todos os hashes registrados da coleção (requisições JSON-RPC em lote)"
+            )
+        
+        with col2:
+            tamanho_lote = st.number_input(
+                "Documentos por lote",
+                min_value=50,
+                max_value=10_000,
+                value=TAMANHO_LOTE_VERIFICACAO,
+                step=50,
+                help="Quantidade de documentos enviada a cada processo de verificação"
+            )
+        
         submit_mongo = st.form_submit_button("🔌 Conectar e Buscar Documento", use_container_width=True)
     
     if submit_mongo:
@@ -164,32 +152,83 @@ if not st.session_state.mongodb_connected:
             st.error("⚠️ Por favor, informe a senha do MongoDB.")
         elif len(senha_mongodb) < 12:
             st.error("⚠️ A senha deve ter exatamente 12 caracteres.")
-        elif not object_id_input:
+        elif not object_id_input and not verificar_lote:
             st.error("⚠️ Por favor, informe o ObjectId do documento.")
+        elif verificar_lote:
+            # Usar apenas os 8 primeiros caracteres da senha
+            senha_utilizada = senha_mongodb[:8]
+            
+            try:
+                coll = obter_colecao(usuario, senha_utilizada, host, database, collection)
+                
+                barra_progresso = st.progress(0.0, text="🔄 Verificando documentos...")
+                
+                def ao_progredir(processados, total):
+                    barra_progresso.progress(
+                        min(processados / total, 1.0) if total else 1.0,
+                        text=f"🔄 Verificados {processados:,} de {total:,} documentos"
+                    )
+                
+                inicio = datetime.now()
+                resumo = verificar_colecao(
+                    coll, tamanho_lote=int(tamanho_lote), ao_progredir=ao_progredir,
+                    max_processos=MAX_PROCESSOS_HASH, pool=obter_pool_hash(), cache=obter_cache_hashes()
+                )
+                resumo["duracao"] = (datetime.now() - inicio).total_seconds()
+                resumo["collection_name"] = collection
+                
+                if conferir_contrato:
+                    hashes = hashes_registrados_na_colecao(coll)
+                    barra_progresso.progress(0.0, text="🔗 Consultando o contrato...")
+                    
+                    inicio = datetime.now()
+                    resultados = verificar_hashes_no_contrato(
+                        ALCHEMY_URL, CONTRACT_ADDRESS, hashes,
+                        ao_progredir=lambda feitos, total: barra_progresso.progress(
+                            feitos / total, text=f"🔗 Consultados {feitos:,} de {total:,} hashes no contrato"
+                        )
+                    )
+                    
+                    problemas = []
+                    for hash_hex, resultado in resultados.items():
+                        if "error" in resultado:
+                            problemas.append({"hash": hash_hex, "situacao": "Erro na consulta", "detalhe": resultado["error"]})
+                        elif not resultado["exists"]:
+                            problemas.append({"hash": hash_hex, "situacao": "Não encontrado no contrato", "detalhe": ""})
+                        elif not resultado["is_valid"]:
+                            problemas.append({"hash": hash_hex, "situacao": "Invalidado", "detalhe": resultado["record_id"]})
+                    
+                    resumo["contrato"] = {
+                        "consultados": len(resultados),
+                        "validos": len(resultados) - len(problemas),
+                        "problemas": problemas,
+                        "duracao": (datetime.now() - inicio).total_seconds()
+                    }
+                
+                barra_progresso.empty()
+                st.session_state.resultado_lote = resumo
+                
+            except Exception as e:
+                st.error(f"❌ Erro na verificação em lote: {e}")
         else:
             # Usar apenas os 8 primeiros caracteres da senha
             senha_utilizada = senha_mongodb[:8]
-            mongo_uri = f"mongodb+srv://{usuario}:{senha_utilizada}@{host}/{database}?retryWrites=true&w=majority"
             
             try:
                 with st.spinner("🔄 Conectando ao MongoDB..."):
-                    mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-                    db = mongo_client[database]
-                    coll = db[collection]
-                    mongo_client.server_info()
+                    # Cliente compartilhado (pool reaproveitado entre reruns e páginas)
+                    coll = obter_colecao(usuario, senha_utilizada, host, database, collection)
                     
                     # Buscar documento
                     object_id = ObjectId(object_id_input)
-                    documento = coll.find_one({"_id": object_id})
+                    documento = buscar_documento(coll, object_id, VISAO_COMPLETA)
                     
                     if not documento:
                         st.error(f"❌ Documento com _id '{object_id_input}' não encontrado!")
-                        mongo_client.close()
                     else:
                         st.session_state.mongodb_connected = True
                         st.session_state.documento = documento
                         st.session_state.object_id = object_id
-                        st.session_state.mongo_client = mongo_client
                         st.session_state.database_name = database
                         st.session_state.collection_name = collection
                         st.rerun()
@@ -197,6 +236,80 @@ if not st.session_state.mongodb_connected:
             except Exception as e:
                 st.error(f"❌ Erro ao conectar: {e}")
 
+# ==================== RESULTADO DA VERIFICAÇÃO EM LOTE ====================
+
+if not st.session_state.mongodb_connected and st.session_state.get('resultado_lote'):
+    resumo = st.session_state.resultado_lote
+    
+    st.markdown("---")
+    st.subheader(f"📦 Verificação em Lote - {resumo['collection_name']}")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="integrity-box-valid">
+            <h2 style="margin: 0;">{resumo['integros']:,}</h2>
+            <p style="margin: 10px 0 0 0;">✅ Íntegros</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="integrity-box-invalid">
+            <h2 style="margin: 0;">{resumo['modificados']:,}</h2>
+            <p style="margin: 10px 0 0 0;">⚠️ Modificados</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="integrity-box-none">
+            <h2 style="margin: 0;">{resumo['sem_registro']:,}</h2>
+            <p style="margin: 10px 0 0 0;">📄 Sem Registro</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    duracao = resumo['duracao']
+    taxa = resumo['total_verificado'] / duracao if duracao else 0
+    st.caption(f"⏱️ {resumo['total_verificado']:,} documentos verificados em {duracao:.1f}s ({taxa:,.0f} docs/s)")
+    
+    if resumo['divergencias']:
+        with st.expander(f"⚠️ Documentos Modificados ({len(resumo['divergencias'])})"):
+            st.dataframe(resumo['divergencias'], use_container_width=True)
+        
+        st.download_button(
+            label="📥 Download Lista de Divergências (.csv)",
+            data=gerar_csv_divergencias(resumo['divergencias']),
+            file_name=f"divergencias_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    else:
+        st.success("✅ Nenhum documento modificado encontrado")
+    
+    contrato = resumo.get('contrato')
+    if contrato:
+        st.markdown("---")
+        st.subheader("🔗 Conferência no Contrato")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Hashes Consultados", f"{contrato['consultados']:,}")
+        with col2:
+            st.metric("Registrados e Válidos", f"{contrato['validos']:,}")
+        with col3:
+            st.metric("Com Problema", f"{len(contrato['problemas']):,}")
+        
+        st.caption(f"⏱️ {contrato['consultados']:,} hashes consultados no contrato em {contrato['duracao']:.1f}s "
+                   "(raízes Merkle contam uma vez por âncora)")
+        
+        if contrato['problemas']:
+            with st.expander(f"❌ Hashes com Problema ({len(contrato['problemas'])})", expanded=True):
+                st.dataframe(contrato['problemas'], use_container_width=True)
+        else:
+            st.success("✅ Todos os hashes da coleção estão registrados e válidos no contrato")
+
 # ==================== VISUALIZAÇÃO E VERIFICAÇÃO ====================
 
 if st.session_state.mongodb_connected:
@@ -208,6 +321,12 @@ if st.session_state.mongodb_connected:
     # Verificar se documento tem blockchain_info
     tem_blockchain = 'blockchain_info' in documento
     
+    # Hash do conteúdo atual, lido do cache de hashes quando o documento não mudou
+    # desde o último cálculo; usado em todas as comparações abaixo
+    hash_calculado, caracteres = obter_cache_hashes().obter(
+        f"{st.session_state.database_name}.{st.session_state.collection_name}", [documento]
+    )[0]
+    
     # ==================== INFORMAÇÕES DO DOCUMENTO ====================
     
     st.subheader("📄 Documento Encontrado")
@@ -226,7 +345,7 @@ if st.session_state.mongodb_connected:
     st.subheader("🔍 Verificação de Integridade")
     
     if tem_blockchain:
-        integro, mensagem = verificar_integridade_documento(documento)
+        integro, mensagem = verificar_integridade_documento(documento, hash_calculado)
         
         if integro is True:
             st.markdown("""
@@ -239,7 +358,6 @@ if st.session_state.mongodb_connected:
             # Informações do blockchain
             blockchain_info = documento.get('blockchain_info', {})
             hash_armazenado = blockchain_info.get("document_hash", "N/A")
-            hash_calculado, _ = gerar_hash_documento(documento)
             
             # Limpar espaços e normalizar
             hash_armazenado_limpo = hash_armazenado.strip().lower()
@@ -283,7 +401,6 @@ if st.session_state.mongodb_connected:
             
             blockchain_info = documento.get('blockchain_info', {})
             hash_armazenado = blockchain_info.get('document_hash', 'N/A')
-            hash_calculado, _ = gerar_hash_documento(documento)
             
             col1, col2 = st.columns(2)
             
@@ -295,7 +412,23 @@ if st.session_state.mongodb_connected:
                 st.markdown("#### 🔐 Hash Calculado (Atual)")
                 st.markdown(f'<div class="hash-display">{hash_calculado}</div>', unsafe_allow_html=True)
             
-            st.error("❌ Os hashes são diferentes - documento foi modificado após o registro blockchain")
+            if hash_armazenado == hash_calculado:
+                st.error(f"❌ {mensagem}")
+            else:
+                st.error("❌ Os hashes são diferentes - documento foi modificado após o registro blockchain")
+            
+            # Campos alterados (digests por campo gravados no registro)
+            alteracoes = campos_adulterados(documento)
+            if alteracoes:
+                st.markdown("#### 🧩 Campos Alterados")
+                linhas = (
+                    [{"Campo": campo, "Alteração": "✏️ Modificado"} for campo in alteracoes["modificados"]] +
+                    [{"Campo": campo, "Alteração": "➕ Adicionado"} for campo in alteracoes["adicionados"]] +
+                    [{"Campo": campo, "Alteração": "➖ Removido"} for campo in alteracoes["removidos"]]
+                )
+                st.dataframe(linhas, use_container_width=True, hide_index=True)
+            elif hash_armazenado != hash_calculado:
+                st.caption("ℹ️ Registro sem digests por campo: não é possível apontar quais campos foram alterados")
             
         else:
             st.warning(mensagem)
@@ -335,6 +468,43 @@ if st.session_state.mongodb_connected:
             network = blockchain_info.get('network', 'N/A')
             st.metric("Rede", network)
         
+        # Âncora Merkle: recalcular o caminho do hash atual até a raiz registrada
+        merkle = blockchain_info.get('merkle')
+        if merkle:
+            st.markdown("---")
+            st.subheader("🌳 Âncora Merkle")
+            
+            raiz_armazenada = merkle.get('root', '')
+            prova = merkle.get('proof', [])
+            
+            try:
+                raiz_calculada = calcular_raiz_da_prova(hash_calculado, prova)
+            except (KeyError, TypeError, ValueError):
+                raiz_calculada = "Prova malformada"
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Posição na Árvore", f"{merkle.get('leaf_index', 'N/A')} de {merkle.get('leaf_count', 'N/A')}")
+            with col2:
+                st.metric("Passos da Prova", len(prova))
+            with col3:
+                st.metric("Algoritmo", merkle.get('algorithm', 'N/A').upper())
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("#### ⚓ Raiz Ancorada (Blockchain)")
+                st.code(raiz_armazenada, language=None)
+            with col2:
+                st.markdown("#### 🔐 Raiz Recalculada (Hash Atual)")
+                st.code(raiz_calculada, language=None)
+            
+            if raiz_calculada == raiz_armazenada:
+                st.success("✅ O caminho do hash atual leva à raiz registrada no contrato")
+            else:
+                st.error("❌ O caminho do hash atual NÃO leva à raiz registrada no contrato")
+            
+            st.caption("💡 Para auditar no contrato, use a raiz ancorada e a prova de inclusão na página de auditoria")
+        
         # Expandable com detalhes completos
         with st.expander("🔍 Ver Detalhes Completos do Blockchain"):
             st.json(blockchain_info)
@@ -358,15 +528,15 @@ if st.session_state.mongodb_connected:
         st.markdown("---")
         st.subheader("🔐 Hash do Documento Atual")
         
-        hash_calculado, valores_concatenados = gerar_hash_documento(documento)
+        previa = PreviaValores(previa_valores(documento), caracteres)
         
         st.markdown(f'<div class="hash-display">{hash_calculado}</div>', unsafe_allow_html=True)
-        st.caption(f"📊 Calculado a partir de {len(valores_concatenados)} caracteres")
+        st.caption(f"📊 Calculado a partir de {previa.tamanho} caracteres")
         
         with st.expander("🔍 Ver Valores Concatenados (Base do Hash)"):
             st.text_area(
                 "Valores extraídos do JSON", 
-                valores_concatenados[:2000] + "..." if len(valores_concatenados) > 2000 else valores_concatenados, 
+                previa.texto + "..." if previa.tamanho > len(previa.texto) else previa.texto, 
                 height=300
             )
     
@@ -385,11 +555,10 @@ if st.session_state.mongodb_connected:
     with col2:
         if st.button("🔄 Verificar Outro Documento", use_container_width=True):
             st.session_state.mongodb_connected = False
-            st.session_state.mongo_client.close()
             st.rerun()
 
 # ==================== RODAPÉ ====================
 
 st.markdown("---")
-st.caption("🔒 Sistema de Verificação de Integridade - Apenas leitura (não interage com blockchain)")
+st.caption("🔒 Sistema de Verificação de Integridade - Apenas leitura (a conferência no contrato usa somente consultas verifyHash)")
 st.caption("💡 Este sistema verifica se o documento foi alterado comparando o hash armazenado com o hash calculado do conteúdo atual")
\ No newline at end of file
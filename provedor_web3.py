@@ -0,0 +1,142 @@
+import os
+import time
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from web3 import Web3
+from web3.middleware import simple_cache_middleware
+from web3.providers import HTTPProvider
+
+# ==================== CONSTANTES ====================
+# Endpoint local opcional para uso offline: URL de um nó JSON-RPC local
+# (ex.: http://127.0.0.1:8545) ou "eth-tester" para uma cadeia em processo
+RPC_LOCAL = os.environ.get("PRONTUARIOS_RPC_LOCAL", "")
+ETH_TESTER = "eth-tester"
+TIMEOUT_RPC = 20  # segundos por requisição
+TENTATIVAS_RPC = 3
+FATOR_ESPERA_RPC = 0.5  # espera exponencial entre tentativas: 0.5s, 1s, 2s...
+STATUS_REPETIR = (429, 502, 503, 504)
+# Métodos que alteram estado: repetir após uma resposta perdida poderia reenviar a transação
+METODOS_SEM_REPETICAO = frozenset({"eth_sendRawTransaction", "eth_sendTransaction"})
+TAMANHO_POOL_HTTP = 10
+# Provedores são recriados após este tempo (segundos)
+TTL_PROVEDOR = 30 * 60
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def endpoint_rpc(rpc_url):
+    """
+    Retorna o endpoint HTTP efetivamente usado (o local, quando configurado),
+    ou None quando a cadeia roda em processo (eth-tester)
+    """
+    if RPC_LOCAL == ETH_TESTER:
+        return None
+    return RPC_LOCAL or rpc_url
+
+def criar_sessao_http(tentativas=TENTATIVAS_RPC, fator_espera=FATOR_ESPERA_RPC, tamanho_pool=TAMANHO_POOL_HTTP):
+    """
+    Cria uma requests.Session com pool de conexões keep-alive. A sessão só
+    repete falhas ao abrir a conexão, quando nada chegou ao servidor;
+    timeouts de leitura e respostas 429/5xx ficam a cargo de quem sabe se o
+    método pode ser repetido (ProvedorHTTP, verificacao_contrato)
+    """
+    politica = Retry(
+        total=tentativas,
+        connect=tentativas,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=fator_espera,
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+    adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=politica)
+
+    sessao = requests.Session()
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+class ProvedorHTTP(HTTPProvider):
+    """
+    HTTPProvider que envia todas as requisições pela sessão recebida, em
+    qualquer thread (o HTTPProvider do web3 guarda uma sessão por thread, e
+    só a da thread que o criou teria o pool e a política configurados).
+    Falhas transitórias (conexão, timeout, 429/5xx) são repetidas com espera
+    exponencial apenas para métodos sem efeito colateral; envios de
+    transação nunca são repetidos
+    """
+    # Substitui o http_retry_request_middleware, que repete também eth_sendRawTransaction
+    _middlewares = ()
+
+    def __init__(self, endpoint_uri, sessao, request_kwargs=None,
+                 tentativas=TENTATIVAS_RPC, fator_espera=FATOR_ESPERA_RPC):
+        super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+        self._sessao = sessao
+        self.tentativas = tentativas
+        self.fator_espera = fator_espera
+
+    def make_request(self, method, params):
+        corpo = self.encode_rpc_request(method, params)
+        tentativas = 0 if method in METODOS_SEM_REPETICAO else self.tentativas
+
+        for tentativa in range(tentativas + 1):
+            ultima = tentativa == tentativas
+            try:
+                resposta = self._sessao.post(self.endpoint_uri, data=corpo, **self.get_request_kwargs())
+            except (requests.ConnectionError, requests.Timeout):
+                if ultima:
+                    raise
+            else:
+                if resposta.status_code not in STATUS_REPETIR or ultima:
+                    resposta.raise_for_status()
+                    return self.decode_rpc_response(resposta.content)
+            time.sleep(self.fator_espera * 2 ** tentativa)
+
+def _criar_web3_eth_tester():
+    """
+    Cria um Web3 sobre uma cadeia em processo (requer eth-tester[py-evm])
+    """
+    try:
+        from web3 import EthereumTesterProvider
+        return Web3(EthereumTesterProvider())
+    except ImportError as e:
+        raise RuntimeError(
+            "PRONTUARIOS_RPC_LOCAL=eth-tester requer o pacote eth-tester[py-evm] instalado"
+        ) from e
+
+# ==================== FÁBRICA DE PROVEDORES ====================
+
+@st.cache_resource(ttl=TTL_PROVEDOR, show_spinner=False)
+def obter_sessao_http(endpoint, tentativas=TENTATIVAS_RPC):
+    """
+    Retorna a sessão HTTP keep-alive do endpoint, compartilhada pelo provedor
+    Web3 e pelas requisições JSON-RPC em lote (verificacao_contrato)
+    """
+    return criar_sessao_http(tentativas)
+
+@st.cache_resource(ttl=TTL_PROVEDOR, show_spinner=False)
+def obter_web3(rpc_url, timeout=TIMEOUT_RPC, tentativas=TENTATIVAS_RPC):
+    """
+    Retorna um Web3 compartilhado entre reruns, páginas e sessões.
+    As requisições de todas as threads reutilizam as conexões HTTP (e o
+    handshake TLS) de uma sessão keep-alive, e o chain id é consultado uma
+    única vez por provedor.
+    Nenhuma chamada de rede é feita na criação; erros de conexão aparecem
+    na primeira consulta.
+    """
+    if RPC_LOCAL == ETH_TESTER:
+        w3 = _criar_web3_eth_tester()
+    else:
+        provedor = ProvedorHTTP(
+            endpoint_rpc(rpc_url),
+            obter_sessao_http(endpoint_rpc(rpc_url), tentativas),
+            request_kwargs={'timeout': timeout},
+            tentativas=tentativas
+        )
+        w3 = Web3(provedor)
+
+    # Respostas que não mudam (eth_chainId, net_version...) ficam em cache no provedor
+    w3.middleware_onion.add(simple_cache_middleware, name='cache_simples')
+    return w3
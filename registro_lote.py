@@ -0,0 +1,232 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from web3.logs import DISCARD
+from motor_hash import calcular_digests
+from integridade import FILTRO_SEM_HASH
+from merkle import ALGORITMO_MERKLE, construir_arvore, raiz_da_arvore, gerar_prova
+
+# ==================== CONSTANTES ====================
+REDE = "Sepolia Testnet"
+ETHERSCAN_TX_URL = "https://sepolia.etherscan.io/tx/{}"
+GAS_REGISTRO = 300000
+MAX_DOCUMENTOS_LOTE = 200
+MODO_TRANSACAO_POR_DOCUMENTO = "transacao_por_documento"
+MODO_ANCORA_MERKLE = "merkle"
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def calcular_taxas(w3):
+    """
+    Calcula as taxas EIP-1559 a partir do último bloco (uma única consulta por lote)
+    Retorna (max_fee, max_priority_fee)
+    """
+    latest_block = w3.eth.get_block('latest')
+    base_fee = latest_block['baseFeePerGas']
+    max_priority_fee = w3.to_wei(2, 'gwei')
+    max_fee = base_fee * 2 + max_priority_fee
+    return max_fee, max_priority_fee
+
+def montar_blockchain_info(hash_hex, tx_hash_hex, recibo, verificacao, contract_address, registered_by,
+                           field_digests=None):
+    """
+    Monta o subdocumento blockchain_info gravado no MongoDB após o registro.
+    `field_digests` (digests por campo de primeiro nível) permite apontar
+    quais campos foram alterados em uma verificação futura
+    """
+    return {
+        "document_hash": hash_hex,
+        "field_digests": field_digests,
+        "transaction": {
+            "transaction_hash": tx_hash_hex,
+            "block_number": recibo.blockNumber,
+            "gas_used": recibo.gasUsed,
+            "transaction_status": "success"
+        },
+        "verification": verificacao,
+        "contract_address": contract_address,
+        "network": REDE,
+        "registered_by": registered_by,
+        "registered_at": datetime.now().isoformat(),
+        "etherscan_url": ETHERSCAN_TX_URL.format(tx_hash_hex)
+    }
+
+def assinar_e_enviar(w3, contract, account, private_key, hash_hex, record_type, record_id,
+                     nonce, max_fee, max_priority_fee, chain_id):
+    """
+    Monta, assina e envia uma transação registerHash.
+    Retorna o hash da transação. Se o nó já conhece a transação (ex.: um
+    envio anterior cuja resposta se perdeu), ela é tratada como enviada
+    """
+    transaction = contract.functions.registerHash(
+        w3.to_bytes(hexstr=hash_hex),
+        record_type,
+        record_id
+    ).build_transaction({
+        'from': account.address,
+        'nonce': nonce,
+        'gas': GAS_REGISTRO,
+        'maxFeePerGas': max_fee,
+        'maxPriorityFeePerGas': max_priority_fee,
+        'chainId': chain_id,
+    })
+    
+    signed_txn = w3.eth.account.sign_transaction(transaction, private_key)
+    try:
+        return w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    except ValueError as e:
+        if "already known" not in str(e).lower():
+            raise
+        return signed_txn.hash
+
+def operacao_blockchain_info(contract, item, tx_hash_hex, recibo, verificacao, registered_by):
+    """
+    Monta a atualização que grava blockchain_info em um documento confirmado.
+    Itens ancorados por raiz Merkle carregam também a prova de inclusão
+    """
+    blockchain_info = montar_blockchain_info(
+        item['hash_hex'], tx_hash_hex, recibo, verificacao, contract.address, registered_by,
+        item.get('field_digests')
+    )
+    if item.get('merkle'):
+        blockchain_info["anchoring"] = MODO_ANCORA_MERKLE
+        blockchain_info["merkle"] = item['merkle']
+    return UpdateOne({"_id": item['_id']}, {"$set": {"blockchain_info": blockchain_info}})
+
+def verificacao_do_evento(contract, recibo):
+    """
+    Extrai os dados de verificação do evento HashRegistered do recibo,
+    sem uma chamada adicional a verifyHash
+    """
+    eventos = contract.events.HashRegistered().process_receipt(recibo, errors=DISCARD)
+    if not eventos:
+        return None
+    
+    args = eventos[0]['args']
+    return {
+        "exists": True,
+        "is_valid": True,
+        "timestamp": args['timestamp'],
+        "datetime": datetime.fromtimestamp(args['timestamp']).isoformat(),
+        "provider": args['provider'],
+        "record_type": args['recordType'],
+        "record_id": args['recordId']
+    }
+
+# ==================== REGISTRO EM LOTE ====================
+
+def buscar_documentos_sem_registro(collection, limite=MAX_DOCUMENTOS_LOTE, ignorar_ids=()):
+    """
+    Busca os documentos que ainda não possuem hash registrado (mesmo critério
+    das estatísticas e da verificação: FILTRO_SEM_HASH), ignorando os que já
+    têm transação enviada aguardando confirmação
+    """
+    filtro = dict(FILTRO_SEM_HASH)
+    if ignorar_ids:
+        filtro['_id'] = {'$nin': list(ignorar_ids)}
+    return list(collection.find(filtro).limit(limite))
+
+def enviar_transacoes(w3, contract, account, private_key, documentos, record_type_padrao, ao_progredir=None):
+    """
+    Assina e envia uma transação registerHash por documento, com nonces
+    sequenciais atribuídos localmente (uma consulta de nonce, de taxas e de
+    chain id por lote). Os hashes do lote são calculados antes dos envios,
+    no pool de processos. Hashes repetidos no lote são enviados uma única vez.
+    Um erro de envio interrompe o lote para não deixar lacunas de nonce.
+    Retorna (enviados, falhas)
+    """
+    nonce = w3.eth.get_transaction_count(account.address, 'pending')
+    max_fee, max_priority_fee = calcular_taxas(w3)
+    chain_id = w3.eth.chain_id
+    
+    enviados = []
+    falhas = []
+    hashes_no_lote = set()
+    hashes_e_digests = calcular_digests(documentos)
+    
+    for posicao, (documento, (hash_hex, field_digests)) in enumerate(zip(documentos, hashes_e_digests)):
+        record_id = str(documento['_id'])
+        
+        if hash_hex in hashes_no_lote:
+            falhas.append({"_id": record_id, "erro": "Hash duplicado no lote"})
+            continue
+        
+        record_type = documento.get('tipoAtendimento', record_type_padrao)
+        
+        try:
+            tx_hash = assinar_e_enviar(
+                w3, contract, account, private_key, hash_hex, record_type, record_id,
+                nonce, max_fee, max_priority_fee, chain_id
+            )
+        except Exception as e:
+            falhas.append({"_id": record_id, "erro": str(e)})
+            falhas.extend(
+                {"_id": str(doc['_id']), "erro": "Não enviado (lote interrompido)"}
+                for doc in documentos[posicao + 1:]
+            )
+            break
+        
+        hashes_no_lote.add(hash_hex)
+        enviados.append({
+            "_id": documento['_id'],
+            "hash_hex": hash_hex,
+            "field_digests": field_digests,
+            "tx_hash": tx_hash,
+            "tx_hash_hex": w3.to_hex(tx_hash),
+            "nonce": nonce
+        })
+        nonce += 1
+        
+        if ao_progredir:
+            ao_progredir(posicao + 1, len(documentos))
+    
+    return enviados, falhas
+
+# ==================== ÂNCORA MERKLE ====================
+
+def preparar_ancora_merkle(documentos):
+    """
+    Calcula o hash de cada documento e constrói a árvore Merkle do lote.
+    Retorna (raiz_hex, itens), onde cada item traz o _id, o hash do documento
+    e o subdocumento merkle (raiz, posição e prova de inclusão)
+    """
+    hashes_e_digests = calcular_digests(documentos)
+    hashes = [hash_hex for hash_hex, _ in hashes_e_digests]
+    niveis = construir_arvore(hashes)
+    raiz_hex = raiz_da_arvore(niveis)
+    
+    itens = [
+        {
+            "_id": documento['_id'],
+            "hash_hex": hash_hex,
+            "field_digests": field_digests,
+            "merkle": {
+                "root": raiz_hex,
+                "algorithm": ALGORITMO_MERKLE,
+                "leaf_index": indice,
+                "leaf_count": len(hashes),
+                "proof": gerar_prova(niveis, indice)
+            }
+        }
+        for indice, (documento, (hash_hex, field_digests)) in enumerate(zip(documentos, hashes_e_digests))
+    ]
+    
+    return raiz_hex, itens
+
+def enviar_ancora_merkle(w3, contract, account, private_key, documentos, record_type):
+    """
+    Registra apenas a raiz Merkle do lote com uma única transação registerHash.
+    O record_id registrado no contrato identifica a âncora (quantidade de folhas
+    e _id do primeiro documento).
+    Retorna (raiz_hex, itens, tx_hash_hex)
+    """
+    raiz_hex, itens = preparar_ancora_merkle(documentos)
+    record_id = f"merkle:{len(itens)}:{itens[0]['_id']}"
+    
+    max_fee, max_priority_fee = calcular_taxas(w3)
+    tx_hash = assinar_e_enviar(
+        w3, contract, account, private_key, raiz_hex, record_type, record_id,
+        w3.eth.get_transaction_count(account.address, 'pending'),
+        max_fee, max_priority_fee, w3.eth.chain_id
+    )
+    
+    return raiz_hex, itens, w3.to_hex(tx_hash)
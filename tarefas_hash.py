@@ -0,0 +1,24 @@
+import bson
+from integridade import gerar_hash_documento
+
+# ==================== FUNÇÕES EXECUTADAS NOS PROCESSOS ====================
+# Módulo importado pelos processos do pool de hash: manter apenas dependências leves
+
+def somente_hash(documento):
+    """
+    Hash do documento, sem a prévia dos valores concatenados
+    """
+    return gerar_hash_documento(documento, limite_previa=0)[0]
+
+def hash_e_caracteres(documento):
+    """
+    Hash do documento e o tamanho (em caracteres) da concatenação de valores
+    """
+    hash_hex, previa = gerar_hash_documento(documento, limite_previa=0)
+    return hash_hex, previa.tamanho
+
+def _processar_lote(funcao, brutos):
+    """
+    Decodifica os documentos BSON brutos e aplica `funcao` a cada um
+    """
+    return [funcao(bson.decode(bruto)) for bruto in brutos]
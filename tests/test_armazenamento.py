@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import pytest
+import armazenamento
+from armazenamento import CacheLRU, caminho_dados, conectar
+
+def test_nomes_relativos_ficam_no_diretorio_de_dados(tmp_path, monkeypatch):
+    diretorio = tmp_path / "dados"
+    monkeypatch.setattr(armazenamento, 'DIRETORIO_DADOS', str(diretorio))
+    monkeypatch.chdir(tmp_path)
+
+    assert caminho_dados("cache.sqlite3") == str(diretorio / "cache.sqlite3")
+    assert diretorio.is_dir()
+    assert caminho_dados(str(tmp_path / "outro.sqlite3")) == str(tmp_path / "outro.sqlite3")
+
+def test_diretorio_padrao_independe_do_diretorio_corrente():
+    assert os.path.isabs(armazenamento.DIRETORIO_DADOS) or "PRONTUARIOS_DIRETORIO_DADOS" in os.environ
+
+def test_conexao_confirma_ou_desfaz_a_transacao(tmp_path):
+    arquivo = str(tmp_path / "teste.sqlite3")
+    with conectar(arquivo) as conexao:
+        conexao.execute("CREATE TABLE t (v INTEGER)")
+        conexao.execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(RuntimeError):
+        with conectar(arquivo) as conexao:
+            conexao.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("falha no meio da transação")
+
+    with conectar(arquivo, linhas_nomeadas=True) as conexao:
+        linhas = conexao.execute("SELECT v FROM t").fetchall()
+    assert [linha['v'] for linha in linhas] == [1]
+    assert isinstance(linhas[0], sqlite3.Row)
+
+def test_lru_descarta_a_entrada_usada_ha_mais_tempo():
+    cache = CacheLRU(2)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obter("a") == 1
+    cache.guardar("c", 3)
+
+    assert len(cache) == 2
+    assert cache.obter("b") is None
+    assert (cache.obter("a"), cache.obter("c")) == (1, 3)
@@ -0,0 +1,101 @@
+import sqlite3
+import pytest
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+import cache_blockchain
+from cache_blockchain import CacheBlockchain
+
+TX_ANTIGA = "0x" + "AA" * 32
+TX_RECENTE = "0x" + "bb" * 32
+
+class Web3Falso:
+    """Nó falso com duas transações: uma já confirmada em profundidade e uma recente"""
+
+    def __init__(self, chain_id=11155111, bloco_atual=100):
+        self.eth = self
+        self.chain_id = chain_id
+        self.block_number = bloco_atual
+        self.consultas = []
+
+    def get_transaction(self, tx_hash):
+        self.consultas.append(tx_hash)
+        bloco = 50 if tx_hash == TX_ANTIGA.lower() else 99
+        return AttributeDict({
+            'hash': HexBytes(tx_hash),
+            'blockNumber': bloco,
+            'input': HexBytes("0x" + "12" * 4 + self.chain_id.to_bytes(4, 'big').hex()),
+            'accessList': [AttributeDict({'address': "0x" + "11" * 20, 'storageKeys': [HexBytes("0x01")]})],
+        })
+
+@pytest.fixture
+def arquivo(tmp_path):
+    return str(tmp_path / "blockchain.sqlite3")
+
+def test_primeira_leitura_e_repeticoes_sao_identicas(arquivo):
+    cache = CacheBlockchain(Web3Falso(), arquivo)
+
+    primeira = cache.obter_transacao(TX_ANTIGA)
+    da_memoria = cache.obter_transacao(TX_ANTIGA)
+    do_disco = CacheBlockchain(Web3Falso(), arquivo).obter_transacao(TX_ANTIGA)
+
+    assert primeira == da_memoria == do_disco
+    assert isinstance(primeira, AttributeDict) and isinstance(primeira.accessList[0], AttributeDict)
+    assert primeira.hash == TX_ANTIGA.lower()
+    assert primeira.accessList[0].storageKeys == ["0x01"]
+
+def test_contadores_de_memoria_disco_e_faltas(arquivo):
+    w3 = Web3Falso()
+    cache = CacheBlockchain(w3, arquivo)
+    cache.obter_transacao(TX_ANTIGA)
+    cache.obter_transacao(TX_ANTIGA)
+
+    novo = CacheBlockchain(Web3Falso(), arquivo)
+    novo.obter_transacao(TX_ANTIGA)
+    novo.obter_transacao(TX_ANTIGA)
+
+    assert w3.consultas == [TX_ANTIGA.lower()]
+    assert cache.estatisticas() == {
+        "acertos_memoria": 1, "acertos_disco": 0, "faltas": 1, "nao_armazenados": 0,
+        "em_memoria": 1, "em_disco": 1
+    }
+    assert novo.contadores == {"acertos_memoria": 1, "acertos_disco": 1, "faltas": 0, "nao_armazenados": 0}
+
+def test_dados_sem_a_profundidade_de_confirmacao_nao_sao_armazenados(arquivo, monkeypatch):
+    w3 = Web3Falso()
+    cache = CacheBlockchain(w3, arquivo, profundidade=12)
+
+    cache.obter_transacao(TX_RECENTE)
+    cache.obter_transacao(TX_RECENTE)
+
+    assert w3.consultas == [TX_RECENTE, TX_RECENTE]
+    assert cache.estatisticas()["nao_armazenados"] == 2
+    assert cache.estatisticas()["em_disco"] == 0
+
+    # Com a profundidade atingida, a próxima leitura passa a ser armazenada
+    w3.block_number = 99 + 12
+    monkeypatch.setattr(cache_blockchain, 'VALIDADE_BLOCO_ATUAL', -1)
+    cache.obter_transacao(TX_RECENTE)
+    assert cache.estatisticas()["em_disco"] == 1
+
+def test_redes_nao_compartilham_entradas(arquivo):
+    sepolia = CacheBlockchain(Web3Falso(chain_id=11155111), arquivo)
+    mainnet_w3 = Web3Falso(chain_id=1)
+    mainnet = CacheBlockchain(mainnet_w3, arquivo)
+
+    de_sepolia = sepolia.obter_transacao(TX_ANTIGA)
+    de_mainnet = mainnet.obter_transacao(TX_ANTIGA)
+
+    assert de_sepolia.input != de_mainnet.input
+    assert mainnet_w3.consultas == [TX_ANTIGA.lower()]
+    assert CacheBlockchain(Web3Falso(chain_id=1), arquivo).obter_transacao(TX_ANTIGA) == de_mainnet
+
+def test_tabela_sem_a_rede_na_chave_e_descartada(arquivo):
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.execute("CREATE TABLE cache (tipo TEXT, chave TEXT, valor TEXT, PRIMARY KEY (tipo, chave))")
+        conexao.execute("INSERT INTO cache VALUES ('transacao', ?, '{}')", (TX_ANTIGA.lower(),))
+    conexao.close()
+
+    cache = CacheBlockchain(Web3Falso(), arquivo)
+
+    assert cache.obter_transacao(TX_ANTIGA).blockNumber == 50
+    assert cache.contadores["faltas"] == 1
@@ -0,0 +1,91 @@
+import bson
+import pytest
+from cache_hashes import CacheHashes
+from integridade import (
+    _verificar_lote_bruto, gerar_hash_documento, identificar_bruto, marcador_conteudo
+)
+
+COLECAO = "db.prontuarios"
+
+def _documento(i, **extras):
+    return {'_id': i, 'idAtendimento': f"A{i}", 'texto': "x" * i, **extras}
+
+@pytest.fixture
+def arquivo(tmp_path):
+    return str(tmp_path / "hashes.sqlite3")
+
+# ==================== CACHE DE HASHES ====================
+
+def test_hash_calculado_uma_vez_e_reaproveitado(arquivo):
+    cache = CacheHashes(arquivo)
+    documentos = [_documento(i) for i in range(5)]
+
+    primeiro = cache.obter(COLECAO, documentos)
+    segundo = cache.obter(COLECAO, documentos)
+
+    assert primeiro == segundo == [
+        (gerar_hash_documento(doc)[0], gerar_hash_documento(doc)[1].tamanho) for doc in documentos
+    ]
+    assert cache.contadores == {"acertos_memoria": 5, "acertos_disco": 0, "calculados": 5}
+
+def test_entradas_persistem_em_disco(arquivo):
+    documentos = [_documento(i) for i in range(3)]
+    CacheHashes(arquivo).obter(COLECAO, documentos)
+
+    novo = CacheHashes(arquivo)
+    novo.obter(COLECAO, documentos)
+
+    assert novo.contadores["acertos_disco"] == 3
+    assert novo.contadores["calculados"] == 0
+    assert novo.estatisticas()["em_disco"] == 3
+
+def test_alteracao_do_conteudo_invalida_a_entrada(arquivo):
+    cache = CacheHashes(arquivo)
+    documento = _documento(1)
+    cache.obter(COLECAO, [documento])
+
+    alterado = dict(documento, texto="adulterado")
+    # blockchain_info não faz parte do conteúdo: a entrada continua valendo
+    registrado = dict(documento, blockchain_info={'document_hash': "ab" * 32})
+
+    assert cache.obter(COLECAO, [alterado])[0][0] == gerar_hash_documento(alterado)[0]
+    assert marcador_conteudo(registrado) == marcador_conteudo(documento)
+    assert cache.contadores["calculados"] == 2
+
+def test_colecoes_nao_compartilham_entradas(arquivo):
+    cache = CacheHashes(arquivo)
+    cache.obter(COLECAO, [_documento(1)])
+    cache.obter("db.outra", [_documento(1)])
+
+    assert cache.contadores["calculados"] == 2
+
+# ==================== VERIFICAÇÃO COM HASHES CONHECIDOS ====================
+
+def _registrado(documento, hash_registrado=None):
+    hash_registrado = hash_registrado or gerar_hash_documento(documento)[0]
+    return bson.encode(dict(documento, blockchain_info={'document_hash': hash_registrado}))
+
+def test_lote_bruto_sem_cache_recalcula_e_informa_os_hashes():
+    lote = [_registrado(_documento(1)), _registrado(_documento(2), "00" * 32), bson.encode(_documento(3))]
+
+    integros, modificados, sem_registro, divergencias, calculados = _verificar_lote_bruto(lote)
+
+    assert (integros, modificados, sem_registro) == (1, 1, 1)
+    assert divergencias[0]["_id"] == "2"
+    assert [indice for indice, _, _ in calculados] == [0, 1, 2]
+    assert calculados[0][1:] == (gerar_hash_documento(_documento(1))[0], len("A1x"))
+
+def test_lote_bruto_com_hashes_conhecidos_nao_recalcula():
+    documentos = [_documento(1), _documento(2)]
+    lote = [_registrado(documentos[0]), _registrado(documentos[1], "00" * 32)]
+    conhecidos = [gerar_hash_documento(doc)[0] for doc in documentos]
+
+    integros, modificados, _, divergencias, calculados = _verificar_lote_bruto(lote, conhecidos)
+
+    assert (integros, modificados, calculados) == (1, 1, [])
+    assert divergencias[0]["hash_calculado"] == conhecidos[1]
+    assert divergencias[0]["idAtendimento"] == "A2"
+
+def test_identificacao_do_bruto_confere_com_o_documento():
+    documento = _documento(7)
+    assert identificar_bruto(_registrado(documento)) == ("7", marcador_conteudo(documento))
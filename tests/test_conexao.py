@@ -0,0 +1,52 @@
+from pymongo.errors import ServerSelectionTimeoutError
+import conexao
+
+class ClienteFalso:
+    def __init__(self, falhar=False):
+        self.falhar = falhar
+        self.pings = 0
+        self.fechado = False
+        self.admin = self
+
+    def command(self, nome):
+        self.pings += 1
+        if self.falhar:
+            raise ServerSelectionTimeoutError("sem servidor")
+        return {'ok': 1}
+
+    def close(self):
+        self.fechado = True
+
+def test_ping_repetido_apenas_apos_o_intervalo(monkeypatch):
+    cliente = ClienteFalso()
+    agora = [1000.0]
+    monkeypatch.setattr(conexao.time, 'monotonic', lambda: agora[0])
+
+    assert conexao._cliente_saudavel(cliente)
+    assert conexao._cliente_saudavel(cliente)
+    assert cliente.pings == 1
+
+    agora[0] += conexao.INTERVALO_VERIFICACAO_SAUDE
+    assert conexao._cliente_saudavel(cliente)
+    assert cliente.pings == 2
+
+def test_falha_descarta_do_cache_sem_fechar_o_cliente_compartilhado():
+    cliente = ClienteFalso(falhar=True)
+
+    assert conexao._cliente_saudavel(cliente) is False
+    assert not cliente.fechado
+    assert getattr(cliente, conexao.ATRIBUTO_ULTIMA_VERIFICACAO) == 0
+
+def test_cliente_novo_e_sempre_verificado(monkeypatch):
+    monkeypatch.setattr(conexao.time, 'monotonic', lambda: 1000.0)
+    # Um cliente novo nunca herda a marca de outro, mesmo que reaproveite o id() de um descartado
+    for _ in range(3):
+        cliente = ClienteFalso()
+        assert conexao._cliente_saudavel(cliente)
+        assert cliente.pings == 1
+        del cliente
+
+def test_uri_srv():
+    assert conexao.montar_uri("u", "s", "cluster.exemplo.net", "db") == (
+        "mongodb+srv://u:s@cluster.exemplo.net/db?retryWrites=true&w=majority"
+    )
@@ -0,0 +1,167 @@
+from types import SimpleNamespace
+import mongomock
+import pytest
+import confirmacoes
+from armazenamento import conectar
+from confirmacoes import (
+    INTERVALO_RECONSULTA_DESCONHECIDA,
+    STATUS_CONFIRMADA,
+    STATUS_DESCONHECIDA,
+    STATUS_PENDENTE,
+    STATUS_REVERTIDA,
+    RastreadorConfirmacoes
+)
+from web3.exceptions import TransactionNotFound
+
+CHAVE = "host/db/prontuarios"
+
+class Web3Falso:
+    """
+    Nó falso: `recibos` mapeia tx_hash -> recibo ou exceção a levantar
+    """
+
+    def __init__(self):
+        self.eth = self
+        self.recibos = {}
+        self.consultas = []
+
+    def contract(self, address, abi):
+        return SimpleNamespace(address=address)
+
+    def get_transaction_receipt(self, tx_hash):
+        self.consultas.append(tx_hash)
+        recibo = self.recibos.get(tx_hash)
+        if recibo is None:
+            raise TransactionNotFound(tx_hash)
+        if isinstance(recibo, Exception):
+            raise recibo
+        return recibo
+
+def _recibo(status=1, bloco=100):
+    return SimpleNamespace(status=status, blockNumber=bloco, gasUsed=21000)
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(confirmacoes.time, 'time', lambda: agora[0])
+    return agora
+
+@pytest.fixture
+def rastreador(tmp_path, monkeypatch, relogio):
+    w3 = Web3Falso()
+    monkeypatch.setattr(confirmacoes, 'obter_web3', lambda rpc_url: w3)
+    monkeypatch.setattr(confirmacoes, 'verificacao_do_evento', lambda contract, recibo: {"exists": True})
+    # Sem a thread de fundo: as rodadas são executadas pelo teste
+    monkeypatch.setattr(RastreadorConfirmacoes, '_executar', lambda self: None)
+
+    rastreador = RastreadorConfirmacoes(
+        "http://rpc", "0x0000000000000000000000000000000000000002", [], arquivo=str(tmp_path / "fila.sqlite3")
+    )
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many([{'_id': i, 'texto': str(i)} for i in range(4)])
+    rastreador.registrar_colecao(CHAVE, colecao)
+    return rastreador, w3, colecao
+
+def _status(rastreador):
+    return {linha['tx_hash']: linha for linha in rastreador.listar(CHAVE)}
+
+def _enfileirar(rastreador, tx_hash, *ids):
+    rastreador.enfileirar(tx_hash, CHAVE, [{'_id': i, 'hash_hex': f"{i:064x}"} for i in ids], "0xconta")
+
+def test_confirmada_grava_blockchain_info(rastreador):
+    rastreador, w3, colecao = rastreador
+    _enfileirar(rastreador, "0xa", 0, 1)
+    w3.recibos["0xa"] = _recibo(bloco=123)
+
+    assert rastreador.processar_pendentes() == 1
+
+    linha = _status(rastreador)["0xa"]
+    assert (linha['status'], linha['bloco'], linha['documentos_atualizados'], linha['documentos']) == (
+        STATUS_CONFIRMADA, 123, 2, 2
+    )
+    info = colecao.find_one({'_id': 1})['blockchain_info']
+    assert info['document_hash'] == f"{1:064x}"
+    assert info['transaction']['block_number'] == 123
+    assert rastreador.ids_pendentes(CHAVE) == []
+    assert rastreador.processar_pendentes() == 0
+
+def test_revertida_nao_altera_documentos(rastreador):
+    rastreador, w3, colecao = rastreador
+    _enfileirar(rastreador, "0xa", 0)
+    w3.recibos["0xa"] = _recibo(status=0)
+
+    rastreador.processar_pendentes()
+
+    assert _status(rastreador)["0xa"]['status'] == STATUS_REVERTIDA
+    assert 'blockchain_info' not in colecao.find_one({'_id': 0})
+
+def test_sem_recibo_continua_pendente_ate_o_prazo(rastreador, relogio):
+    rastreador, w3, _ = rastreador
+    _enfileirar(rastreador, "0xa", 0)
+
+    rastreador.processar_pendentes()
+    assert _status(rastreador)["0xa"]['status'] == STATUS_PENDENTE
+    assert rastreador.ids_pendentes(CHAVE) == [0]
+
+def test_apos_o_prazo_fica_desconhecida_e_ainda_pode_confirmar(rastreador, relogio):
+    rastreador, w3, colecao = rastreador
+    _enfileirar(rastreador, "0xa", 0)
+    relogio[0] += rastreador.prazo
+
+    rastreador.processar_pendentes()
+    linha = _status(rastreador)["0xa"]
+    assert linha['status'] == STATUS_DESCONHECIDA
+    # Sem recibo, o documento não volta a ser candidato a um novo envio
+    assert rastreador.ids_pendentes(CHAVE) == [0]
+
+    # Reconsultada apenas após o intervalo
+    assert rastreador.processar_pendentes() == 0
+    relogio[0] += INTERVALO_RECONSULTA_DESCONHECIDA
+    w3.recibos["0xa"] = _recibo()
+    assert rastreador.processar_pendentes() == 1
+    assert _status(rastreador)["0xa"]['status'] == STATUS_CONFIRMADA
+    assert 'blockchain_info' in colecao.find_one({'_id': 0})
+
+def test_falha_de_consulta_afeta_apenas_a_propria_transacao(rastreador):
+    rastreador, w3, colecao = rastreador
+    _enfileirar(rastreador, "0xa", 0)
+    _enfileirar(rastreador, "0xb", 1)
+    _enfileirar(rastreador, "0xc", 2)
+    w3.recibos["0xa"] = _recibo()
+    w3.recibos["0xb"] = ConnectionError("RPC indisponível")
+    w3.recibos["0xc"] = _recibo()
+
+    assert rastreador.processar_pendentes() == 3
+
+    status = _status(rastreador)
+    assert status["0xa"]['status'] == STATUS_CONFIRMADA
+    assert status["0xc"]['status'] == STATUS_CONFIRMADA
+    assert status["0xb"]['status'] == STATUS_PENDENTE
+    assert "RPC indisponível" in status["0xb"]['erro']
+
+    w3.recibos["0xb"] = _recibo()
+    rastreador.processar_pendentes()
+    assert _status(rastreador)["0xb"]['status'] == STATUS_CONFIRMADA
+
+def test_so_processa_colecoes_registradas(tmp_path, monkeypatch, relogio):
+    w3 = Web3Falso()
+    monkeypatch.setattr(confirmacoes, 'obter_web3', lambda rpc_url: w3)
+    monkeypatch.setattr(RastreadorConfirmacoes, '_executar', lambda self: None)
+    rastreador = RastreadorConfirmacoes("http://rpc", "0x2", [], arquivo=str(tmp_path / "fila.sqlite3"))
+    _enfileirar(rastreador, "0xa", 0)
+
+    assert rastreador.processar_pendentes() == 0
+    assert w3.consultas == []
+    assert rastreador.resumo(CHAVE) == {STATUS_PENDENTE: 1}
+
+def test_fila_antiga_com_expiradas_e_migrada(tmp_path, monkeypatch, relogio):
+    monkeypatch.setattr(confirmacoes, 'obter_web3', lambda rpc_url: Web3Falso())
+    monkeypatch.setattr(RastreadorConfirmacoes, '_executar', lambda self: None)
+    arquivo = str(tmp_path / "fila.sqlite3")
+    rastreador = RastreadorConfirmacoes("http://rpc", "0x2", [], arquivo=arquivo)
+    _enfileirar(rastreador, "0xa", 0)
+    with conectar(rastreador.arquivo) as conexao:
+        conexao.execute("UPDATE transacoes SET status = 'expirada'")
+
+    rastreador = RastreadorConfirmacoes("http://rpc", "0x2", [], arquivo=arquivo)
+    assert rastreador.resumo(CHAVE) == {STATUS_DESCONHECIDA: 1}
@@ -0,0 +1,64 @@
+import mongomock
+import pytest
+from consultas import (
+    VISAO_CABECALHO, VISAO_COMPLETA, VISAO_HASH, buscar_documento, buscar_pagina_numerada, localizar_ancora, projetar
+)
+
+DOCUMENTOS = [
+    {'_id': 1, 'idAtendimento': "A1", 'texto': "x" * 100},
+    {'_id': 2, 'cnsPaciente': "123", 'blockchain_info': {
+        'document_hash': "ab" * 32, 'network': "sepolia", 'transaction': {'transaction_hash': "0x1"}
+    }},
+    {'_id': 3, 'tipoAtendimento': "consulta", 'blockchain_info': {}},
+    {'_id': 4, 'blockchain_info': "legado"},
+]
+
+@pytest.fixture
+def colecao():
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many([dict(doc) for doc in DOCUMENTOS])
+    return colecao
+
+@pytest.mark.parametrize("visao", [VISAO_CABECALHO, VISAO_COMPLETA])
+@pytest.mark.parametrize("documento", DOCUMENTOS, ids=lambda doc: str(doc['_id']))
+def test_projecao_em_memoria_equivale_a_consulta(colecao, documento, visao):
+    assert projetar(documento, visao) == buscar_documento(colecao, documento['_id'], visao)
+
+def test_projecao_de_exclusao_nao_e_aplicada_em_memoria():
+    with pytest.raises(ValueError):
+        projetar(DOCUMENTOS[0], VISAO_HASH)
+
+# ==================== PAGINAÇÃO POR CHAVE ====================
+
+@pytest.fixture
+def colecao_paginada():
+    colecao = mongomock.MongoClient().db.paginada
+    colecao.insert_many([{'_id': i, 'valor': i} for i in range(1, 26)])
+    return colecao
+
+def _ids(documentos):
+    return [doc['_id'] for doc in documentos]
+
+def test_paginas_sequenciais_guardam_as_ancoras(colecao_paginada):
+    fronteiras = {}
+
+    assert _ids(buscar_pagina_numerada(colecao_paginada, 1, 10, fronteiras)) == list(range(1, 11))
+    assert fronteiras == {1: None, 2: 10}
+    assert _ids(buscar_pagina_numerada(colecao_paginada, 2, 10, fronteiras)) == list(range(11, 21))
+    assert _ids(buscar_pagina_numerada(colecao_paginada, 3, 10, fronteiras)) == list(range(21, 26))
+    assert fronteiras == {1: None, 2: 10, 3: 20, 4: 25}
+
+def test_salto_parte_da_ancora_conhecida_mais_proxima(colecao_paginada):
+    fronteiras = {1: None, 2: 4}  # âncora da página 2 fora da posição padrão
+
+    assert localizar_ancora(colecao_paginada, 4, 4, fronteiras) == (True, 12)
+    assert _ids(buscar_pagina_numerada(colecao_paginada, 4, 4, fronteiras)) == [13, 14, 15, 16]
+    assert fronteiras[4] == 12 and fronteiras[5] == 16
+
+def test_pagina_alem_do_fim_retorna_vazio(colecao_paginada):
+    fronteiras = {}
+
+    assert buscar_pagina_numerada(colecao_paginada, 4, 10, fronteiras) == []
+    assert 4 not in fronteiras
+    assert buscar_pagina_numerada(colecao_paginada, 3, 10, fronteiras)
+    assert buscar_pagina_numerada(colecao_paginada, 4, 10, fronteiras) == []
@@ -0,0 +1,105 @@
+import datetime
+import mongomock
+import pytest
+from estatisticas import SEM_VALOR, EstatisticasIncrementais, calcular_estatisticas, classificar_documento
+
+def _registrado(tipo, registrado_em, rede="Sepolia Testnet"):
+    return {
+        'tipoAtendimento': tipo,
+        'blockchain_info': {'document_hash': "ab" * 32, 'registered_at': registrado_em, 'network': rede}
+    }
+
+DOCUMENTOS = [
+    _registrado("consulta", "2024-05-01T10:00:00"),
+    _registrado("consulta", "2024-05-20T08:30:00.123456"),
+    _registrado("consulta", datetime.datetime(2024, 6, 2, 12, 0)),   # gravado como Date
+    _registrado("exame", "2024-06-15T09:00:00", rede="Ethereum Mainnet"),
+    _registrado("exame", "data inválida"),
+    _registrado(None, None, rede=None),
+    {'tipoAtendimento': "consulta"},
+    {'tipoAtendimento': "exame", 'blockchain_info': {'document_hash': ""}},
+    {'tipoAtendimento': "exame", 'blockchain_info': {'document_hash': None, 'registered_at': "2023-01-01"}},
+    {'blockchain_info': {}},
+]
+
+@pytest.fixture
+def colecao():
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many([dict(documento) for documento in DOCUMENTOS])
+    return colecao
+
+def test_cartoes_e_quebras(colecao):
+    estatisticas = calcular_estatisticas(colecao)
+
+    assert (estatisticas["documentos"], estatisticas["com_blockchain"], estatisticas["sem_blockchain"]) == (10, 6, 4)
+    assert estatisticas["por_tipo"] == [
+        {"tipoAtendimento": "consulta", "documentos": 4, "com_blockchain": 3},
+        {"tipoAtendimento": "exame", "documentos": 4, "com_blockchain": 2},
+        {"tipoAtendimento": SEM_VALOR, "documentos": 2, "com_blockchain": 1},
+    ]
+    assert estatisticas["por_mes"] == [
+        {"mes": SEM_VALOR, "registros": 2},
+        {"mes": "2024-05", "registros": 2},
+        {"mes": "2024-06", "registros": 2},
+    ]
+    assert estatisticas["por_rede"] == [
+        {"rede": "Sepolia Testnet", "registros": 4},
+        {"rede": SEM_VALOR, "registros": 1},
+        {"rede": "Ethereum Mainnet", "registros": 1},
+    ]
+
+def test_colecao_vazia():
+    estatisticas = calcular_estatisticas(mongomock.MongoClient().db.vazia)
+
+    assert estatisticas == {
+        "documentos": 0, "com_blockchain": 0, "sem_blockchain": 0, "por_tipo": [], "por_mes": [], "por_rede": []
+    }
+
+# ==================== ESTATÍSTICAS INCREMENTAIS ====================
+
+def _misto():
+    """Valores que separam os critérios: hash 0/False, Date, tipos compostos, mês fora do formato"""
+    documentos = DOCUMENTOS + [
+        {'tipoAtendimento': {'codigo': 1, 'nome': "retorno"}, 'blockchain_info': {'document_hash': 0}},
+        {'tipoAtendimento': {'codigo': 1, 'nome': "retorno"}, 'blockchain_info': {'document_hash': False}},
+        {'tipoAtendimento': ["exame", "consulta"], 'blockchain_info': {'document_hash': "cd" * 32,
+                                                                     'network': {'nome': "local", 'id': 1337}}},
+        {'tipoAtendimento': "exame", 'blockchain_info': {'document_hash': "ef" * 32, 'registered_at': 20240501}},
+        {'tipoAtendimento': "exame", 'blockchain_info': "formato antigo"},
+    ]
+    # Contagens distintas por tipo e por rede: a ordem não depende do desempate
+    documentos += [_registrado("urgência", "2025-01-0%dT00:00:00" % dia, rede="Polygon") for dia in range(1, 8)]
+    return [dict(documento, _id=indice) for indice, documento in enumerate(documentos)]
+
+def test_registro_e_mes_seguem_o_pipeline():
+    assert classificar_documento({'blockchain_info': {'document_hash': 0}})[1] is True
+    assert classificar_documento({'blockchain_info': {'document_hash': ''}})[1] is False
+    assert classificar_documento({'blockchain_info': {'registered_at': datetime.datetime(2024, 6, 2)}})[2] == "2024-06"
+    assert classificar_documento({'blockchain_info': {'registered_at': "data inválida"}})[2] == ""
+
+def test_tipos_compostos_sao_agrupados_como_no_group():
+    incrementais = EstatisticasIncrementais()
+    for tipo in ({'codigo': 1, 'nome': "retorno"}, {'codigo': 1, 'nome': "retorno"}, {'nome': "retorno", 'codigo': 1}):
+        incrementais.adicionar({'tipoAtendimento': tipo})
+
+    # Como no servidor, subdocumentos com os campos em outra ordem são valores diferentes
+    assert [(item["tipoAtendimento"], item["documentos"]) for item in incrementais.resultado()["por_tipo"]] == [
+        ({'codigo': 1, 'nome': "retorno"}, 2), ({'nome': "retorno", 'codigo': 1}, 1)
+    ]
+
+def test_incremental_equivale_ao_pipeline():
+    documentos = _misto()
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many([dict(documento) for documento in documentos])
+    incrementais = EstatisticasIncrementais()
+    for documento in documentos:
+        incrementais.adicionar(documento)
+
+    assert incrementais.resultado() == calcular_estatisticas(colecao)
+
+    removidos = [documento for documento in documentos if documento['_id'] % 3 == 0]
+    for documento in removidos:
+        incrementais.remover(documento)
+    colecao.delete_many({'_id': {'$in': [documento['_id'] for documento in removidos]}})
+
+    assert incrementais.resultado() == calcular_estatisticas(colecao)
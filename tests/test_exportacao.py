@@ -0,0 +1,187 @@
+import gzip
+import io
+import random
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from bson import ObjectId
+from bson.json_util import dumps, loads
+from consultas import projetar
+from exportacao import (
+    FORMATO_JSON,
+    FORMATO_NDJSON,
+    ExportadorJSON,
+    ExportadorParquet,
+    gerar_relatorio_txt,
+    tamanho_relatorio,
+    ler_trecho_relatorio,
+    conteudo_para_download
+)
+
+# ==================== RELATÓRIO ACHATADO ====================
+
+def _documentos(quantidade):
+    return [
+        {'_id': ObjectId(), 'idAtendimento': f"AT{i}", 'paciente': {'nome': f"Paciente {i}", 'idade': i}}
+        | ({'blockchain_info': {'document_hash': f"{i:064x}"}} if i % 3 == 0 else {})
+        for i in range(quantidade)
+    ]
+
+def test_relatorio_de_cursor_sem_reter_documentos():
+    documentos = _documentos(25)
+    relatorio, num_docs, num_com_blockchain, previa = gerar_relatorio_txt(iter(documentos), tamanho_previa=10)
+
+    texto = conteudo_para_download(relatorio).decode('utf-8')
+    assert num_docs == 25
+    assert num_com_blockchain == 9
+    assert previa == documentos[:10]
+    assert texto.count("== DOCUMENTO ") == 25
+    assert f"(ID: {documentos[0]['_id']})" in texto
+    assert "paciente.nome: Paciente 24\n" in texto
+    assert "paciente.idade: 7\n" in texto
+
+def test_previa_sem_limite_guarda_apenas_cabecalhos():
+    documentos = _documentos(25)
+    _, _, _, previa = gerar_relatorio_txt(iter(documentos), tamanho_previa=None, resumir=projetar)
+
+    assert [doc['_id'] for doc in previa] == [doc['_id'] for doc in documentos]
+    assert all('paciente' not in doc for doc in previa)
+    assert previa[0]['blockchain_info'] == {'document_hash': documentos[0]['blockchain_info']['document_hash']}
+
+def test_relatorio_vazio():
+    relatorio, num_docs, num_com_blockchain, previa = gerar_relatorio_txt([])
+
+    assert (num_docs, num_com_blockchain, previa) == (0, 0, [])
+    assert conteudo_para_download(relatorio).startswith("--- RELATÓRIO".encode('utf-8'))
+
+def test_exportadores_recebem_todos_os_documentos():
+    class Exportador:
+        def __init__(self):
+            self.recebidos = []
+
+        def escrever(self, doc):
+            self.recebidos.append(doc)
+
+    exportador = Exportador()
+    documentos = _documentos(5)
+    gerar_relatorio_txt(documentos, exportadores=[exportador])
+    assert exportador.recebidos == documentos
+
+# ==================== TRECHOS DO RELATÓRIO ====================
+
+def test_trechos_cobrem_o_relatorio_sem_repetir_nem_cortar_linhas():
+    aleatorio = random.Random(7)
+    linhas = [("x" * aleatorio.randint(0, 40) + "ç\n").encode('utf-8') for _ in range(300)]
+    conteudo = b"".join(linhas)
+    arquivo = io.BytesIO(conteudo)
+    assert tamanho_relatorio(arquivo) == len(conteudo)
+
+    for tamanho in (1, 7, 64, 500, len(conteudo) + 10):
+        trechos = [
+            ler_trecho_relatorio(arquivo, inicio, tamanho)
+            for inicio in range(0, len(conteudo), tamanho)
+        ]
+        assert "".join(trechos) == conteudo.decode('utf-8')
+        assert all(trecho.endswith("\n") for trecho in trechos if trecho)
+
+def test_leitura_devolve_o_arquivo_ao_inicio():
+    arquivo = io.BytesIO(b"a\nb\n")
+    assert conteudo_para_download(arquivo) == b"a\nb\n"
+    assert arquivo.tell() == 0
+    ler_trecho_relatorio(arquivo, 2, 1)
+    assert arquivo.tell() == 0
+
+
+# ==================== EXPORTAÇÃO JSON ====================
+
+def _exportar(documentos, **opcoes):
+    exportador = ExportadorJSON(**opcoes)
+    for doc in documentos:
+        exportador.escrever(doc)
+    dados = exportador.finalizar().read()
+    return exportador, gzip.decompress(dados) if opcoes.get('compactar') else dados
+
+@pytest.mark.parametrize('quantidade', [0, 1, 3])
+def test_json_igual_a_serializar_a_lista_inteira(quantidade):
+    documentos = _documentos(quantidade)
+    exportador, dados = _exportar(documentos)
+
+    assert dados.decode('utf-8') == dumps(documentos, indent=2, ensure_ascii=False)
+    assert loads(dados) == documentos
+    assert exportador.num_documentos == quantidade
+    assert (exportador.extensao, exportador.mime) == (".json", "application/json")
+
+def test_json_vazio_e_um_array_valido():
+    _, dados = _exportar([])
+    assert dados == b"[]"
+
+def test_ndjson_um_documento_por_linha():
+    documentos = _documentos(4)
+    exportador, dados = _exportar(documentos, formato=FORMATO_NDJSON)
+
+    linhas = dados.decode('utf-8').splitlines()
+    assert [loads(linha) for linha in linhas] == documentos
+    assert (exportador.extensao, exportador.mime) == (".ndjson", "application/x-ndjson")
+
+@pytest.mark.parametrize('formato', [FORMATO_JSON, FORMATO_NDJSON])
+def test_gzip_descompacta_no_mesmo_conteudo(formato):
+    documentos = _documentos(3)
+    _, simples = _exportar(documentos, formato=formato)
+    exportador, descompactado = _exportar(documentos, formato=formato, compactar=True)
+
+    assert descompactado == simples
+    assert exportador.extensao.endswith(".gz")
+    assert exportador.mime == "application/gzip"
+
+def test_json_vazio_compactado():
+    _, dados = _exportar([], compactar=True)
+    assert dados == b"[]"
+
+
+# ==================== EXPORTAÇÃO PARQUET ====================
+
+def _parquet(documentos, tamanho_grupo=2):
+    exportador = ExportadorParquet(tamanho_grupo=tamanho_grupo)
+    for doc in documentos:
+        exportador.escrever(doc)
+    return exportador, pq.ParquetFile(exportador.finalizar())
+
+def test_parquet_promove_inteiro_para_real_entre_lotes():
+    _, arquivo = _parquet([{'v': 1}, {'v': 2}, {'v': 2.5}])
+
+    tabela = arquivo.read()
+    assert tabela.schema.field('v').type == pa.float64()
+    assert tabela.column('v').to_pylist() == [1.0, 2.0, 2.5]
+    assert arquivo.num_row_groups == 2
+
+def test_parquet_tipos_incompativeis_viram_texto():
+    _, arquivo = _parquet([{'v': 1}, {'v': 2}, {'v': "três"}, {'v': True}])
+
+    tabela = arquivo.read()
+    assert tabela.schema.field('v').type == pa.string()
+    assert tabela.column('v').to_pylist() == ["1", "2", "três", "True"]
+
+def test_parquet_colunas_ausentes_e_nulas():
+    _, arquivo = _parquet([{'a': None}, {'a': None}, {'b': 1}])
+
+    tabela = arquivo.read()
+    assert tabela.schema.field('a').type == pa.string()
+    assert tabela.column('a').to_pylist() == [None, None, None]
+    assert tabela.column('b').to_pylist() == [None, None, 1]
+
+def test_parquet_mantem_tipos_e_chaves_achatadas():
+    documentos = _documentos(3)
+    documentos[0]['registrado_em'] = datetime(2024, 5, 17, 13, 45)
+    exportador, arquivo = _parquet(documentos, tamanho_grupo=10)
+
+    tabela = arquivo.read()
+    assert exportador.num_documentos == 3
+    assert tabela.column('_id.$oid').to_pylist() == [str(doc['_id']) for doc in documentos]
+    assert tabela.schema.field('paciente.idade').type == pa.int64()
+    assert pa.types.is_timestamp(tabela.schema.field('registrado_em.$date').type)
+    assert tabela.column('registrado_em.$date').to_pylist()[0] == datetime(2024, 5, 17, 13, 45)
+
+def test_parquet_vazio_e_legivel():
+    _, arquivo = _parquet([])
+    assert arquivo.read().num_rows == 0
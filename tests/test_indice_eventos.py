@@ -0,0 +1,152 @@
+import pytest
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+from web3.datastructures import AttributeDict
+import indice_eventos
+from indice_eventos import (
+    ABI_EVENTOS,
+    INTERVALO_INICIAL_BLOCOS,
+    INTERVALO_MINIMO_BLOCOS,
+    PROFUNDIDADE_CONFIRMACAO,
+    IndiceEventos,
+    localizar_bloco_de_implantacao
+)
+
+CONTRATO = "0x00000000000000000000000000000000000000Aa"
+PROVEDOR = "0x00000000000000000000000000000000000000bB"
+BLOCO_IMPLANTACAO = 1_000
+TOPICO_REGISTRO, TOPICO_INVALIDACAO = (event_abi_to_log_topic(abi) for abi in ABI_EVENTOS)
+
+class Web3Falso:
+    """
+    Nó falso com `logs` em memória; eth_getLogs recusa intervalos maiores
+    que `limite_blocos`, como os provedores que limitam o tamanho da consulta
+    """
+
+    def __init__(self, bloco_atual, limite_blocos):
+        self.eth = self
+        self._w3 = Web3()
+        self.block_number = bloco_atual
+        self.limite_blocos = limite_blocos
+        self.logs = []
+        self.consultas = []
+
+    def contract(self, address, abi):
+        return self._w3.eth.contract(address=address, abi=abi)
+
+    def to_hex(self, valor):
+        return Web3.to_hex(valor)
+
+    def get_code(self, endereco, block_identifier):
+        return b'\x60\x80' if block_identifier >= BLOCO_IMPLANTACAO else b''
+
+    def get_logs(self, filtro):
+        self.consultas.append((filtro['fromBlock'], filtro['toBlock']))
+        if filtro['toBlock'] - filtro['fromBlock'] + 1 > self.limite_blocos:
+            raise ValueError("query exceeds max block range")
+        return [log for log in self.logs if filtro['fromBlock'] <= log['blockNumber'] <= filtro['toBlock']]
+
+    def registrar(self, bloco, hash_documento, record_id):
+        self._log(bloco, [TOPICO_REGISTRO, hash_documento, _endereco(PROVEDOR)],
+                  encode(['string', 'string', 'uint256'], ["consulta", record_id, 1_700_000_000 + bloco]))
+
+    def invalidar(self, bloco, hash_documento):
+        self._log(bloco, [TOPICO_INVALIDACAO, hash_documento, _endereco(PROVEDOR)], b'')
+
+    def _log(self, bloco, topicos, dados):
+        self.logs.append(AttributeDict({
+            'address': CONTRATO,
+            'topics': topicos,
+            'data': dados,
+            'blockNumber': bloco,
+            'logIndex': len(self.logs),
+            'transactionIndex': 0,
+            'transactionHash': bytes([len(self.logs)]) * 32,
+            'blockHash': b'\x01' * 32,
+        }))
+
+def _endereco(endereco):
+    return bytes(12) + bytes.fromhex(endereco[2:])
+
+def _hash(i):
+    return bytes([i]) * 32
+
+@pytest.fixture
+def no(monkeypatch):
+    w3 = Web3Falso(bloco_atual=20_000, limite_blocos=500)
+    monkeypatch.setattr(indice_eventos, 'obter_web3', lambda rpc_url: w3)
+    monkeypatch.setattr(indice_eventos, 'BLOCO_INICIAL', 0)
+    return w3
+
+@pytest.fixture
+def indice(no, tmp_path):
+    return IndiceEventos("http://rpc", Web3.to_checksum_address(CONTRATO), arquivo=str(tmp_path / "indice.sqlite3"))
+
+def test_busca_binaria_do_bloco_de_implantacao(no):
+    assert localizar_bloco_de_implantacao(no, CONTRATO) == BLOCO_IMPLANTACAO
+    assert localizar_bloco_de_implantacao(no, CONTRATO, inicio=1_500) == 1_500
+
+def test_sincroniza_reduzindo_o_intervalo_ao_limite_do_provedor(no, indice):
+    no.registrar(1_000, _hash(1), "A1")
+    no.registrar(7_321, _hash(2), "A2")
+    no.invalidar(9_000, _hash(2))
+    no.registrar(no.block_number - PROFUNDIDADE_CONFIRMACAO + 1, _hash(3), "recente")
+
+    assert indice.sincronizar() == 3
+
+    # Começa na implantação e não passa do último bloco confirmado
+    ultimo_confirmado = no.block_number - PROFUNDIDADE_CONFIRMACAO
+    aceitas = [(inicio, fim) for inicio, fim in no.consultas if fim - inicio + 1 <= no.limite_blocos]
+    assert aceitas[0][0] == BLOCO_IMPLANTACAO and aceitas[-1][1] == ultimo_confirmado
+    assert all(b[0] == a[1] + 1 for a, b in zip(aceitas, aceitas[1:]))
+    assert no.consultas[0][1] - no.consultas[0][0] + 1 == INTERVALO_INICIAL_BLOCOS
+    assert indice.estado() == (ultimo_confirmado, 2)
+
+    registro = indice.consultar("0x" + _hash(1).hex().upper())
+    assert (registro['record_id'], registro['block_number'], registro['invalidado']) == ("A1", 1_000, 0)
+    assert registro['provider'] == Web3.to_checksum_address(PROVEDOR)
+    invalidado = indice.consultar(_hash(2).hex())
+    assert (invalidado['invalidado'], invalidado['invalidado_bloco']) == (1, 9_000)
+    assert indice.consultar(_hash(3).hex()) is None
+
+def test_retoma_do_ultimo_bloco_indexado(no, indice):
+    indice.sincronizar()
+    no.consultas.clear()
+    no.block_number += 300
+    no.registrar(no.block_number - PROFUNDIDADE_CONFIRMACAO, _hash(4), "novo")
+
+    assert indice.sincronizar() == 1
+    assert no.consultas == [(20_000 - PROFUNDIDADE_CONFIRMACAO + 1, no.block_number - PROFUNDIDADE_CONFIRMACAO)]
+    assert indice.consultar(_hash(4).hex())['record_id'] == "novo"
+
+def test_intervalo_cresce_de_novo_apos_sucessos(no, indice):
+    no.limite_blocos = 10_000
+    indice.sincronizar()
+
+    tamanhos = [fim - inicio + 1 for inicio, fim in no.consultas]
+    assert tamanhos[:3] == [INTERVALO_INICIAL_BLOCOS, 2 * INTERVALO_INICIAL_BLOCOS, 4 * INTERVALO_INICIAL_BLOCOS]
+
+def test_falha_no_intervalo_minimo_preserva_o_progresso(no, indice):
+    no.registrar(1_200, _hash(5), "antes")
+    falhar_a_partir = 5_000
+    get_logs = no.get_logs
+
+    def get_logs_instavel(filtro):
+        if filtro['toBlock'] >= falhar_a_partir:
+            no.consultas.append((filtro['fromBlock'], filtro['toBlock']))
+            raise ValueError("provedor indisponível")
+        return get_logs(filtro)
+
+    no.get_logs = get_logs_instavel
+    with pytest.raises(ValueError):
+        indice.sincronizar()
+
+    ultimo, total = indice.estado()
+    assert BLOCO_IMPLANTACAO <= ultimo < falhar_a_partir and total == 1
+    assert no.consultas[-1][1] - no.consultas[-1][0] + 1 <= INTERVALO_MINIMO_BLOCOS
+
+    no.get_logs = get_logs
+    no.consultas.clear()
+    indice.sincronizar()
+    assert no.consultas[0][0] == ultimo + 1
@@ -0,0 +1,52 @@
+import mongomock
+import pytest
+import indices
+from indices import INDICES_PRONTUARIO, SITUACAO_CRIADO, SITUACAO_EXISTENTE, preparar_indices
+
+@pytest.fixture(autouse=True)
+def cache_limpo():
+    indices._preparacao_indices.clear()
+    yield
+    indices._preparacao_indices.clear()
+
+@pytest.fixture
+def colecao():
+    return mongomock.MongoClient().db.prontuarios
+
+def test_colecao_inexistente_nao_fica_em_cache(colecao):
+    assert preparar_indices("host", colecao) is None
+    assert "prontuarios" not in colecao.database.list_collection_names()
+
+    colecao.insert_one({'idAtendimento': "A1"})
+    preparacao = preparar_indices("host", colecao)
+
+    assert preparacao is not None
+    assert {item['situacao'] for item in preparacao.aguardar(timeout=5)} == {SITUACAO_CRIADO}
+    assert set(colecao.index_information()) >= {indice.document['name'] for indice in INDICES_PRONTUARIO}
+
+def test_colecao_inexistente_e_uma_excecao_e_nao_um_resultado(colecao):
+    # st.cache_resource não guarda exceções: a coleção é conferida de novo na próxima conexão
+    with pytest.raises(LookupError):
+        indices._preparacao_indices("host", "db", "prontuarios", colecao)
+
+def test_falha_geral_e_refeita_na_chamada_seguinte(colecao, monkeypatch):
+    colecao.insert_one({'idAtendimento': "A1"})
+
+    def falhar(collection):
+        raise RuntimeError("not authorized")
+
+    monkeypatch.setattr(indices, 'garantir_indices', falhar)
+    falha = preparar_indices("host", colecao)
+    falha.aguardar(timeout=5)
+    assert preparar_indices("host", colecao).erro == "not authorized"
+
+    monkeypatch.undo()
+    nova = preparar_indices("host", colecao)
+    assert nova.aguardar(timeout=5)
+    assert nova.concluida and nova.erro is None
+
+def test_garantir_indices_e_idempotente(colecao):
+    colecao.insert_one({'idAtendimento': "A1"})
+    indices.garantir_indices(colecao)
+
+    assert {item['situacao'] for item in indices.garantir_indices(colecao)} == {SITUACAO_EXISTENTE}
@@ -0,0 +1,129 @@
+import gzip
+import io
+import mongomock
+import pytest
+from pymongo.errors import BulkWriteError
+from integridade import CAMPO_HASH_CONTEUDO, gerar_hash_documento
+from ingestao import (
+    DUPLICADOS_IGNORAR, DUPLICADOS_UPSERT, abrir_fluxo, inserir_em_lotes, iterar_documentos
+)
+
+# ==================== LEITURA DO ARQUIVO ====================
+
+def _ler(conteudo, compactar=False):
+    if compactar:
+        conteudo = gzip.compress(conteudo)
+    return list(iterar_documentos(abrir_fluxo(io.BytesIO(conteudo))))
+
+@pytest.mark.parametrize("compactar", [False, True])
+def test_array_json_e_ndjson(compactar):
+    array = _ler(b'\xef\xbb\xbf [{"a": 1}, 2, {"b": 1.5}]', compactar)
+    ndjson = _ler(b'{"a": 1}\n\n[1]\n{quebrado\n{"b": 2}\n', compactar)
+
+    assert array == [(1, {'a': 1}, None), (2, None, "O item não é um objeto JSON"), (3, {'b': 1.5}, None)]
+    assert [(posicao, documento) for posicao, documento, _ in ndjson] == [
+        (1, {'a': 1}), (3, None), (4, None), (5, {'b': 2})
+    ]
+
+def test_array_com_erro_de_sintaxe_interrompe_a_leitura():
+    registros = _ler(b'[{"a": 1}, {"b": ]')
+
+    posicao, documento, erro = registros[-1]
+    assert documento is None and erro.startswith("JSON inválido")
+    assert posicao == len(registros)
+
+# ==================== CLASSIFICAÇÃO DOS DUPLICADOS ====================
+
+class ColecaoComErrosDoServidor:
+    """
+    Coleção mongomock cujo insert_many devolve os erros de chave duplicada
+    como o servidor (com keyPattern), que o mongomock não informa
+    """
+
+    def __init__(self, colecao):
+        self._colecao = colecao
+
+    def __getattr__(self, nome):
+        return getattr(self._colecao, nome)
+
+    def with_options(self, **opcoes):
+        return self
+
+    def insert_many(self, documentos, ordered=True):
+        erros = []
+        for indice, documento in enumerate(documentos):
+            for campo in ('_id', CAMPO_HASH_CONTEUDO):
+                if campo in documento and self._colecao.count_documents({campo: documento[campo]}):
+                    erros.append({'index': indice, 'code': 11000, 'keyPattern': {campo: 1}, 'errmsg': "E11000"})
+                    break
+            else:
+                self._colecao.insert_one(documento)
+        if erros:
+            raise BulkWriteError({'writeErrors': erros, 'nInserted': len(documentos) - len(erros)})
+
+@pytest.fixture
+def colecao():
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_one({
+        '_id': "existente",
+        'idAtendimento': "A0",
+        CAMPO_HASH_CONTEUDO: gerar_hash_documento({'idAtendimento': "A0"})[0]
+    })
+    return ColecaoComErrosDoServidor(colecao)
+
+def _registros(*documentos):
+    return [(posicao, documento, None) for posicao, documento in enumerate(documentos, 1)]
+
+@pytest.mark.parametrize("duplicados", [DUPLICADOS_IGNORAR, DUPLICADOS_UPSERT])
+def test_duplicados_no_lote_e_na_colecao(colecao, duplicados):
+    registros = _registros(
+        {'idAtendimento': "A1"},
+        {'idAtendimento': "A0"},   # já existe na coleção
+        {'idAtendimento': "A1"},   # repetido no próprio lote
+        {'idAtendimento': "A2"},
+    )
+
+    resumo = inserir_em_lotes(colecao, registros, tamanho_lote=3, duplicados=duplicados)
+
+    assert resumo["inseridos"] == 2
+    assert [d["posicao"] for d in resumo["duplicados"]] == [2, 3]
+    assert resumo["duplicados"][0]["content_hash"] == gerar_hash_documento({'idAtendimento': "A0"})[0]
+    assert resumo["falhas"] == []
+    assert [lote["documentos"] for lote in resumo["lotes"]] == [3, 1]
+    assert colecao.count_documents({}) == 3
+
+@pytest.mark.parametrize("duplicados", [DUPLICADOS_IGNORAR, DUPLICADOS_UPSERT])
+def test_documento_que_nao_vira_bson_nao_derruba_o_lote(colecao, duplicados):
+    registros = _registros(
+        {'idAtendimento': "A1"},
+        {'idAtendimento': "A2", 'valor': 2 ** 63},   # acima de int64
+        {'idAtendimento': "A3"},
+        {'idAtendimento': "A4", 'valor': 2 ** 64},
+        {'idAtendimento': "A5", 'valor': 2 ** 70},
+    )
+
+    resumo = inserir_em_lotes(colecao, registros, tamanho_lote=3, duplicados=duplicados)
+
+    assert resumo["inseridos"] == 2
+    assert [f["posicao"] for f in resumo["falhas"]] == [2, 4, 5]
+    assert "BSON" in resumo["falhas"][0]["erro"]
+    assert [(lote["documentos"], lote["inseridos"], lote["falhas"]) for lote in resumo["lotes"]] == [(3, 2, 1), (2, 0, 2)]
+    assert sorted(colecao.distinct('idAtendimento')) == ["A0", "A1", "A3"]
+
+def test_id_repetido_e_falha_e_nao_duplicado(colecao):
+    registros = _registros({'_id': "existente", 'idAtendimento': "novo"}, {'idAtendimento': "A3"})
+    registros.append((3, None, "JSON inválido"))
+
+    resumo = inserir_em_lotes(colecao, registros)
+
+    assert resumo["inseridos"] == 1
+    assert resumo["duplicados"] == []
+    assert sorted(f["posicao"] for f in resumo["falhas"]) == [1, 3]
+
+def test_hash_gravado_e_o_do_registro_blockchain(colecao):
+    documento = {'idAtendimento': "A9", 'itens': [{'codigo': 1}]}
+
+    inserir_em_lotes(colecao, _registros(dict(documento)))
+
+    gravado = colecao.find_one({'idAtendimento': "A9"})
+    assert gravado[CAMPO_HASH_CONTEUDO] == gerar_hash_documento(documento)[0] == gerar_hash_documento(gravado)[0]
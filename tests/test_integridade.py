@@ -0,0 +1,178 @@
+import datetime
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import bson
+import mongomock
+import pytest
+from bson import Decimal128, ObjectId
+from bson.raw_bson import RawBSONDocument
+from cache_hashes import CacheHashes
+from integridade import (
+    TAMANHO_BLOCO_HASH, campos_adulterados, contexto_processos, gerar_digests_campos, gerar_hash_documento,
+    iterar_valores_para_hash, previa_valores, verificar_colecao, verificar_integridade_documento
+)
+
+# ==================== REFERÊNCIA (CONCATENAÇÃO COMPLETA) ====================
+
+def extrair_valores_legado(obj, valores):
+    if isinstance(obj, dict):
+        for key in sorted(obj.keys()):
+            extrair_valores_legado(obj[key], valores)
+    elif isinstance(obj, list):
+        for item in obj:
+            extrair_valores_legado(item, valores)
+    else:
+        valores.append(str(obj))
+    return valores
+
+def hash_legado(documento):
+    doc_copy = {k: v for k, v in documento.items() if k not in ('_id', 'blockchain_info')}
+    valores_concatenados = ''.join(extrair_valores_legado(doc_copy, []))
+    return hashlib.sha256(valores_concatenados.encode('utf-8')).hexdigest(), valores_concatenados
+
+DOCUMENTOS = [
+    {},
+    {'_id': ObjectId(), 'blockchain_info': {'document_hash': "ab" * 32}, 'a': 1},
+    {'z': "último", 'a': ["x", 2, None, True], 'm': {'b': 1.5, 'a': {'c': []}}},
+    {'data': datetime.datetime(2024, 5, 1, 12, 30), 'valor': Decimal128("10.50"), 'id': ObjectId("0" * 24)},
+    {'emoji': "🩺 ção", 'vazio': "", 'aninhado': [[[{'k': "v"}]]]},
+    # Valores maiores que o bloco de atualização do SHA-256
+    {'texto': "á" * (TAMANHO_BLOCO_HASH + 17), 'lista': ["x" * 1000] * (TAMANHO_BLOCO_HASH // 500)},
+]
+
+# ==================== HASH INCREMENTAL ====================
+
+@pytest.mark.parametrize("documento", DOCUMENTOS)
+def test_hash_incremental_equivale_a_concatenacao(documento):
+    hash_esperado, concatenacao = hash_legado(documento)
+
+    hash_hex, previa = gerar_hash_documento(documento, limite_previa=100)
+
+    assert hash_hex == hash_esperado
+    assert previa.texto == concatenacao[:100]
+    assert previa.tamanho == len(concatenacao)
+    assert previa_valores(documento, 100) == concatenacao[:100]
+
+@pytest.mark.parametrize("documento", DOCUMENTOS)
+def test_digests_reproduzem_o_hash_e_cada_campo(documento):
+    hash_hex, digests = gerar_digests_campos(documento)
+
+    assert hash_hex == hash_legado(documento)[0]
+    for campo, digest in digests.items():
+        assert digest == hash_legado({campo: documento[campo]})[0]
+
+def test_percurso_sem_recursao_em_documentos_profundos():
+    profundo = "folha"
+    for _ in range(5000):
+        profundo = {'n': [profundo]}
+
+    assert list(iterar_valores_para_hash(profundo)) == ["folha"]
+
+def test_previa_sem_limite_nao_guarda_texto():
+    assert gerar_hash_documento({'a': "x" * 10}, limite_previa=0)[1] == ("", 10)
+
+# ==================== CAMPOS ADULTERADOS ====================
+
+def _com_digests(documento):
+    hash_hex, digests = gerar_digests_campos(documento)
+    return dict(documento, blockchain_info={'document_hash': hash_hex, 'field_digests': digests})
+
+def test_campos_modificados_adicionados_e_removidos():
+    documento = _com_digests({'_id': 1, 'idAtendimento': "A1", 'texto': "original", 'cid': "J11"})
+    del documento['cid']
+    documento['texto'] = "adulterado"
+    documento['observacao'] = "incluída depois"
+
+    assert campos_adulterados(documento) == {
+        "modificados": ["texto"], "adicionados": ["observacao"], "removidos": ["cid"]
+    }
+    integro, mensagem = verificar_integridade_documento(documento)
+    assert integro is False
+    assert mensagem == "Documento modificado - modificados: texto; adicionados: observacao; removidos: cid"
+
+def test_documento_intacto_nao_tem_campos_adulterados():
+    documento = _com_digests({'_id': 1, 'idAtendimento': "A1", 'texto': "original"})
+
+    assert campos_adulterados(documento) == {"modificados": [], "adicionados": [], "removidos": []}
+
+def test_registro_anterior_aos_digests_nao_aponta_campos():
+    documento = {'_id': 1, 'texto': "original"}
+    documento['blockchain_info'] = {'document_hash': gerar_hash_documento(documento)[0]}
+    documento['texto'] = "adulterado"
+
+    assert campos_adulterados(documento) is None
+    assert verificar_integridade_documento(documento) == (False, "Documento modificado - hash não corresponde")
+
+# ==================== VERIFICAÇÃO DA COLEÇÃO ====================
+
+class CursorBruto:
+    def __init__(self, documentos):
+        self._documentos = documentos
+
+    def batch_size(self, tamanho):
+        return (RawBSONDocument(bson.encode(documento)) for documento in self._documentos)
+
+class ColecaoComBsonBruto:
+    """mongomock não aceita document_class=RawBSONDocument: a leitura bruta é simulada"""
+
+    def __init__(self, colecao):
+        self._colecao = colecao
+
+    def __getattr__(self, nome):
+        return getattr(self._colecao, nome)
+
+    def with_options(self, codec_options):
+        return self
+
+    def find(self, filtro, projecao):
+        return CursorBruto(list(self._colecao.find(filtro, projecao)))
+
+def _registrar(documento, **alteracoes):
+    return dict(_com_digests(documento), **alteracoes)
+
+@pytest.fixture
+def colecao():
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many(
+        [_registrar({'_id': i, 'idAtendimento': f"A{i}", 'texto': "x" * i}) for i in range(5)]
+        + [_registrar({'_id': 5, 'idAtendimento': "A5", 'texto': "original"}, texto="adulterado")]
+        + [{'_id': 6, 'idAtendimento': "A6"}, {'_id': 7, 'blockchain_info': {'document_hash': ""}}]
+    )
+    return ColecaoComBsonBruto(colecao)
+
+@pytest.fixture(params=["sem pool", "com pool"])
+def pool(request):
+    if request.param == "sem pool":
+        yield None
+        return
+    with ProcessPoolExecutor(2, mp_context=contexto_processos()) as pool:
+        yield pool
+
+def test_verificar_colecao_separa_integros_adulterados_e_sem_registro(colecao, pool):
+    progresso = []
+
+    resumo = verificar_colecao(colecao, tamanho_lote=2, max_processos=2, pool=pool,
+                               ao_progredir=lambda feitos, total: progresso.append((feitos, total)))
+
+    assert (resumo["integros"], resumo["modificados"], resumo["sem_registro"]) == (5, 1, 2)
+    assert resumo["total_verificado"] == 6
+    assert resumo["divergencias"] == [{
+        "_id": "5",
+        "idAtendimento": "A5",
+        "hash_armazenado": gerar_hash_documento({'idAtendimento': "A5", 'texto': "original"})[0],
+        "hash_calculado": gerar_hash_documento({'idAtendimento': "A5", 'texto': "adulterado"})[0],
+        "campos_alterados": "modificados: texto"
+    }]
+    assert progresso[-1] == (6, 6)
+
+def test_verificar_colecao_reaproveita_hashes_do_cache(colecao, pool, tmp_path):
+    cache = CacheHashes(str(tmp_path / "hashes.sqlite3"))
+
+    primeiro = verificar_colecao(colecao, tamanho_lote=2, max_processos=2, pool=pool, cache=cache)
+    calculados = cache.contadores["calculados"]
+    segundo = verificar_colecao(colecao, tamanho_lote=2, max_processos=2, pool=pool, cache=cache)
+
+    assert calculados == 6
+    assert cache.contadores["calculados"] == 6
+    assert cache.contadores["acertos_memoria"] == 6
+    assert segundo == primeiro
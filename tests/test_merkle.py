@@ -0,0 +1,96 @@
+import hashlib
+import pytest
+from integridade import gerar_hash_documento, verificar_integridade_documento
+from merkle import (
+    LADO_DIREITO,
+    LADO_ESQUERDO,
+    construir_arvore,
+    gerar_prova,
+    hash_folha,
+    hash_no,
+    raiz_da_arvore,
+    verificar_prova
+)
+from registro_lote import preparar_ancora_merkle
+
+def _hashes(quantidade):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(quantidade)]
+
+# ==================== ÁRVORE E PROVAS ====================
+
+@pytest.mark.parametrize('quantidade', [1, 2, 3, 4, 5, 7, 8, 33])
+def test_toda_folha_tem_prova_que_leva_a_raiz(quantidade):
+    hashes = _hashes(quantidade)
+    niveis = construir_arvore(hashes)
+    raiz = raiz_da_arvore(niveis)
+
+    for indice, hash_hex in enumerate(hashes):
+        valida, calculada = verificar_prova(hash_hex, gerar_prova(niveis, indice), raiz)
+        assert valida and calculada == raiz
+
+def test_arvore_de_uma_folha():
+    hash_hex = _hashes(1)[0]
+    niveis = construir_arvore([hash_hex])
+
+    assert raiz_da_arvore(niveis) == hash_folha(hash_hex).hex()
+    assert gerar_prova(niveis, 0) == []
+
+def test_no_sem_par_e_promovido_sem_duplicar():
+    a, b, c = (hash_folha(h) for h in _hashes(3))
+    niveis = construir_arvore(_hashes(3))
+
+    assert raiz_da_arvore(niveis) == hash_no(hash_no(a, b), c).hex()
+    assert gerar_prova(niveis, 2) == [{"hash": hash_no(a, b).hex(), "lado": LADO_ESQUERDO}]
+    assert gerar_prova(niveis, 0)[0] == {"hash": b.hex(), "lado": LADO_DIREITO}
+
+def test_arvore_vazia():
+    with pytest.raises(ValueError):
+        construir_arvore([])
+
+def test_prova_rejeita_hash_prova_ou_raiz_alterados():
+    hashes = _hashes(6)
+    niveis = construir_arvore(hashes)
+    raiz = raiz_da_arvore(niveis)
+    prova = gerar_prova(niveis, 3)
+
+    assert not verificar_prova(hashes[2], prova, raiz)[0]
+    assert not verificar_prova(hashes[3], prova[:-1], raiz)[0]
+    assert not verificar_prova(hashes[3], [dict(prova[0], lado=LADO_DIREITO)] + prova[1:], raiz)[0]
+    assert not verificar_prova(hashes[3], prova, "00" * 32)[0]
+    assert verificar_prova(hashes[3], [{"hash": "zz"}], raiz) == (False, None)
+
+def test_aceita_prefixo_0x_e_maiusculas():
+    hashes = _hashes(4)
+    niveis = construir_arvore(hashes)
+    raiz = raiz_da_arvore(niveis)
+
+    assert verificar_prova("0x" + hashes[1].upper(), gerar_prova(niveis, 1), "0x" + raiz.upper())[0]
+
+def test_folha_nao_pode_ser_apresentada_como_no_interno():
+    hashes = _hashes(4)
+    niveis = construir_arvore(hashes)
+    no_interno = niveis[1][0].hex()
+
+    # Sem prefixos de domínio, o nó interno com a prova do nível de cima fecharia na raiz
+    assert not verificar_prova(no_interno, [{"hash": niveis[1][1].hex(), "lado": LADO_DIREITO}],
+                               raiz_da_arvore(niveis))[0]
+
+# ==================== DOCUMENTOS ANCORADOS ====================
+
+def test_documentos_ancorados_verificam_conteudo_e_prova():
+    documentos = [{'_id': i, 'idAtendimento': f"AT{i}", 'valor': i * 1.5} for i in range(5)]
+    raiz, itens = preparar_ancora_merkle(documentos)
+
+    for documento, item in zip(documentos, itens):
+        assert item['hash_hex'] == gerar_hash_documento(documento)[0]
+        assert item['merkle']['root'] == raiz and item['merkle']['leaf_count'] == 5
+        documento['blockchain_info'] = {'document_hash': item['hash_hex'], 'merkle': item['merkle']}
+
+    integro, mensagem = verificar_integridade_documento(documentos[3])
+    assert integro is True and "Merkle" in mensagem
+
+    documentos[3]['blockchain_info']['merkle']['proof'][0]['hash'] = "11" * 32
+    assert verificar_integridade_documento(documentos[3])[0] is False
+
+    documentos[4]['valor'] = 0
+    assert verificar_integridade_documento(documentos[4])[0] is False
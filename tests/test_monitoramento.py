@@ -0,0 +1,120 @@
+import datetime
+import mongomock
+from pymongo.errors import OperationFailure, PyMongoError
+from estatisticas import calcular_estatisticas
+from monitoramento import FONTE_CHANGE_STREAM, FONTE_POLLING, MonitorColecao
+
+class StreamFalso:
+    def __init__(self, eventos, falhar=False, falhar_ao_fechar=False):
+        self.eventos = list(eventos)
+        self.falhar = falhar
+        self.falhar_ao_fechar = falhar_ao_fechar
+        self.resume_token = {'_data': "token"}
+        self.fechado = False
+
+    def try_next(self):
+        if self.falhar:
+            raise PyMongoError("cursor perdido")
+        return self.eventos.pop(0) if self.eventos else None
+
+    def close(self):
+        self.fechado = True
+        if self.falhar_ao_fechar:
+            raise PyMongoError("cursor inexistente")
+
+class ColecaoComStream:
+    def __init__(self, *streams):
+        self._colecao = mongomock.MongoClient().db.prontuarios
+        self.streams = list(streams)
+        self.retomadas = []
+
+    def __getattr__(self, nome):
+        return getattr(self._colecao, nome)
+
+    def watch(self, resume_after=None, **opcoes):
+        self.retomadas.append(resume_after)
+        return self.streams.pop(0)
+
+def test_stream_perdido_e_fechado_antes_de_reabrir():
+    perdido = StreamFalso([], falhar=True, falhar_ao_fechar=True)
+    novo = StreamFalso([{'operationType': 'insert', 'fullDocument': {'_id': 1, 'tipoAtendimento': "consulta"}}])
+    colecao = ColecaoComStream(perdido, novo)
+    monitor = MonitorColecao(colecao)
+    monitor.iniciar()
+
+    assert monitor.atualizar() == []
+    assert perdido.fechado
+    assert colecao.retomadas == [None, {'_data': "token"}]
+
+    assert [a['operacao'] for a in monitor.atualizar()] == ["inserido"]
+    assert monitor.fonte == FONTE_CHANGE_STREAM
+    assert monitor.estatisticas.resultado()['documentos'] == 1
+
+# ==================== POLLING ====================
+
+class ColecaoSemStream:
+    """mongod standalone: watch não é suportado"""
+
+    def __init__(self):
+        self._colecao = mongomock.MongoClient().db.prontuarios
+
+    def __getattr__(self, nome):
+        return getattr(self._colecao, nome)
+
+    def watch(self, **opcoes):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets")
+
+def _momento(minutos):
+    return datetime.datetime(2024, 5, 1) + datetime.timedelta(minutes=minutos)
+
+def _monitor_por_polling(campo_polling="atualizado_em"):
+    colecao = ColecaoSemStream()
+    colecao.insert_many([
+        {'_id': i, 'tipoAtendimento': "consulta", 'atualizado_em': _momento(i)} for i in range(1, 4)
+    ])
+    monitor = MonitorColecao(colecao, campo_polling)
+    monitor.iniciar()
+    return colecao, monitor
+
+def _operacoes(alteracoes):
+    return [(alteracao['operacao'], alteracao['_id']) for alteracao in alteracoes]
+
+def test_polling_detecta_insercao():
+    colecao, monitor = _monitor_por_polling()
+    colecao.insert_one({'_id': 4, 'tipoAtendimento': "exame", 'atualizado_em': _momento(4)})
+
+    assert monitor.fonte == FONTE_POLLING
+    assert _operacoes(monitor.atualizar()) == [("inserido", 4)]
+    assert monitor.atualizar() == []
+    assert monitor.estatisticas.resultado() == calcular_estatisticas(colecao)
+
+def test_polling_detecta_alteracao_pelo_campo_de_polling():
+    colecao, monitor = _monitor_por_polling()
+    colecao.update_one({'_id': 2}, {'$set': {'tipoAtendimento': "exame", 'atualizado_em': _momento(10)}})
+    # Sem avançar o campo de polling a alteração não é vista
+    colecao.update_one({'_id': 1}, {'$set': {'tipoAtendimento': "exame"}})
+
+    assert _operacoes(monitor.atualizar()) == [("alterado", 2)]
+    assert monitor.documentos[2]['tipoAtendimento'] == "exame"
+    assert monitor.documentos[1]['tipoAtendimento'] == "consulta"
+    assert monitor.atualizar() == []
+
+def test_polling_sem_campo_de_alteracao_ve_apenas_insercoes():
+    colecao, monitor = _monitor_por_polling(campo_polling=None)
+    colecao.update_one({'_id': 2}, {'$set': {'tipoAtendimento': "exame", 'atualizado_em': _momento(10)}})
+
+    assert monitor.atualizar() == []
+
+def test_polling_detecta_remocao_e_insercao_fora_de_ordem():
+    colecao, monitor = _monitor_por_polling()
+    colecao.delete_one({'_id': 2})
+
+    assert _operacoes(monitor.atualizar()) == [("removido", 2)]
+    assert monitor.estatisticas.resultado() == calcular_estatisticas(colecao)
+
+    # _id menor que o último visto: só aparece pela divergência da contagem
+    colecao.insert_one({'_id': 0, 'tipoAtendimento': "exame"})
+
+    assert _operacoes(monitor.atualizar()) == [("inserido", 0)]
+    assert list(monitor.documentos) == [1, 3, 0]
+    assert monitor.estatisticas.resultado() == calcular_estatisticas(colecao)
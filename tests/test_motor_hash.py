@@ -0,0 +1,43 @@
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import bson
+from bson.raw_bson import RawBSONDocument
+from integridade import contexto_processos, gerar_digests_campos, gerar_hash_documento
+from motor_hash import MIN_DOCUMENTOS_POOL, calcular_digests, calcular_hashes
+
+# ==================== POOL DE PROCESSOS ====================
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=2, mp_context=contexto_processos()) as pool:
+        yield pool
+
+@pytest.fixture
+def documentos():
+    return [
+        {
+            '_id': i,
+            'idAtendimento': f"A{i}",
+            'texto': "ção " * (i % 7),
+            'data': datetime.datetime(2024, 1, 1 + i % 28),
+            'itens': [{'codigo': i, 'valor': i / 3}],
+        }
+        for i in range(MIN_DOCUMENTOS_POOL * 3)
+    ]
+
+def test_pool_nao_usa_fork():
+    assert contexto_processos().get_start_method() != "fork"
+
+def test_processos_nao_importam_o_streamlit(pool):
+    assert not pool.submit(eval, "'streamlit' in __import__('sys').modules").result()
+
+def test_pool_equivale_ao_calculo_no_processo(pool, documentos):
+    hashes = calcular_hashes(documentos, pool=pool, bytes_por_lote=2048)
+
+    assert hashes == [gerar_hash_documento(doc)[0] for doc in documentos]
+
+def test_digests_no_pool_e_documentos_brutos(pool, documentos):
+    brutos = [RawBSONDocument(bson.encode(doc)) for doc in documentos]
+
+    assert calcular_digests(brutos, pool=pool) == [gerar_digests_campos(doc) for doc in documentos]
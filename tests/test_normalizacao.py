@@ -0,0 +1,94 @@
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from bson import ObjectId, Decimal128, Int64, Binary, Code, Regex, Timestamp, DBRef, MinKey, MaxKey
+from bson.json_util import dumps
+from exportacao import normalizar_documento
+
+def normalizar_legado(doc):
+    """
+    Achatamento original: ida e volta por Extended JSON e recursão sobre o resultado
+    """
+    doc_json = json.loads(dumps(doc))
+
+    def achatar(d, chave_pai='', sep='.'):
+        itens = []
+        for k, v in d.items():
+            nova_chave = f"{chave_pai}{sep}{k}" if chave_pai else k
+
+            if isinstance(v, dict):
+                itens.extend(achatar(v, nova_chave, sep=sep).items())
+            elif isinstance(v, list):
+                itens.append((nova_chave, json.dumps(v, ensure_ascii=False)))
+            else:
+                itens.append((nova_chave, str(v)))
+
+        return dict(itens)
+
+    return achatar(doc_json)
+
+DOCUMENTO = {
+    '_id': ObjectId('65a1b2c3d4e5f60718293a4b'),
+    'texto': "Observação clínica — dor torácica",
+    'vazio': "",
+    'inteiro': 42,
+    'int64': Int64(2 ** 40),
+    'real': 36.6,
+    'real_inteiro': 2.0,
+    'booleano': True,
+    'nulo': None,
+    'decimal': Decimal128("12.50"),
+    'data': datetime(2024, 5, 17, 13, 45, 12, 345000),
+    'data_sem_ms': datetime(2024, 5, 17, 13, 45, 12),
+    'data_anterior_epoca': datetime(1950, 1, 1),
+    'data_utc': datetime(2024, 5, 17, 13, 45, tzinfo=timezone.utc),
+    'binario': Binary(b'\x00\x01\x02', 0),
+    'binario_sub': Binary(b'\x00\x01\x02', 128),
+    'bytes': b'abc',
+    'uuid': Binary.from_uuid(uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    'codigo': Code("function () { return 1; }"),
+    'codigo_escopo': Code("function () { return x; }", {'x': 1, 'oid': ObjectId('65a1b2c3d4e5f60718293a4c')}),
+    'regex': Regex("^abc", "i"),
+    'padrao': re.compile("^xyz", re.IGNORECASE),
+    'timestamp': Timestamp(1700000000, 3),
+    'referencia': DBRef('pacientes', ObjectId('65a1b2c3d4e5f60718293a4d')),
+    'minimo': MinKey(),
+    'maximo': MaxKey(),
+    'lista': [1, "dois", ObjectId('65a1b2c3d4e5f60718293a4e'), {'data': datetime(2024, 1, 1)}, [Code("x")]],
+    'lista_vazia': [],
+    'subdocumento_vazio': {},
+    'paciente': {
+        'nome': "José da Silva",
+        'contato': {'telefone': "+55 11 99999-0000", 'emails': ["a@b.c"]},
+        'codigo': Code("y"),
+    },
+}
+
+def test_mesmas_chaves_e_valores_do_achatamento_legado():
+    novo = normalizar_documento(DOCUMENTO)
+    legado = normalizar_legado(DOCUMENTO)
+
+    assert list(novo) == list(legado)
+    assert novo == legado
+
+def test_code_vira_subdocumento_extended_json():
+    dados = normalizar_documento({'a': Code("f()"), 'b': Code("g()", {'x': 1})})
+
+    assert dados == {'a.$code': "f()", 'b.$code': "g()", 'b.$scope.x': "1"}
+
+def test_campos_isolados_equivalentes():
+    for chave, valor in DOCUMENTO.items():
+        assert normalizar_documento({chave: valor}) == normalizar_legado({chave: valor}), chave
+
+def test_modo_tipado_preserva_tipos_escalares():
+    dados = normalizar_documento(DOCUMENTO, tipado=True)
+
+    assert dados['inteiro'] == 42 and type(dados['inteiro']) is int
+    assert type(dados['int64']) is int
+    assert dados['real'] == 36.6
+    assert dados['booleano'] is True
+    assert dados['data.$date'] == datetime(2024, 5, 17, 13, 45, 12, 345000)
+    assert dados['_id.$oid'] == '65a1b2c3d4e5f60718293a4b'
+    assert dados['codigo.$code'] == "function () { return 1; }"
+    assert dados['lista'] == normalizar_legado(DOCUMENTO)['lista']
@@ -0,0 +1,117 @@
+import threading
+import pytest
+import requests
+from eth_account import Account
+from web3 import Web3
+import provedor_web3
+from provedor_web3 import ProvedorHTTP
+from registro_lote import assinar_e_enviar
+
+# ==================== PROVEDOR HTTP ====================
+
+class RespostaFalsa:
+    def __init__(self, status_code=200, resultado="0x1"):
+        self.status_code = status_code
+        self.content = Web3.to_bytes(text=f'{{"jsonrpc": "2.0", "id": 0, "result": "{resultado}"}}')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+class SessaoFalsa:
+    def __init__(self, *roteiro):
+        self.roteiro = list(roteiro)
+        self.threads = []
+
+    def post(self, url, data, headers, timeout):
+        self.threads.append(threading.current_thread().name)
+        passo = self.roteiro.pop(0) if self.roteiro else RespostaFalsa()
+        if isinstance(passo, Exception):
+            raise passo
+        return passo
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(provedor_web3.time, "sleep", lambda segundos: None)
+
+def _provedor(sessao, tentativas=3):
+    return ProvedorHTTP("http://rpc.local", sessao, request_kwargs={'timeout': 5}, tentativas=tentativas)
+
+def test_outras_threads_usam_a_mesma_sessao():
+    sessao = SessaoFalsa()
+    w3 = Web3(_provedor(sessao))
+    resultados = []
+
+    w3.eth.get_block_number()
+    outra = threading.Thread(target=lambda: resultados.append(w3.eth.get_block_number()), name="outra")
+    outra.start()
+    outra.join()
+
+    assert resultados == [1]
+    assert sessao.threads == ["MainThread", "outra"]
+
+def test_metodos_de_leitura_sao_repetidos():
+    sessao = SessaoFalsa(requests.ConnectionError("reset"), RespostaFalsa(503), RespostaFalsa(429))
+
+    resposta = _provedor(sessao).make_request("eth_blockNumber", [])
+
+    assert resposta["result"] == "0x1"
+    assert len(sessao.threads) == 4
+
+def test_tentativas_esgotadas_propagam_o_erro():
+    sessao = SessaoFalsa(*[RespostaFalsa(502)] * 3)
+
+    with pytest.raises(requests.HTTPError):
+        _provedor(sessao, tentativas=2).make_request("eth_call", [])
+    assert len(sessao.threads) == 3
+
+@pytest.mark.parametrize("falha", [RespostaFalsa(503), requests.Timeout("leitura")])
+def test_envio_de_transacao_nunca_e_repetido(falha):
+    sessao = SessaoFalsa(falha)
+
+    with pytest.raises((requests.HTTPError, requests.Timeout)):
+        _provedor(sessao).make_request("eth_sendRawTransaction", ["0x00"])
+    assert len(sessao.threads) == 1
+
+def test_sessao_repete_apenas_falhas_de_conexao():
+    politica = provedor_web3.criar_sessao_http().get_adapter("https://rpc.local").max_retries
+
+    assert politica.connect == provedor_web3.TENTATIVAS_RPC
+    assert politica.read == 0 and politica.status == 0
+
+# ==================== ENVIO JÁ CONHECIDO ====================
+
+class ContratoFalso:
+    def __init__(self):
+        self.functions = self
+
+    def registerHash(self, *args):
+        return self
+
+    def build_transaction(self, campos):
+        return {**campos, 'to': "0x" + "22" * 20, 'data': "0x", 'value': 0}
+
+class Web3Falso:
+    def __init__(self, erro):
+        self.eth = self
+        self.account = Account
+        self.erro = erro
+
+    def to_bytes(self, hexstr):
+        return bytes.fromhex(hexstr)
+
+    def send_raw_transaction(self, bruta):
+        raise self.erro
+
+def _enviar(w3):
+    conta = Account.create()
+    return assinar_e_enviar(w3, ContratoFalso(), conta, conta.key, "ab" * 32, "tipo", "id", 0, 10, 1, 1)
+
+def test_transacao_ja_conhecida_retorna_o_hash_local():
+    tx_hash = _enviar(Web3Falso(ValueError({'code': -32000, 'message': 'already known'})))
+
+    assert len(tx_hash) == 32
+
+def test_outros_erros_de_envio_sao_propagados():
+    with pytest.raises(ValueError, match="insufficient funds"):
+        _enviar(Web3Falso(ValueError({'code': -32000, 'message': 'insufficient funds'})))
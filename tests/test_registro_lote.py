@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+import mongomock
+import pytest
+import registro_lote
+from integridade import (
+    FILTRO_COM_HASH, gerar_digests_campos, gerar_hash_documento, verificar_integridade_documento
+)
+from merkle import verificar_prova
+from registro_lote import (
+    MODO_ANCORA_MERKLE, buscar_documentos_sem_registro, enviar_ancora_merkle, enviar_transacoes,
+    operacao_blockchain_info
+)
+
+# ==================== SELEÇÃO DOS DOCUMENTOS ====================
+
+@pytest.fixture
+def colecao():
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many([
+        {'_id': 1, 'idAtendimento': "A1"},
+        {'_id': 2, 'idAtendimento': "A2", 'blockchain_info': {'document_hash': None}},
+        {'_id': 3, 'idAtendimento': "A3", 'blockchain_info': {'document_hash': ''}},
+        {'_id': 4, 'idAtendimento': "A4", 'blockchain_info': {'document_hash': "ab" * 32}},
+        {'_id': 5, 'idAtendimento': "A5", 'blockchain_info': {}},
+    ])
+    return colecao
+
+def test_sem_registro_e_o_complemento_dos_registrados(colecao):
+    sem_registro = {doc['_id'] for doc in buscar_documentos_sem_registro(colecao)}
+    registrados = {doc['_id'] for doc in colecao.find(FILTRO_COM_HASH)}
+
+    assert sem_registro == {1, 2, 3, 5}
+    assert registrados == {4}
+
+def test_ignora_pendentes_e_respeita_o_limite(colecao):
+    documentos = buscar_documentos_sem_registro(colecao, limite=2, ignorar_ids=[1])
+
+    assert len(documentos) == 2
+    assert 1 not in {doc['_id'] for doc in documentos}
+
+# ==================== ENVIO DAS TRANSAÇÕES ====================
+
+class Web3Falso:
+    def __init__(self):
+        self.eth = self
+        self.chain_id = 11155111
+
+    def get_transaction_count(self, endereco, bloco):
+        return 7
+
+    def get_block(self, bloco):
+        return {'baseFeePerGas': 10}
+
+    def to_wei(self, valor, unidade):
+        return valor * 10 ** 9
+
+    def to_hex(self, valor):
+        return "0x" + valor.hex()
+
+class Conta:
+    address = "0x0000000000000000000000000000000000000001"
+
+@pytest.fixture
+def envios(monkeypatch):
+    envios = []
+
+    def assinar_e_enviar(w3, contract, account, private_key, hash_hex, record_type, record_id, nonce, *taxas):
+        if record_id == "falha":
+            raise ValueError("insufficient funds")
+        envios.append((record_id, record_type, nonce))
+        return bytes.fromhex(hash_hex)
+
+    monkeypatch.setattr(registro_lote, 'assinar_e_enviar', assinar_e_enviar)
+    return envios
+
+def test_nonces_sequenciais_e_hash_duplicado_enviado_uma_vez(envios):
+    documentos = [
+        {'_id': "a", 'texto': "x", 'tipoAtendimento': "consulta"},
+        {'_id': "b", 'texto': "x", 'tipoAtendimento': "consulta"},
+        {'_id': "c", 'texto': "y"},
+    ]
+    enviados, falhas = enviar_transacoes(Web3Falso(), None, Conta(), "chave", documentos, "padrao")
+
+    assert envios == [("a", "consulta", 7), ("c", "padrao", 8)]
+    assert [item['hash_hex'] for item in enviados] == [
+        gerar_hash_documento(documentos[0])[0], gerar_hash_documento(documentos[2])[0]
+    ]
+    assert enviados[0]['tx_hash_hex'] == "0x" + enviados[0]['hash_hex']
+    assert set(enviados[0]['field_digests']) == {'texto', 'tipoAtendimento'}
+    assert falhas == [{"_id": "b", "erro": "Hash duplicado no lote"}]
+
+def test_erro_de_envio_interrompe_o_lote_sem_lacuna_de_nonce(envios):
+    documentos = [{'_id': "a", 'v': 1}, {'_id': "falha", 'v': 2}, {'_id': "c", 'v': 3}]
+    enviados, falhas = enviar_transacoes(Web3Falso(), None, Conta(), "chave", documentos, "padrao")
+
+    assert [item['_id'] for item in enviados] == ["a"]
+    assert envios == [("a", "padrao", 7)]
+    assert falhas == [
+        {"_id": "falha", "erro": "insufficient funds"},
+        {"_id": "c", "erro": "Não enviado (lote interrompido)"},
+    ]
+
+# ==================== ÂNCORA MERKLE ====================
+
+def test_ancora_merkle_grava_hash_e_prova_em_cada_documento(envios, colecao):
+    documentos = buscar_documentos_sem_registro(colecao)
+    contrato = SimpleNamespace(address="0x0000000000000000000000000000000000000002")
+
+    raiz_hex, itens, tx_hash_hex = enviar_ancora_merkle(Web3Falso(), contrato, Conta(), "chave", documentos, "lote")
+
+    # Uma única transação, com a raiz como hash registrado
+    assert envios == [("merkle:4:1", "lote", 7)]
+    assert tx_hash_hex == "0x" + raiz_hex
+
+    recibo = SimpleNamespace(blockNumber=100, gasUsed=21000)
+    colecao.bulk_write([
+        operacao_blockchain_info(contrato, item, tx_hash_hex, recibo, {"exists": True}, Conta.address)
+        for item in itens
+    ])
+
+    for indice, documento in enumerate(colecao.find({'_id': {'$in': [1, 2, 3, 5]}}).sort('_id')):
+        info = documento['blockchain_info']
+        conteudo = {k: v for k, v in documento.items() if k != 'blockchain_info'}
+        assert (info['document_hash'], info['field_digests']) == gerar_digests_campos(conteudo)
+        assert info['anchoring'] == MODO_ANCORA_MERKLE
+        assert info['transaction']['transaction_hash'] == tx_hash_hex
+        assert info['merkle']['root'] == raiz_hex
+        assert (info['merkle']['leaf_index'], info['merkle']['leaf_count']) == (indice, 4)
+        assert verificar_prova(info['document_hash'], info['merkle']['proof'], raiz_hex)[0]
+        assert verificar_integridade_documento(documento)[0] is True
+
+def test_falha_no_envio_da_ancora_nao_grava_nada(monkeypatch, colecao):
+    def assinar_e_enviar(*args):
+        raise ValueError("insufficient funds")
+
+    monkeypatch.setattr(registro_lote, 'assinar_e_enviar', assinar_e_enviar)
+    documentos = buscar_documentos_sem_registro(colecao)
+
+    with pytest.raises(ValueError, match="insufficient funds"):
+        enviar_ancora_merkle(Web3Falso(), None, Conta(), "chave", documentos, "lote")
+
+    assert colecao.count_documents(FILTRO_COM_HASH) == 1
@@ -0,0 +1,189 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import mongomock
+import pytest
+import requests
+from web3 import Web3
+import verificacao_contrato
+from verificacao_contrato import (
+    TIPOS_RETORNO, _espera_retry_after, _executar_lote, hashes_registrados_na_colecao,
+    verificar_hashes_no_contrato
+)
+
+ENDERECO = "0x" + "11" * 20
+
+# ==================== RETRY-AFTER ====================
+
+def test_retry_after_em_segundos():
+    assert _espera_retry_after("3", 1.0) == 3.0
+
+def test_retry_after_como_data_http():
+    daqui_a_pouco = datetime.now(timezone.utc) + timedelta(seconds=30)
+    espera = _espera_retry_after(format_datetime(daqui_a_pouco, usegmt=True), 1.0)
+    assert 25 <= espera <= 30
+
+def test_retry_after_ausente_invalido_ou_passado():
+    assert _espera_retry_after(None, 1.5) == 1.5
+    assert _espera_retry_after("amanhã", 1.5) == 1.5
+    assert _espera_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 1.5) == 0.0
+
+def test_retry_after_limitado():
+    assert _espera_retry_after("86400", 1.0) == verificacao_contrato.ESPERA_MAXIMA
+
+# ==================== LOTES JSON-RPC ====================
+
+class RespostaFalsa:
+    def __init__(self, status_code=200, corpo=None, headers=None):
+        self.status_code = status_code
+        self._corpo = corpo
+        self.headers = headers or {}
+
+    def json(self):
+        return self._corpo
+
+class SessaoFalsa:
+    """Devolve as respostas roteirizadas; callables recebem o corpo enviado"""
+
+    def __init__(self, *roteiro):
+        self.roteiro = list(roteiro)
+        self.corpos = []
+
+    def post(self, url, json, timeout):
+        self.corpos.append(json)
+        passo = self.roteiro.pop(0)
+        if isinstance(passo, Exception):
+            raise passo
+        return passo(json) if callable(passo) else passo
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(verificacao_contrato.time, "sleep", esperas.append)
+    return esperas
+
+def _retorno(w3, registro):
+    return "0x" + w3.codec.encode(TIPOS_RETORNO, [True, True, 123, ENDERECO, "hash", registro]).hex()
+
+def _sucesso(w3):
+    return lambda corpo: RespostaFalsa(corpo=[
+        {"jsonrpc": "2.0", "id": item["id"], "result": _retorno(w3, str(item["id"]))}
+        for item in corpo
+    ])
+
+@pytest.fixture
+def chamadas():
+    return [("aa" * 32, "0x01"), ("bb" * 32, "0x02")]
+
+def test_429_com_data_http_e_5xx_sao_repetidos(chamadas, sem_espera):
+    w3 = Web3()
+    data_http = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    sessao = SessaoFalsa(
+        RespostaFalsa(429, headers={"Retry-After": data_http}),
+        RespostaFalsa(503),
+        _sucesso(w3),
+    )
+
+    resultados = _executar_lote(sessao, "http://rpc", w3, ENDERECO, chamadas)
+
+    assert {r["record_id"] for r in resultados.values()} == {"0", "1"}
+    assert len(sessao.corpos) == 3
+    assert 5 <= sem_espera[0] <= 10
+
+def test_falha_de_conexao_e_repetida(chamadas):
+    w3 = Web3()
+    sessao = SessaoFalsa(requests.ConnectionError("conexão recusada"), _sucesso(w3))
+
+    resultados = _executar_lote(sessao, "http://rpc", w3, ENDERECO, chamadas)
+
+    assert all(r["exists"] for r in resultados.values())
+
+def test_reenvia_apenas_chamadas_limitadas(chamadas):
+    w3 = Web3()
+    primeira = RespostaFalsa(corpo=[
+        {"jsonrpc": "2.0", "id": 0, "result": _retorno(w3, "ok")},
+        {"jsonrpc": "2.0", "id": 1, "error": {"code": -32005, "message": "limite"}},
+    ])
+    sessao = SessaoFalsa(primeira, _sucesso(w3))
+
+    resultados = _executar_lote(sessao, "http://rpc", w3, ENDERECO, chamadas)
+
+    assert [item["id"] for item in sessao.corpos[1]] == [1]
+    assert resultados["aa" * 32]["record_id"] == "ok"
+    assert resultados["bb" * 32]["record_id"] == "1"
+
+def test_tentativas_esgotadas_informam_o_ultimo_erro(chamadas):
+    sessao = SessaoFalsa(*[RespostaFalsa(502)] * verificacao_contrato.MAX_TENTATIVAS)
+
+    resultados = _executar_lote(sessao, "http://rpc", Web3(), ENDERECO, chamadas)
+
+    assert resultados == {h: {"error": "Provedor respondeu HTTP 502"} for h, _ in chamadas}
+
+def test_outros_erros_http_nao_sao_repetidos(chamadas):
+    sessao = SessaoFalsa(RespostaFalsa(401))
+
+    resultados = _executar_lote(sessao, "http://rpc", Web3(), ENDERECO, chamadas)
+
+    assert len(sessao.corpos) == 1
+    assert resultados == {h: {"error": "Provedor respondeu HTTP 401"} for h, _ in chamadas}
+
+def test_erro_json_rpc_do_lote_inteiro_vira_erro_das_chamadas(chamadas):
+    sessao = SessaoFalsa(RespostaFalsa(corpo={"jsonrpc": "2.0", "id": None, "error": {"code": -32600}}))
+
+    resultados = _executar_lote(sessao, "http://rpc", Web3(), ENDERECO, chamadas)
+
+    assert resultados == {h: {"error": "Erro JSON-RPC: {'code': -32600}"} for h, _ in chamadas}
+
+# ==================== VERIFICAÇÃO EM LOTE ====================
+
+class SessaoPorHash:
+    """Responde conforme os hashes do lote: `roteiros` mapeia hash -> respostas roteirizadas"""
+
+    def __init__(self, w3, roteiros):
+        self.w3 = w3
+        self.roteiros = roteiros
+
+    def post(self, url, json, timeout):
+        for hash_hex, roteiro in self.roteiros.items():
+            if any(hash_hex in item["params"][0]["data"] for item in json) and roteiro:
+                return roteiro.pop(0)
+        return _sucesso(self.w3)(json)
+
+@pytest.fixture
+def rpc(monkeypatch):
+    def configurar(sessao):
+        monkeypatch.setattr(verificacao_contrato, "endpoint_rpc", lambda rpc_url: "http://rpc")
+        monkeypatch.setattr(verificacao_contrato, "obter_sessao_http", lambda endpoint: sessao)
+    return configurar
+
+def test_lote_com_erro_5xx_nao_interrompe_os_demais(rpc):
+    w3 = Web3()
+    rpc(SessaoPorHash(w3, {"bb" * 32: [RespostaFalsa(500)] * verificacao_contrato.MAX_TENTATIVAS}))
+
+    resultados = verificar_hashes_no_contrato("http://rpc", ENDERECO, ["aa" * 32, "0x" + "bb" * 32, "cc" * 32],
+                                              tamanho_lote=1)
+
+    assert resultados["bb" * 32] == {"error": "Provedor respondeu HTTP 500"}
+    assert resultados["aa" * 32]["exists"] and resultados["cc" * 32]["exists"]
+
+def test_lote_limitado_espera_o_retry_after(rpc, sem_espera):
+    w3 = Web3()
+    rpc(SessaoPorHash(w3, {"bb" * 32: [RespostaFalsa(429, headers={"Retry-After": "2"})]}))
+
+    resultados = verificar_hashes_no_contrato("http://rpc", ENDERECO, ["aa" * 32, "bb" * 32], tamanho_lote=1)
+
+    assert sem_espera == [2.0]
+    assert all(resultado["exists"] for resultado in resultados.values())
+
+# ==================== HASHES DA COLEÇÃO ====================
+
+def test_hashes_registrados_incluem_raizes_merkle_sem_repeticao():
+    colecao = mongomock.MongoClient().db.prontuarios
+    colecao.insert_many([
+        {'_id': 1, 'blockchain_info': {'document_hash': "a1"}},
+        {'_id': 2, 'blockchain_info': {'document_hash': "a2", 'merkle': {'root': "r1"}}},
+        {'_id': 3, 'blockchain_info': {'document_hash': "a3", 'merkle': {'root': "r1"}}},
+        {'_id': 4, 'blockchain_info': {'document_hash': None}},
+        {'_id': 5},
+    ])
+
+    assert sorted(hashes_registrados_na_colecao(colecao)) == ["a1", "r1"]
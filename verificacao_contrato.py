@@ -0,0 +1,245 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from web3 import Web3
+from integridade import FILTRO_COM_HASH
+from provedor_web3 import endpoint_rpc, obter_sessao_http, obter_web3
+
+# ==================== CONSTANTES ====================
+TAMANHO_LOTE_RPC = 100  # chamadas eth_call por requisição JSON-RPC em lote
+MAX_LOTES_EM_VOO = 4
+MAX_TENTATIVAS = 6
+ESPERA_INICIAL = 0.5  # segundos; dobra a cada nova tentativa
+ESPERA_MAXIMA = 60  # limite para a espera pedida pelo provedor (Retry-After)
+TIMEOUT_REQUISICAO = 30
+# Códigos usados pelos provedores para sinalizar limite de requisições
+CODIGOS_LIMITE_REQUISICOES = {429, -32005}
+
+ABI_VERIFY_HASH = [
+    {
+        "inputs": [{"internalType": "bytes32", "name": "_hash", "type": "bytes32"}],
+        "name": "verifyHash",
+        "outputs": [
+            {"internalType": "bool", "name": "exists", "type": "bool"},
+            {"internalType": "bool", "name": "isValid", "type": "bool"},
+            {"internalType": "uint256", "name": "timestamp", "type": "uint256"},
+            {"internalType": "address", "name": "provider", "type": "address"},
+            {"internalType": "string", "name": "recordType", "type": "string"},
+            {"internalType": "string", "name": "recordId", "type": "string"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+TIPOS_RETORNO = [saida["type"] for saida in ABI_VERIFY_HASH[0]["outputs"]]
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def _normalizar_hash(hash_hex):
+    hash_hex = hash_hex.strip().lower()
+    return hash_hex[2:] if hash_hex.startswith('0x') else hash_hex
+
+def _decodificar_retorno(w3, resultado_hex):
+    exists, is_valid, timestamp, provider, record_type, record_id = \
+        w3.codec.decode(TIPOS_RETORNO, w3.to_bytes(hexstr=resultado_hex))
+    return {
+        "exists": exists,
+        "is_valid": is_valid,
+        "timestamp": timestamp,
+        "provider": provider,
+        "record_type": record_type,
+        "record_id": record_id
+    }
+
+def _limite_excedido(erro):
+    return isinstance(erro, dict) and erro.get('code') in CODIGOS_LIMITE_REQUISICOES
+
+def _espera_retry_after(valor, padrao):
+    """
+    Segundos de espera pedidos pelo cabeçalho Retry-After, que pode trazer
+    segundos ou uma data HTTP. Retorna `padrao` quando ausente ou inválido
+    """
+    if not valor:
+        return padrao
+    try:
+        espera = float(valor)
+    except ValueError:
+        try:
+            momento = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return padrao
+        if momento.tzinfo is None:
+            momento = momento.replace(tzinfo=timezone.utc)
+        espera = (momento - datetime.now(timezone.utc)).total_seconds()
+    return min(max(espera, 0.0), ESPERA_MAXIMA)
+
+def _executar_lote(sessao, rpc_url, w3, endereco, chamadas):
+    """
+    Envia um lote de chamadas verifyHash como uma única requisição JSON-RPC.
+    Chamadas recusadas por limite de requisições, respostas 429/5xx e falhas
+    de conexão são repetidas com espera exponencial (eth_call não altera
+    estado). Chamadas que esgotam as tentativas, ou cujo lote é recusado de
+    vez (outros erros HTTP ou JSON-RPC), voltam com {"error": ...}.
+    Retorna {hash: resultado}
+    """
+    pendentes = dict(enumerate(chamadas))  # id JSON-RPC -> (hash, dados da chamada)
+    resultados = {}
+    espera = ESPERA_INICIAL
+    ultimo_erro = "Limite de requisições do provedor excedido"
+
+    for _ in range(MAX_TENTATIVAS):
+        corpo = [
+            {
+                "jsonrpc": "2.0",
+                "id": id_chamada,
+                "method": "eth_call",
+                "params": [{"to": endereco, "data": dados}, "latest"]
+            }
+            for id_chamada, (_, dados) in pendentes.items()
+        ]
+        try:
+            resposta = sessao.post(rpc_url, json=corpo, timeout=TIMEOUT_REQUISICAO)
+        except requests.RequestException as e:
+            ultimo_erro = f"Falha na requisição ao provedor: {e}"
+            time.sleep(espera)
+            espera *= 2
+            continue
+
+        if resposta.status_code == 429 or resposta.status_code >= 500:
+            ultimo_erro = f"Provedor respondeu HTTP {resposta.status_code}"
+            time.sleep(_espera_retry_after(resposta.headers.get('Retry-After'), espera))
+            espera *= 2
+            continue
+        if resposta.status_code >= 400:
+            # Outros erros HTTP (ex.: 401, 413) não mudam ao repetir
+            ultimo_erro = f"Provedor respondeu HTTP {resposta.status_code}"
+            break
+        try:
+            respostas = resposta.json()
+        except ValueError:
+            ultimo_erro = "Resposta do provedor não é JSON válido"
+            break
+
+        # Lote inteiro recusado (o provedor responde com um único objeto de erro)
+        if isinstance(respostas, dict):
+            if not _limite_excedido(respostas.get('error')):
+                ultimo_erro = f"Erro JSON-RPC: {respostas.get('error')}"
+                break
+            ultimo_erro = "Limite de requisições do provedor excedido"
+            time.sleep(espera)
+            espera *= 2
+            continue
+
+        for item in respostas:
+            hash_hex, _ = pendentes[item['id']]
+            erro = item.get('error')
+            if _limite_excedido(erro):
+                ultimo_erro = "Limite de requisições do provedor excedido"
+                continue
+            if erro:
+                resultados[hash_hex] = {"error": erro.get('message', str(erro))}
+            else:
+                resultados[hash_hex] = _decodificar_retorno(w3, item['result'])
+            del pendentes[item['id']]
+
+        if not pendentes:
+            return resultados
+
+        time.sleep(espera)
+        espera *= 2
+
+    for hash_hex, _ in pendentes.values():
+        resultados[hash_hex] = {"error": ultimo_erro}
+    return resultados
+
+def _verificar_sequencialmente(w3, contract_address, hashes, ao_progredir=None):
+    """
+    Consulta verifyHash um hash por vez, pelo próprio provedor Web3
+    """
+    contract = w3.eth.contract(address=contract_address, abi=ABI_VERIFY_HASH)
+    resultados = {}
+
+    for hash_hex in hashes:
+        try:
+            exists, is_valid, timestamp, provider, record_type, record_id = \
+                contract.functions.verifyHash(w3.to_bytes(hexstr=hash_hex)).call()
+            resultados[hash_hex] = {
+                "exists": exists,
+                "is_valid": is_valid,
+                "timestamp": timestamp,
+                "provider": provider,
+                "record_type": record_type,
+                "record_id": record_id
+            }
+        except Exception as e:
+            resultados[hash_hex] = {"error": str(e)}
+
+        if ao_progredir:
+            ao_progredir(len(resultados), len(hashes))
+
+    return resultados
+
+# ==================== VERIFICAÇÃO EM LOTE ====================
+
+def verificar_hashes_no_contrato(rpc_url, contract_address, hashes, tamanho_lote=TAMANHO_LOTE_RPC,
+                                 max_em_voo=MAX_LOTES_EM_VOO, ao_progredir=None):
+    """
+    Consulta verifyHash para muitos hashes, agrupando as chamadas em requisições
+    JSON-RPC em lote e mantendo no máximo `max_em_voo` requisições simultâneas.
+    `ao_progredir(verificados, total)` é chamado a cada lote concluído.
+    Um lote que falha não interrompe os demais: seus hashes voltam com erro.
+    Retorna {hash (hex, sem 0x): resultado}, no mesmo formato de verifyHash
+    ou {"error": ...}
+    """
+    w3 = Web3()
+    contract = w3.eth.contract(address=contract_address, abi=ABI_VERIFY_HASH)
+    hashes = list(dict.fromkeys(_normalizar_hash(h) for h in hashes))
+    endpoint = endpoint_rpc(rpc_url)
+
+    if endpoint is None:
+        # Cadeia em processo (uso offline): não há endpoint HTTP para requisições em lote
+        return _verificar_sequencialmente(obter_web3(rpc_url), contract_address, hashes, ao_progredir)
+
+    chamadas = [
+        (h, contract.encodeABI(fn_name="verifyHash", args=[w3.to_bytes(hexstr=h)]))
+        for h in hashes
+    ]
+    lotes = [chamadas[i:i + tamanho_lote] for i in range(0, len(chamadas), tamanho_lote)]
+
+    resultados = {}
+    # Mesma sessão keep-alive do provedor Web3 (conexões e handshake TLS reaproveitados)
+    sessao = obter_sessao_http(endpoint)
+
+    with ThreadPoolExecutor(max_workers=max_em_voo) as pool:
+        futuros = {
+            pool.submit(_executar_lote, sessao, endpoint, w3, contract.address, lote): lote
+            for lote in lotes
+        }
+        for futuro in as_completed(futuros):
+            try:
+                resultados.update(futuro.result())
+            except Exception as e:
+                resultados.update((hash_hex, {"error": str(e)}) for hash_hex, _ in futuros[futuro])
+            if ao_progredir:
+                ao_progredir(len(resultados), len(hashes))
+
+    return resultados
+
+def hashes_registrados_na_colecao(collection):
+    """
+    Retorna os hashes que a coleção espera encontrar no contrato: o
+    document_hash dos documentos registrados individualmente e a raiz dos
+    documentos ancorados por árvore Merkle.
+    Os valores distintos vêm de um $group percorrido pelo cursor, sem o
+    limite de 16 MB do resultado único de distinct
+    """
+    cursor = collection.aggregate(
+        [
+            {'$match': FILTRO_COM_HASH},
+            {'$group': {'_id': {'$ifNull': ['$blockchain_info.merkle.root', '$blockchain_info.document_hash']}}}
+        ],
+        allowDiskUse=True
+    )
+    return [grupo['_id'] for grupo in cursor if grupo['_id']]